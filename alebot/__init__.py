@@ -1,13 +1,26 @@
 import os
-import asyncore
-import socket
-from asynchat import async_chat
+import sys
+import asyncio
+import hashlib
+import inspect
 import pkgutil
-import imp
+import signal
+import importlib.machinery
+import importlib.util
 import json
+import time
 import threading
 import logging
 
+from .buffer import LineBuffer
+from .casemap import CaseMapping
+from .flood import IngressLimiter, SendQueue
+from .metrics import Metrics
+from .pool import TaskPool
+from .profiler import Profiler
+from .settings import Settings
+from .state import StateTracker
+
 
 class IRCCommandsMixin(object):
 
@@ -67,6 +80,13 @@ class Event(object):
                 `SOCK_CONNECTED`: Sent as soon as the socket is
                 connected.
 
+                `SOCK_CLOSED`: Sent after the server closed the
+                connection. The bot waits for the coroutines its
+                hooks start before it stops.
+
+                `UNKNOWN`: A line that could not be parsed, you will
+                find it in :attr:`body`.
+
         Depending on the type of the event there might be one or me of
         the following attributes not empty (not `None`):
 
@@ -76,7 +96,7 @@ class Event(object):
             private message, it is the sender of the message, in case
             of a join, the joining person, in case of a kick, the
             kicking person and so on. If this is an actual user, and
-            not a server, :attr:`nick`, :attr:`ident` and :attr`host`
+            not a server, :attr:`nick`, :attr:`ident` and :attr:`host`
             should be available, too.
 
             If this is a user, it will be in the format of:
@@ -90,55 +110,261 @@ class Event(object):
         .. attribute:: body
 
             If the event has a message, reason or a similar thing,
-            you will find it in body.
+            you will find it in body. This is the last parameter of
+            the line, or the only one for events like `PING`, `ERROR`
+            or `QUIT`.
 
         .. attribute:: target
 
             The target of the action, a channel if it is a channel
             message, the bot's nick if it is a private one or anything
-            else.
+            else. This is the first parameter of the line.
+
+        .. attribute:: params
+
+            All the parameters of the line as a tuple, i.e. for a `353`
+            reply the bot's nick, the channel type, the channel and the
+            names.
+
+        .. attribute:: tags
+
+            The IRCv3 message tags as a dict, or `None` if the line
+            had none. Tags without a value map to `True`. They are
+            only parsed the first time they are read, as most hooks
+            never look at them.
+
+        If a message was addressed to the bot in the form of
+        `<nick>: <command> [<args>]`, the bot fills in these two:
+
+        .. attribute:: command
+
+            The first word after the bot's nick.
+
+        .. attribute:: args
+
+            Everything after the command and the following space, or
+            `None` if nothing followed the command.
+
+        .. attribute:: cache
+
+            `None`, or a dict in which hooks keep what they worked out
+            about the event, so that their :func:`Hook.match` and
+            :func:`Hook.call` or other hooks do not have to do it
+            again. Prefix the keys with the plugin name, and use
+            :func:`memo` to fill it.
+
+        The properties :attr:`nick`, :attr:`ident`, :attr:`host`,
+        :attr:`words`, :attr:`lower`, :attr:`is_channel` and
+        :attr:`is_private` are only worked out once per event, no
+        matter how many hooks use them.
     """
 
-    def __init__(self, name=None, user=None, target=None, body=None):
+    __slots__ = ('name', 'user', 'target', 'body', 'params', '_tags',
+                 'command', 'args', 'cache', '_nick', '_ident', '_host')
+
+    # events that only have a body, but no target
+    BODY_ONLY = frozenset(('PING', 'PONG', 'ERROR', 'QUIT', 'AWAY',
+                           'WALLOPS'))
+
+    # interned event names, so that every event shares them
+    NAMES = {}
+
+    TAG_ESCAPES = {':': ';', 's': ' ', '\\': '\\', 'r': '\r', 'n': '\n'}
+
+    # the characters channel names start with
+    CHANNEL_PREFIXES = '#&+!'
+
+    def __init__(self, name=None, user=None, target=None, body=None,
+                 params=None, tags=None):
         self.name = name
         self.user = user
         self.body = body
         self.target = target
+        if params is None:
+            params = tuple(param for param in (target, body)
+                           if param is not None)
+        self.params = params
+        self._tags = tags
+        self.command = None
+        self.args = None
+        self.cache = None
         self._nick = False
-        self._ident = False
-        self._host = False
 
     def __repr__(self):
         return '<alebot.Event %s>' % (self.name)
 
+    @classmethod
+    def parse(cls, line):
+        """
+            Parses a line as received from the server, according to
+            RFC 1459 with IRCv3 message tags, in a single pass:
+
+                `[@tags] [:prefix] <command> [params] [:trailing]`
+
+                :param line: the line without its line ending
+                :returns: an :class:`.Event`, named `UNKNOWN` if the
+                    line does not contain a command.
+        """
+        tags = None
+        user = None
+        if line[:1] == '@':
+            tags, _, line = line.partition(' ')
+            # parsed by the tags property when they are read
+            tags = tags[1:]
+        if line[:1] == ':':
+            user, _, line = line.partition(' ')
+            user = user[1:]
+        line, trailing, last = line.partition(' :')
+        params = line.split()
+        if trailing:
+            params.append(last)
+        if not params:
+            event = cls('UNKNOWN', user, body=line, params=())
+            event._tags = tags
+            return event
+
+        command = params.pop(0)
+        name = cls.NAMES.get(command)
+        if name is None:
+            name = sys.intern(command.upper())
+            if len(cls.NAMES) < 1024:
+                cls.NAMES[command] = name
+        params = tuple(params)
+
+        event = cls.__new__(cls)
+        event.name = name
+        event.user = user
+        event.target = None
+        event.body = None
+        if len(params) > 1:
+            event.target = params[0]
+            event.body = params[-1]
+        elif not params:
+            pass
+        elif name in cls.BODY_ONLY:
+            event.body = params[0]
+        else:
+            event.target = params[0]
+        event.params = params
+        event._tags = tags
+        event.command = None
+        event.args = None
+        event.cache = None
+        event._nick = False
+        return event
+
+    @classmethod
+    def parse_tags(cls, raw):
+        """
+            Parses the tag part of a line (without the leading `@`)
+            into a dict, unescaping the values.
+        """
+        tags = {}
+        for tag in raw.split(';'):
+            key, sep, value = tag.partition('=')
+            if not key:
+                continue
+            if not sep:
+                tags[key] = True
+                continue
+            if '\\' in value:
+                unescaped = []
+                chars = iter(value)
+                for char in chars:
+                    if char == '\\':
+                        char = next(chars, '')
+                        char = cls.TAG_ESCAPES.get(char, char)
+                    unescaped.append(char)
+                value = ''.join(unescaped)
+            tags[key] = value
+        return tags
+
+    @property
+    def tags(self):
+        tags = self._tags
+        if tags.__class__ is str:
+            tags = self._tags = self.parse_tags(tags)
+        return tags
+
     def _splitnickidenthost(self):
+        self._nick = self._ident = self._host = None
         if not self.user:
-            return (None, None, None)
-        split = self.user.split('!')
-        if len(split) == 1:
-            return (None, None, None)
-        nick = split[0]
-        split = split[1].split('@')
-        return (nick, split[0], split[1])
+            return
+        nick, bang, rest = self.user.partition('!')
+        if not bang:
+            return
+        self._nick = nick
+        self._ident, _, self._host = rest.partition('@')
 
     @property
     def nick(self):
         if self._nick is False:
-            self._nick = self._splitnickidenthost()[0]
+            self._splitnickidenthost()
         return self._nick
 
     @property
     def ident(self):
-        if self._ident is False:
-            self._ident = self._splitnickidenthost()[1]
+        if self._nick is False:
+            self._splitnickidenthost()
         return self._ident
 
     @property
     def host(self):
-        if self._host is False:
-            self._host = self._splitnickidenthost[2]
+        if self._nick is False:
+            self._splitnickidenthost()
         return self._host
 
+    def memo(self, key, compute):
+        """
+            Returns the value stored in :attr:`cache` under `key`. If
+            there is none yet, it is computed first.
+
+                :param key: the key, prefixed with the plugin name
+                :param compute: a function that is called with the
+                    event and returns the value
+        """
+        if self.cache is None:
+            self.cache = {}
+        try:
+            return self.cache[key]
+        except KeyError:
+            value = self.cache[key] = compute(self)
+            return value
+
+    @property
+    def words(self):
+        """
+            The words of the :attr:`body` as a tuple, split at
+            whitespace.
+        """
+        return self.memo('words', lambda event: tuple(
+            event.body.split()) if event.body else ())
+
+    @property
+    def lower(self):
+        """
+            The :attr:`body` in lower case.
+        """
+        return self.memo('lower', lambda event: event.body.lower()
+                         if event.body else event.body)
+
+    @property
+    def is_channel(self):
+        """
+            Whether the :attr:`target` is a channel.
+        """
+        return bool(self.target) and \
+            self.target[0] in self.CHANNEL_PREFIXES
+
+    @property
+    def is_private(self):
+        """
+            Whether this is a message or notice sent to the bot
+            directly and not to a channel.
+        """
+        return self.name in ('PRIVMSG', 'NOTICE') and bool(self.target) \
+            and not self.is_channel
+
 
 class Hook(IRCCommandsMixin, object):
 
@@ -171,8 +397,18 @@ class Hook(IRCCommandsMixin, object):
         logger using `self.bot.logger`. It supports python's usual
         logging infrastructure and thus functions like `debug`, `info`,
         `warn` and `error`.
+
+        .. attribute:: events
+
+            An optional tuple of event names (see :attr:`Event.name`)
+            the hook is interested in. The bot will only ever try to
+            :func:`match` events with one of these names against the
+            hook. If it is `None` (the default), the hook will be
+            offered every event.
     """
 
+    events = None
+
     def __init__(self, bot):
         """
             The :func:`__init__` function does not have to be overriden.
@@ -219,6 +455,9 @@ class Hook(IRCCommandsMixin, object):
 
             You can also use a regex or vary matches based on the time
             or the weather. Whatever you want.
+
+            It may also be defined as `async def`, in which case the
+            bot will await it without blocking other hooks.
         """
         raise NotImplementedError()
 
@@ -231,11 +470,14 @@ class Hook(IRCCommandsMixin, object):
 
             Now you are free to send data or do whatever you have to
             do.
+
+            Just like :func:`match` it may be defined as `async def`, so
+            you can await I/O instead of spawning a :class:`.Task`.
         """
         raise NotImplementedError()
 
 
-class Task(threading.Thread):
+class Task(object):
 
     """
         This class can be used to do stuff in the background. It can be
@@ -253,14 +495,36 @@ class Task(threading.Thread):
         You will have to overwrite :func:`do` though. See the
         functions documentation for more information.
 
-        The task can be started using the :func:`start` function.
+        The task can be started using the :func:`start` function. It
+        will then be run by the bot's :class:`.TaskPool`, which limits
+        how many tasks run at once and how many may wait.
     """
 
     def __init__(self, hook, event):
-        threading.Thread.__init__(self)
         self.bot = hook.bot
         self.hook = hook
         self.event = event
+        self.plugin = hook.__class__.__module__
+        self.done = threading.Event()
+
+    def __repr__(self):
+        return '<alebot.Task %s of %s>' % (self.__class__.__name__,
+                                           self.plugin)
+
+    def start(self):
+        """
+            Hands the task over to the bot's task pool.
+
+                :returns: `False` if the pool rejected the task because
+                    its queue is full, `True` otherwise.
+        """
+        return self.bot.tasks.submit(self)
+
+    def join(self, timeout=None):
+        """
+            Waits until the task has been run.
+        """
+        self.done.wait(timeout)
 
     def do(self):
         """
@@ -272,28 +536,41 @@ class Task(threading.Thread):
 
     def run(self):
         """
-            The run function is overwritten to call the do function
-            and catch any exceptions. This way bot crashes should be
-            avoided. So if you would like your bot to be stable, please
-            do not overwrite this, but the :func:`do` function.
+            The run function calls the do function and catches any
+            exceptions. This way bot crashes should be avoided. So if
+            you would like your bot to be stable, please do not
+            overwrite this, but the :func:`do` function.
+
+                :returns: whether :func:`do` succeeded.
         """
         try:
             self.do()
+            return True
         except Exception as e:
-            self.logger.error("Task %s failed: %s" % (self, e))
+            self.bot.logger.error("Task %s failed: %s" % (self, e))
+            return False
+        finally:
+            self.done.set()
 
 
-class Alebot(async_chat, IRCCommandsMixin):
+class Alebot(IRCCommandsMixin):
 
     """
         The main bot class, where all the magic happens.
 
-        This class handles the socket and all incoming and outgoing
-        data. This classes methods should be used for sending data.
+        This class handles the connection and all incoming and outgoing
+        data on an asyncio event loop. This classes methods should be
+        used for sending data.
 
         It keeps an index of loaded plugins and helps with the
         management of requirements.
 
+        Several bots, i.e. for different networks, can run in the same
+        process (see :func:`connect_all`). Plugin modules are shared
+        between them and only imported once, but every bot has its own
+        configuration, logger and hook instances. As the plugins are
+        shared, plugin names have to be unique across all bots.
+
         To interact witht he bot it supplies a hook function that can
         be used to register callbacks with the bot.
 
@@ -309,22 +586,114 @@ class Alebot(async_chat, IRCCommandsMixin):
 
             Holds the bot configuration.
 
+        .. attribute:: settings
+
+            A read only :class:`.Settings` snapshot of the
+            configuration, with defaults filled in and values checked.
+            Prefer it over :attr:`config` in code that runs for every
+            event.
+
+        .. attribute:: name
+
+            The name of the bot, used for its logger. Defaults to the
+            name of the bot's folder. If another bot of the process
+            already has the name, a number is appended, i.e.
+            `network-2`.
+
+        .. attribute:: logger
+
+            The bot's own logger, `alebot.<name>`.
+
+        .. attribute:: plugins
+
+            The names of the plugins this bot uses.
+
+        .. attribute:: manifest
+
+            What the bot knows about its plugins without importing
+            them: their file, its modification time and their hooks
+            with their events and commands, as well as the files and
+            modification times of the plugins they require. It is kept
+            in the `plugins.json` file of the bot path.
+
+        .. attribute:: incoming
+
+            The :class:`.LineBuffer` that cuts the received data into
+            lines and counts them.
+
+        .. attribute:: outgoing
+
+            The :class:`.SendQueue` that holds back outgoing lines
+            according to the flood limits.
+
+        .. attribute:: ingress
+
+            The :class:`.IngressLimiter` that holds back commands of
+            users that send too many.
+
+        .. attribute:: tasks
+
+            The :class:`.TaskPool` that runs the plugins' tasks.
+
+        .. attribute:: nick
+
+            The nick the bot currently uses on the server. It starts
+            out as the configured nick, but might differ from it.
+
+        .. attribute:: casemapping
+
+            The :class:`.CaseMapping` of the server, `rfc1459` until
+            the server announces another one. Use its
+            :func:`CaseMapping.key` to compare nicks and channel names.
+
+        .. attribute:: state
+
+            The :class:`.StateTracker` with the channels the bot is in
+            and their users.
+
         .. attribute:: Hooks
 
-            Registered hooks
+            Registered hooks of all plugins
 
         .. attribute:: Plugins
 
-            Registered modules
+            Registered modules, shared by all bots
+
+        .. attribute:: Files
+
+            The file, modification time and hash of every loaded
+            plugin, to find out which ones changed.
+
+        .. attribute:: Dependencies
+
+            The names of the plugins every plugin requested with
+            :func:`get_plugin`.
+
+        .. attribute:: ImportTimes
+
+            How many seconds the import of every plugin took, not
+            counting the plugins it imported itself.
     """
 
+    # commands that are sent before any queued messages
+    URGENT = frozenset(('PONG', 'PING', 'NICK', 'QUIT', 'PASS', 'USER'))
+    # seconds the coroutines of the hooks get to finish once the
+    # connection is closed
+    CLOSE_TIMEOUT = 10
+
     Hooks = []
     Plugins = {}
+    Files = {}
+    Dependencies = {}
+    ImportTimes = {}
+    _Loading = []
+    # the paths of the bots by their name, see unique_name
+    _Names = {}
     _Paths = None
     path = None
     Logger = logging.getLogger('alebot')
 
-    def __init__(self, path=None, disableLog=False):
+    def __init__(self, path=None, disableLog=False, name=None):
         """
             Initiates the parent and some necessary variables.
 
@@ -332,7 +701,21 @@ class Alebot(async_chat, IRCCommandsMixin):
             hooks and instantiates them.
 
                 :param path: path to the `config.json` and plugins folder.
+                :param name: the name of the bot, see :attr:`name`.
         """
+        # saving the path
+        if path:
+            self.path = path
+        else:
+            self.path = os.getcwd()
+        self.name = self.unique_name(
+            name or os.path.basename(os.path.abspath(self.path)), self.path)
+
+        # every bot logs on its own, so that bots running in the same
+        # process can log to different places
+        self.logger = logging.getLogger('alebot.%s' % self.name)
+        self.logger.propagate = False
+
         # unless we get disableLog we log level info to stdout until reading
         # the config file
         if not disableLog:
@@ -342,21 +725,32 @@ class Alebot(async_chat, IRCCommandsMixin):
             self.logger.addHandler(handler)
             self.logger.setLevel("INFO")
         self.logger.info("Initiation the bot..")
-
-        # saving the path
-        if path:
-            self.path = path
-        else:
-            self.path = os.getcwd()
         self.logger.info("Using '%s' as bot path." % self.path)
 
-        # system crap
-        async_chat.__init__(self)
-        self.set_terminator('\r\n')
-        self.buffer = ''
-
-        # access self.paths to init Alebot.Paths
-        self.paths
+        # connection state, set up once connected
+        self.loop = None
+        self.reader = None
+        self.writer = None
+        self.incoming = LineBuffer()
+        self.outgoing = SendQueue()
+        self.ingress = IngressLimiter()
+        self.pending = set()
+        self.metrics = Metrics(self)
+        self.profiler = Profiler(self)
+        self.casemapping = CaseMapping.get()
+        self.state = StateTracker(self)
+        self._loop_thread = None
+        self._wakeup = None
+
+        # config persistence, see save_config
+        self._config_dirty = False
+        self._config_saving = None
+        self._config_mtime = None
+        self._config_lock = threading.Lock()
+
+        # add the bot's plugins to Alebot.Paths
+        self.Paths(self.path)
+        self.manifest = {}
 
         # load the default config
         self.config = {
@@ -371,9 +765,13 @@ class Alebot(async_chat, IRCCommandsMixin):
             'logFormatter': '%(asctime)s - %(levelname)s - %(message)s',
             'logFile': False
         }
+        self.tasks = None
 
         # load an eventual configuration
         self.load_config()
+        self.nick = self.settings.nick
+        self._command_nick = None
+        self._command_prefix = None
 
         # load plugins
         self.load_plugins()
@@ -381,50 +779,62 @@ class Alebot(async_chat, IRCCommandsMixin):
         # activate plugin hooks
         self.activate_hooks()
 
-    @property
-    def logger(self):
-        """
-            To enable access to the logger from both class- and object
-            methods, this property is available.
-        """
-        return self.__class__.Logger
-
     @classmethod
     def Paths(cls, path=None):
         """
-            The path storage. Use this to get the user & the systempath!
+            The path storage of all the bots in this process. Use this
+            to get the user & the systempath! The system path always
+            comes first.
+
+                :param path: a bot path, whose user plugin folder should
+                    be added.
         """
         if not cls._Paths:
-            paths = []
-
             # add system plugin path
-            if __file__:
-                paths.append(os.path.join(os.path.dirname(__file__),
-                             'plugins'))
-
-            # if an additional path was given, check for user plugins
-            if path:
-                userpath = os.path.join(path, 'plugins')
-                if not os.path.exists(path):
-                    cls.Logger.warn("User plugin path '%s' does not exist!" %
-                                    userpath)
-                elif not os.path.isdir(path):
-                    cls.Logger.warn("User plugin path '%s' is not a dir." %
-                                    userpath)
-                else:
-                    cls.Logger.info("User plugin path '%s' added.", userpath)
-                    paths.append(userpath)
+            cls._Paths = [os.path.join(os.path.dirname(__file__),
+                                       'plugins')]
+
+        # if an additional path was given, check for user plugins
+        if path:
+            userpath = os.path.join(path, 'plugins')
+            if userpath in cls._Paths:
+                pass
+            elif not os.path.exists(userpath):
+                cls.Logger.warning("User plugin path '%s' does not exist!" %
+                                   userpath)
+            elif not os.path.isdir(userpath):
+                cls.Logger.warning("User plugin path '%s' is not a dir." %
+                                   userpath)
             else:
-                cls.Logger.warn("No user plugin path given!")
-            cls._Paths = paths
+                cls.Logger.info("User plugin path '%s' added.", userpath)
+                cls._Paths.append(userpath)
         return cls._Paths
 
     @property
     def paths(self):
         """
-            Shortcut to class-level Paths storage.
+            The plugin paths of this bot: the system path and the bot's
+            own user plugin folder, if it exists.
         """
-        return self.__class__.Paths(self.path)
+        paths = self.Paths()[:1]
+        userpath = os.path.join(self.path, 'plugins')
+        if os.path.isdir(userpath):
+            paths.append(userpath)
+        return paths
+
+    @classmethod
+    def unique_name(cls, name, path):
+        """
+            Returns the name, or the name with a number appended if a
+            bot with another path already uses it in this process, so
+            that bots do not share a logger and its handlers.
+        """
+        path = os.path.abspath(path)
+        unique, number = name, 1
+        while cls._Names.setdefault(unique, path) != path:
+            number += 1
+            unique = '%s-%d' % (name, number)
+        return unique
 
     def configure_logging(self):
         """
@@ -432,7 +842,7 @@ class Alebot(async_chat, IRCCommandsMixin):
             handlers for the logging have to be configured, which is
             what this function does.
         """
-        for handler in self.logger.handlers:
+        for handler in list(self.logger.handlers):
             self.logger.removeHandler(handler)
         self.logger.setLevel(self.config.get('logLevel'))
         formatter = logging.Formatter(self.config.get('logFormatter'))
@@ -445,46 +855,380 @@ class Alebot(async_chat, IRCCommandsMixin):
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
 
-    @classmethod
-    def load_plugins(cls, path=None):
+    def configure_tasks(self):
+        """
+            Sets up the task pool according to the `tasks` section of
+            the configuration, or applies changed limits to the
+            existing one.
+        """
+        config = self.settings.tasks
+        limits = {
+            'workers': config['workers'],
+            'queue_size': config['queueSize'],
+            'overflow': config['overflow'],
+            'per_plugin': config['perPlugin'],
+        }
+        try:
+            if self.tasks is None:
+                self.tasks = TaskPool(logger=self.logger, **limits)
+            else:
+                self.tasks.configure(**limits)
+        except ValueError as e:
+            self.logger.error("Invalid task configuration: %s" % e)
+            if self.tasks is None:
+                self.tasks = TaskPool(logger=self.logger)
+
+    def configure_flood(self):
+        """
+            Applies the `flood` section of the configuration to the
+            send queue.
+        """
+        config = self.settings.flood
+        self.outgoing.configure(
+            lines_per_second=config['linesPerSecond'],
+            burst_lines=config['burstLines'],
+            bytes_per_second=config['bytesPerSecond'],
+            burst_bytes=config['burstBytes'])
+
+    def configure_ingress(self):
+        """
+            Applies the `ingress` section of the configuration to the
+            ingress limiter.
+        """
+        config = self.settings.ingress
+        self.ingress.configure(
+            lines_per_second=config['linesPerSecond'],
+            burst_lines=config['burstLines'],
+            channel_lines_per_second=config['channelLinesPerSecond'],
+            channel_burst_lines=config['channelBurstLines'],
+            action=config['action'],
+            max_delay=config['maxDelay'],
+            max_deferred=config['maxDeferred'],
+            size=config['tableSize'])
+
+    def load_plugins(self):
+        """
+            Will load all the plugins from the bot's plugin folders. It
+            will only load them though! The plugins still have to
+            register themselves with the :func:`hook` function, if they
+            want to interact with the bot.
+
+            Plugins that were already imported, i.e. by another bot in
+            the same process, are not imported again. Use
+            :func:`unload_plugins` first to import them anew.
+
+            Unless the `lazyPlugins` setting is `false`, plugins whose
+            file did not change since the :attr:`manifest` was written
+            are not imported right away, but once one of their hooks is
+            offered an event (see :class:`.LazyHook`) or another plugin
+            requires them. This only works for plugins whose hooks all
+            declare their :attr:`Hook.events`.
+        """
+        self.manifest = self.read_manifest()
+        lazy = self.settings.lazyPlugins
+        isolated = self.settings.processPlugins
+        self.plugins = []
+        started = time.perf_counter()
+        imported = []
+        for _, name, _ in pkgutil.iter_modules(self.paths):
+            if name not in self.Plugins and lazy and \
+                    name not in isolated and self.is_lazy(name):
+                self.plugins.append(name)
+                continue
+            if name not in self.Plugins:
+                imported.append(name)
+            if self.load_plugin(name, logger=self.logger):
+                self.plugins.append(name)
+        self.write_manifest()
+        if imported:
+            self.logger.info("Imported %d plugins in %.1f ms: %s" % (
+                len(imported), (time.perf_counter() - started) * 1000,
+                ', '.join('%s %.1f ms' % (name,
+                                          self.ImportTimes[name] * 1000)
+                          for name in sorted(
+                              imported, key=self.ImportTimes.get,
+                              reverse=True))))
+
+    def is_lazy(self, name):
+        """
+            Whether the plugin can be loaded lazily: its manifest entry
+            is up to date and all its hooks declared their events.
+
+            The entry is out of date as well if a plugin it requires,
+            directly or not, changed, as its hooks might inherit their
+            events or command from that plugin.
+        """
+        entry = self.manifest.get(name)
+        if not entry or 'stamps' not in entry:
+            return False
+        stamps = [(entry['file'], entry['mtime'])]
+        stamps.extend(entry['stamps'].values())
+        try:
+            for pathname, mtime in stamps:
+                if os.path.getmtime(pathname) != mtime:
+                    return False
+        except OSError:
+            return False
+        return all(hook['events'] is not None for hook in entry['hooks'])
+
+    def wake_plugin(self, name, hook):
         """
-            Will load all the plugins from the plugin folder. It will
-            only load them though! The plugins still have to register
-            themselves with the :func:`hook` function, if they want to
-            interact with the bot.
+            Imports a lazily loaded plugin and activates its hooks.
 
-            This function does not do anything yet. Plugins have to be
-            in the the same file as the bot itself.
+                :param name: the name of the plugin
+                :param hook: the class name of one of its hooks
+                :returns: the active instance of that hook, or `None`
+                    if the plugin could not be imported.
+        """
+        if name not in self.Plugins:
+            if not self.load_plugin(name, logger=self.logger):
+                self.plugins.remove(name)
+                self.activate_hooks()
+                return None
+            self.logger.info("Woke up plugin '%s' in %.1f ms." %
+                             (name, self.ImportTimes[name] * 1000))
+            self.write_manifest()
+        for instance in self.hooks:
+            if instance.__class__.__module__ == name and \
+                    instance.__class__.__name__ == hook:
+                return instance
+        self.activate_hooks()
+        for instance in self.hooks:
+            if instance.__class__.__module__ == name and \
+                    instance.__class__.__name__ == hook:
+                return instance
+        return None
+
+    def read_manifest(self):
+        """
+            Reads the plugin manifest from the bot path.
+        """
+        if not self.path:
+            return {}
+        try:
+            with open(os.path.join(self.path, 'plugins.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_manifest(self):
+        """
+            Updates the manifest with all the imported plugins of the
+            bot and writes it to the bot path, if anything changed.
+            Plugins the bot no longer has are left out.
+        """
+        manifest = dict((name, entry) for name, entry
+                        in self.manifest.items() if name in self.plugins)
+        for name in self.plugins:
+            if name not in self.Plugins or name not in self.Files:
+                continue
+            pathname, mtime, _ = self.Files[name]
+            manifest[name] = {
+                'file': pathname,
+                'mtime': mtime,
+                'hooks': [{
+                    'name': Hook.__name__,
+                    'events': list(Hook.events)
+                    if Hook.events is not None else None,
+                    'command': getattr(Hook, 'command', None),
+                } for Hook in self.Hooks if Hook.__module__ == name],
+                'requires': sorted(self.Dependencies.get(name, ())),
+                'stamps': dict(
+                    (required, list(self.Files[required][:2]))
+                    for required in self.requirements(name)
+                    if required in self.Files),
+            }
+        if manifest == self.manifest or not self.path:
+            return
+        self.manifest = manifest
+        path = os.path.join(self.path, 'plugins.json')
+        try:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(manifest, f, indent=4, sort_keys=True)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            self.logger.warning("Could not write plugin manifest: %s" % e)
+
+    @classmethod
+    def unload_plugins(cls):
+        """
+            Forgets all the loaded plugins and their hooks, so that
+            they are imported anew by the next :func:`load_plugins`.
+            Bots keep their current hook instances until they call
+            :func:`activate_hooks`.
         """
         cls.Hooks = []
         cls.Plugins = {}
+        cls.Files = {}
+        cls.Dependencies = {}
+        cls.ImportTimes = {}
 
-        for _, name, _ in pkgutil.iter_modules(cls.Paths()):
-            cls.load_plugin(name)
+    def reload_plugins(self):
+        """
+            Re-imports only the plugins whose files changed since they
+            were loaded, together with all the plugins that depend on
+            them, and picks up new plugins. The hooks of all the other
+            plugins keep their instances, and thus their state.
+
+            A plugin that cannot be imported anymore keeps its previous
+            version, if it had one, until its file is changed again.
+
+                :returns: the names of the plugins that were imported.
+        """
+        stale = self.dependents(self.changed_plugins())
+        previous = {}
+        for name in stale:
+            previous[name] = (
+                self.Plugins.pop(name, None),
+                [Hook for Hook in self.Hooks if Hook.__module__ == name],
+                self.Dependencies.get(name, set()))
+        loaded = set(self.Plugins)
+        restored = set()
+        for name in sorted(stale):
+            entry = self.Files.get(name)
+            if entry is not None and not os.path.exists(entry[0]):
+                # removed plugins are simply not loaded anymore
+                del self.Files[name]
+                self.Dependencies.pop(name, None)
+                continue
+            if previous[name][0] is None:
+                # it never could be imported, load_plugins tries again
+                self.Dependencies.pop(name, None)
+                continue
+            try:
+                plugin = self.load_plugin(name, logger=self.logger)
+            except ImportError as e:
+                self.logger.warning("Could not load plugin '%s': %s" %
+                                    (name, e))
+                plugin = None
+            if plugin is None:
+                self.restore_plugin(name, *previous[name])
+                restored.add(name)
+        self.load_plugins()
+        self.activate_hooks()
+        return sorted(set(self.Plugins) - loaded - restored)
+
+    @classmethod
+    def restore_plugin(cls, name, plugin, Hooks, requires):
+        """
+            Puts back the previous version of a plugin, with its hooks
+            and dependencies, after importing it anew failed.
+        """
+        cls.Hooks = [Hook for Hook in cls.Hooks if Hook.__module__ != name]
+        cls.Hooks.extend(Hooks)
+        cls.Plugins[name] = plugin
+        cls.Dependencies[name] = requires
+        sys.modules[name] = plugin
 
     @classmethod
-    def load_plugin(cls, name, path=[]):
+    def changed_plugins(cls):
+        """
+            Returns the names of the loaded plugins whose files were
+            changed or removed. Files whose modification time changed
+            are only considered changed if their content did, too.
+        """
+        changed = set()
+        for name, (pathname, mtime, digest) in list(cls.Files.items()):
+            try:
+                if os.path.getmtime(pathname) == mtime:
+                    continue
+                if cls.file_digest(pathname) == digest:
+                    cls.Files[name] = (pathname, os.path.getmtime(pathname),
+                                       digest)
+                    continue
+            except OSError:
+                pass
+            changed.add(name)
+        return changed
+
+    @classmethod
+    def requirements(cls, name):
+        """
+            Returns the names of all the plugins the plugin requires,
+            directly or not.
+        """
+        result = set()
+        pending = [name]
+        while pending:
+            for required in cls.Dependencies.get(pending.pop(), ()):
+                if required not in result and required != name:
+                    result.add(required)
+                    pending.append(required)
+        return result
+
+    @classmethod
+    def dependents(cls, names):
+        """
+            Returns the given plugin names together with the names of
+            all the plugins that depend on them, directly or not.
+        """
+        result = set(names)
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            for plugin, requires in cls.Dependencies.items():
+                if name in requires and plugin not in result:
+                    result.add(plugin)
+                    pending.append(plugin)
+        return result
+
+    @staticmethod
+    def file_digest(pathname):
+        """
+            Returns a hash of a plugin file's content.
+        """
+        with open(pathname, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    @classmethod
+    def load_plugin(cls, name, path=[], logger=None):
         """
             Load a specific plugin. This will try to find a specific
             plugin, load it and save it to the :class:`.Alebot` class,
             so that it can be retrieved later on.
 
             It will also make sure, that plugins are only loaded once.
+
+                :returns: the plugin module or `None` if it could not
+                    be loaded.
         """
+        logger = logger or cls.Logger
+        if cls.Plugins.get(name):
+            return cls.Plugins[name]
         if not path:
             path = cls.Paths()
-        fid, pathname, desc = imp.find_module(name, path)
-        if cls.Plugins.get(name):
-            return
+        spec = importlib.machinery.PathFinder.find_spec(name, path)
+        if spec is None:
+            raise ImportError("No plugin named '%s'" % name)
+        pathname = spec.origin
+        plugin = None
+        # forget hooks and dependencies of an earlier import
+        cls.Hooks = [Hook for Hook in cls.Hooks if Hook.__module__ != name]
+        cls.Dependencies[name] = set()
+        # the time spent importing required plugins is added to the
+        # second item, so that it can be left out
+        cls._Loading.append([name, 0.0])
+        started = time.perf_counter()
         try:
-            plugin = imp.load_module(name, fid, pathname, desc)
+            plugin = importlib.util.module_from_spec(spec)
+            sys.modules[name] = plugin
+            spec.loader.exec_module(plugin)
             cls.Plugins[name] = plugin
-            cls.Logger.info("Loaded plugin '%s' from '%s'" % (name, pathname))
+            if os.path.isfile(pathname):
+                cls.Files[name] = (pathname, os.path.getmtime(pathname),
+                                   cls.file_digest(pathname))
+            logger.info("Loaded plugin '%s' from '%s'" % (name, pathname))
         except Exception as e:
-            cls.Logger.warning("Could not load plugin '%s': %s" %
-                               (pathname, e))
-        if fid:
-            fid.close()
+            sys.modules.pop(name, None)
+            plugin = None
+            logger.warning("Could not load plugin '%s': %s" %
+                           (pathname, e))
+        finally:
+            elapsed = time.perf_counter() - started
+            cls.ImportTimes[name] = elapsed - cls._Loading.pop()[1]
+            if cls._Loading:
+                cls._Loading[-1][1] += elapsed
+        return plugin
 
     @classmethod
     def get_plugin(cls, name):
@@ -494,7 +1238,12 @@ class Alebot(async_chat, IRCCommandsMixin):
             to it with this function. If the plugin has not been
             loaded yet, it will try to load it. If it fails or does
             not exist, the requiring plugin will also fail to load.
+
+            The requiring plugin is remembered as depending on the
+            plugin, so it is reloaded whenever the plugin is.
         """
+        if cls._Loading:
+            cls.Dependencies[cls._Loading[-1][0]].add(name)
         if not cls.Plugins.get(name):
             cls.load_plugin(name)
         return cls.Plugins[name]
@@ -520,38 +1269,173 @@ class Alebot(async_chat, IRCCommandsMixin):
             are encouraged to specifiy plugin objects with own
             configuration, as long as they make sure to use a specific
             name to avoid conflicts.
+
+                :returns: the names of the options that changed.
         """
         error = False
         path = os.path.join(self.path, 'config.json')
+        changed = []
         try:
+            mtime = os.path.getmtime(path)
             f = open(path, 'r')
             config = json.load(f)
             f.close()
-            self.config = dict(self.config.items() + config.items())
+            merged = dict(self.config)
+            merged.update(config)
+            changed = [key for key in merged
+                       if self.config.get(key) != merged[key]]
+            self.config = merged
+            self._config_mtime = mtime
         except Exception as e:
             error = e
             config = False
 
         # we need this little workaround to make sure that the config loading
         # is logged according to the given settings.
+        self.update_settings()
         self.configure_logging()
+        first = self.tasks is None
+        self.configure_tasks()
+        # configuring the limiters forgets their buckets, so they are left
+        # alone unless their own section changed
+        if first or 'flood' in changed:
+            self.configure_flood()
+        if first or 'ingress' in changed:
+            self.configure_ingress()
         if config:
             self.logger.info("Configuration loaded.")
         else:
             self.logger.info("No configuration loaded: %s" % error)
+        return changed
+
+    def update_settings(self):
+        """
+            Builds a new :attr:`settings` snapshot from the
+            configuration. Call this whenever you changed the
+            :attr:`config` dict, the bot does so when it loads it.
+        """
+        self.settings = Settings(self.config)
+        for error in self.settings.errors:
+            self.logger.warning(error)
+
+    def set_casemapping(self, name):
+        """
+            Switches to the casemapping the server announced and
+            re-keys the :attr:`state` with it. Unknown casemappings are
+            ignored.
+        """
+        casemapping = CaseMapping.get(name)
+        if casemapping is None:
+            self.logger.warning("Unknown casemapping '%s', keeping '%s'." %
+                                (name, self.casemapping.name))
+            return
+        if casemapping is self.casemapping:
+            return
+        self.casemapping = casemapping
+        if self.state is not None:
+            self.state.rekey()
+        self.logger.info("Using casemapping '%s'." % name)
 
     def save_config(self):
         """
-            Save the current configuration to file.
+            Save the current configuration to the `config.json` file in
+            the bot path.
+
+            While the bot is running, the file is not written right
+            away, but in a background thread after the number of
+            seconds in the `saveDelay` setting (default: 1), so that
+            several changes in a row are saved at once. It is safe to
+            call this from a :class:`.Task` or any other thread.
+        """
+        self._config_dirty = True
+        if self.loop is None:
+            self.flush_config()
+        elif threading.get_ident() != self._loop_thread:
+            self.loop.call_soon_threadsafe(self.save_config)
+        elif self._config_saving is None:
+            self._config_saving = self.spawn(self.save_config_later())
+
+    async def save_config_later(self):
+        """
+            Waits for more changes and then writes the configuration
+            as long as it changed in the meantime.
         """
+        try:
+            await asyncio.sleep(self.settings.saveDelay)
+            while self._config_dirty:
+                self._config_dirty = False
+                data = json.dumps(self.config, indent=4)
+                await self.loop.run_in_executor(None, self.write_config,
+                                                data)
+        finally:
+            self._config_saving = None
+
+    def flush_config(self):
+        """
+            Writes the configuration right away, if there are unsaved
+            changes.
+        """
+        if self._config_dirty:
+            self._config_dirty = False
+            self.write_config(json.dumps(self.config, indent=4))
+
+    async def save_config_now(self):
+        """
+            Writes the configuration in a background thread right away,
+            without waiting for further changes like
+            :func:`save_config` does.
+
+                :returns: whether the configuration was written.
+        """
+        self._config_dirty = False
+        data = json.dumps(self.config, indent=4)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.write_config, data)
+
+    def write_config(self, data):
+        """
+            Writes the serialized configuration to a temporary file
+            and then replaces `config.json` with it, so that the file
+            is never left half written.
 
+                :returns: whether the configuration was written.
+        """
+        path = os.path.join(self.path, 'config.json')
         try:
-            f = open('config.json', 'w')
-            json.dump(self.config, f, indent=4)
-            f.close()
+            with self._config_lock:
+                with open(path + '.tmp', 'w') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + '.tmp', path)
+                self._config_mtime = os.path.getmtime(path)
             self.logger.info("Configuration saved.")
+            return True
         except Exception as e:
-            self.logger.info("Configuration could not be saved: %s" % e)
+            self.logger.error("Configuration could not be saved: %s" % e)
+            return False
+
+    async def watch_config(self, interval):
+        """
+            Checks the `config.json` file for changes every `interval`
+            seconds. If it was changed by anybody but the bot, it is
+            loaded again and a `CONFIG` event is sent, with the names
+            of the options that changed as its :attr:`Event.params`.
+        """
+        path = os.path.join(self.path, 'config.json')
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if mtime == self._config_mtime or self._config_saving:
+                continue
+            changed = self.load_config()
+            if changed:
+                self.logger.info("Configuration changed: %s" %
+                                 ', '.join(changed))
+                self.call_hooks(Event('CONFIG', params=tuple(changed)))
 
     @classmethod
     def hook(cls, Hook):
@@ -570,31 +1454,397 @@ class Alebot(async_chat, IRCCommandsMixin):
 
     def activate_hooks(self):
         """
-            Will instantiate all the loaded hooks.
+            Will instantiate all the loaded hooks of the bot's plugins
+            and index them by the event names they declared (see
+            :attr:`Hook.events`).
+
+            The hooks of plugins listed in the `processPlugins` setting
+            are run in worker processes instead, see
+            :class:`.PluginProcess`.
+
+            Hooks that were already active keep their instance, only
+            hooks of new or reloaded plugins are instantiated. Plugins
+            that are not imported yet get a :class:`.LazyHook` for each
+            of their hooks.
         """
-        self.hooks = []
+        from .lazy import LazyHook
+        from .process import PluginProcess
+
+        previous = getattr(self, 'hooks', [])
+        instances = {}
+        for hook in previous:
+            if isinstance(hook, PluginProcess):
+                instances[(hook.plugin, tuple(hook.classes))] = hook
+            elif isinstance(hook, LazyHook):
+                instances[(hook.plugin, hook.name)] = hook
+            else:
+                instances[hook.__class__] = hook
+
+        isolated = self.settings.processPlugins
+        hooks = []
+        separate = {}
         for Hook in Alebot.Hooks:
-            self.hooks.append(Hook(self))
+            plugin = Hook.__module__
+            if plugin not in self.plugins:
+                continue
+            if plugin in isolated:
+                separate.setdefault(plugin, []).append(Hook)
+            elif Hook in instances:
+                hooks.append(instances.pop(Hook))
+            else:
+                hooks.append(Hook(self))
+        for plugin, Hooks in separate.items():
+            key = (plugin, tuple(Hooks))
+            if key in instances:
+                hooks.append(instances.pop(key))
+            else:
+                hooks.append(PluginProcess(self, plugin, Hooks))
+        for plugin in self.plugins:
+            if plugin in self.Plugins:
+                continue
+            for entry in self.manifest[plugin]['hooks']:
+                key = (plugin, entry['name'])
+                if key in instances:
+                    hooks.append(instances.pop(key))
+                else:
+                    hooks.append(LazyHook(self, plugin, entry))
+        self.hooks = hooks
+        self.index_hooks()
+        if self.metrics is not None:
+            self.metrics.forget(hooks)
 
-    def call_hooks(self, event):
+        for hook in instances.values():
+            if isinstance(hook, PluginProcess):
+                hook.stop()
+
+    def index_hooks(self):
         """
-            Will check through all instantiated plugins and call the
-            ones that match the given event.
+            Builds the dispatch index used by :func:`call_hooks`. Every
+            declared event name maps to the list of hooks that want it,
+            including all catch-all hooks, in the order they were
+            registered. Events nobody declared only go to the catch-all
+            hooks.
+
+            Hooks with a `command` only get the `PRIVMSG` events with
+            that command. Hooks that stand in for several command hooks,
+            like a :class:`.PluginProcess`, have a set of `commands`
+            instead; they get the `PRIVMSG` events with one of these
+            commands and all the other events they declared.
+
+            The index is built aside and swapped in at once, so a
+            reload from within a hook does not disturb the dispatch
+            that is currently running.
         """
+        catchall = []
+        names = set()
+        commands = {}
+        hooks = []
         for hook in self.hooks:
+            command = getattr(hook, 'command', None)
+            if command is not None:
+                commands.setdefault(command, []).append(hook)
+                continue
+            hooks.append(hook)
+            if hook.events is None:
+                catchall.append(hook)
+            else:
+                names.update(hook.events)
+            for command in getattr(hook, 'commands', None) or ():
+                commands.setdefault(command, []).append(hook)
+        if commands:
+            names.add('PRIVMSG')
+        index = {}
+        for name in names:
+            index[name] = [hook for hook in hooks
+                           if (hook.events is None or name in hook.events)
+                           and not (name == 'PRIVMSG' and
+                                    getattr(hook, 'commands', None))]
+        self.hooks_catchall = catchall
+        self.hooks_index = index
+        self.hooks_commands = commands
+
+    def route_command(self, event):
+        """
+            Checks whether a `PRIVMSG` was addressed to the bot in
+            the form of `<nick>: <command> [<args>]`, with the nick in
+            any case. If so, the :attr:`Event.command` and
+            :attr:`Event.args` attributes are filled in and the command
+            is returned.
+
+            The message is only parsed once, no matter how many
+            command hooks are loaded: they are looked up by their
+            `command` attribute afterwards.
+        """
+        if event.command is not None:
+            return event.command
+        if self.nick != self._command_nick:
+            self._command_nick = self.nick
+            self._command_prefix = '%s: ' % self.nick
+        body = event.body
+        if not body:
+            return None
+        if not body.startswith(self._command_prefix):
+            # the nick may be spelled in another case, only fold it if
+            # the message looks like a command at all
+            length = len(self._command_prefix)
+            if body[length - 2:length] != ': ' or \
+                    self.casemapping.lower(body[:length - 2]) != \
+                    self.casemapping.key(self.nick):
+                return None
+        command, sep, args = body[len(self._command_prefix):].partition(' ')
+        if not command:
+            return None
+        event.command = command
+        event.args = args if sep else None
+        return command
+
+    def call_hooks(self, event):
+        """
+            Will check through all instantiated plugins that are
+            interested in the event's name and call the ones that
+            match the given event.
+
+            Command hooks are only tried if the event carries their
+            command (see :func:`route_command`), and only once the
+            :attr:`ingress` limits allow it (see :func:`admit`). All the
+            other hooks get every event right away.
+        """
+        self.run_hooks(
+            self.hooks_index.get(event.name, self.hooks_catchall), event)
+        if event.name == 'PRIVMSG' and self.route_command(event):
+            hooks = self.hooks_commands.get(event.command)
+            if hooks and self.admit(event):
+                self.run_hooks(hooks, event)
+
+    def run_hooks(self, hooks, event):
+        """
+            Matches the event against the given hooks and calls the
+            matching ones.
+
+            Hooks with `async def` :func:`Hook.match` or
+            :func:`Hook.call` functions are handed over to the event
+            loop (see :func:`spawn`), so they never hold up the hooks
+            after them.
+        """
+        metrics = self.metrics if self.settings.metricsEnabled else None
+        clock = Metrics.clock
+        for hook in hooks:
+            stats = None
             try:
-                if (hook.match(event)):
-                    hook.call(event)
+                if metrics is not None:
+                    stats = metrics.hook(hook)
+                    started = clock()
+                    matched = hook.match(event)
+                    stats.match.observe(clock() - started)
+                else:
+                    matched = hook.match(event)
+                if inspect.isawaitable(matched):
+                    self.spawn(self.finish_hook(hook, event, matched,
+                                                stats=stats))
+                elif matched:
+                    if stats is not None:
+                        started = clock()
+                    called = hook.call(event)
+                    if inspect.isawaitable(called):
+                        self.spawn(self.finish_hook(hook, event, True,
+                                                    called, stats))
+                    elif stats is not None:
+                        stats.call.observe(clock() - started)
             except Exception as e:
+                if stats is not None:
+                    stats.errors += 1
                 self.logger.error("Hook %s failed: %s" % (hook, e))
 
+    async def finish_hook(self, hook, event, matched, called=None,
+                          stats=None):
+        """
+            Awaits whatever is left of an asynchronous hook: its
+            pending :func:`Hook.match` and then its :func:`Hook.call`.
+            If `stats` are given, the time until the call is done is
+            recorded in them.
+        """
+        started = Metrics.clock()
+        try:
+            if inspect.isawaitable(matched):
+                matched = await matched
+            if not matched:
+                return
+            if called is None:
+                called = hook.call(event)
+            if inspect.isawaitable(called):
+                await called
+            if stats is not None:
+                stats.call.observe(Metrics.clock() - started)
+        except Exception as e:
+            if stats is not None:
+                stats.errors += 1
+            self.logger.error("Hook %s failed: %s" % (hook, e))
+
+    def spawn(self, coroutine):
+        """
+            Runs a coroutine in the background on the bot's event loop.
+            If the bot is not running, it runs on the event loop of the
+            caller, or to completion right away if there is none.
+        """
+        loop = self.loop
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(coroutine)
+        task = loop.create_task(coroutine)
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        return task
+
     def connect(self):
         """
-            Creates a socket and kicks off the connection process.
+            Connects to the server and runs the bot on an asyncio event
+            loop until the connection is closed.
+        """
+        asyncio.run(self.run())
+
+    @staticmethod
+    def connect_all(bots):
+        """
+            Connects several bots, i.e. to different networks, and runs
+            them all on one asyncio event loop until all connections
+            are closed. A bot that fails does not take the others down.
+
+                :param bots: the :class:`.Alebot` instances
+        """
+        async def run_all():
+            results = await asyncio.gather(*[bot.run() for bot in bots],
+                                           return_exceptions=True)
+            for bot, result in zip(bots, results):
+                if isinstance(result, Exception):
+                    bot.logger.error("Bot %s failed: %s" % (bot.name, result))
+        asyncio.run(run_all())
+
+    async def run(self):
+        """
+            Opens the connection and processes incoming lines until the
+            server closes it. Use this instead of :func:`connect` if
+            you want to run the bot on an event loop of your own.
+        """
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._wakeup = asyncio.Event()
+        if self.settings.processPlugins:
+            # the workers are stopped whenever the connection closes
+            self.activate_hooks()
+        self.reader, self.writer = await asyncio.open_connection(
+            self.settings.server, self.settings.port)
+        writing = self.loop.create_task(self.write_outgoing())
+        if self.outgoing:
+            self._wakeup.set()
+        watching = None
+        watch = self.settings.watchConfig
+        if watch:
+            watching = self.loop.create_task(self.watch_config(
+                2 if watch is True else watch))
+        settings = self.settings
+        if settings.metricsPort is not None or settings.metricsSocket:
+            try:
+                await self.metrics.serve(settings.metricsHost,
+                                         settings.metricsPort,
+                                         settings.metricsSocket)
+            except OSError as e:
+                self.logger.error("Could not serve metrics: %s" % e)
+        self.handle_signals()
+        closed = False
+        try:
+            self.handle_connect()
+            while True:
+                data = await self.reader.read(65536)
+                if not data:
+                    break
+                for line in self.incoming.feed(data):
+                    self.handle_line(line.decode('utf-8', 'replace'))
+            closed = True
+        finally:
+            writing.cancel()
+            if watching:
+                watching.cancel()
+            self.metrics.close()
+            self.profiler.stop()
+            if self.profiler.writing is not None:
+                writing, self.profiler.writing = self.profiler.writing, None
+                await writing
+            if self._config_saving:
+                self._config_saving.cancel()
+            self.writer.close()
+            self.state.clear()
+            if closed:
+                self.call_hooks(Event('SOCK_CLOSED'))
+            processes = self.detach_processes()
+            if processes:
+                await self.loop.run_in_executor(None, self.stop_processes,
+                                                processes)
+            await self.finish_pending(self.CLOSE_TIMEOUT)
+            self.loop = None
+            self.flush_config()
+
+    def detach_processes(self):
+        """
+            Takes the :class:`.PluginProcess` hooks out of the dispatch
+            and returns them, so they can be stopped. They are started
+            anew by :func:`activate_hooks`.
+        """
+        from .process import PluginProcess
+
+        processes = [hook for hook in self.hooks
+                     if isinstance(hook, PluginProcess)]
+        if processes:
+            self.hooks = [hook for hook in self.hooks
+                          if not isinstance(hook, PluginProcess)]
+            self.index_hooks()
+        return processes
+
+    @staticmethod
+    def stop_processes(processes):
+        """
+            Stops the worker processes, after they got the events that
+            were sent to them already. This blocks, so :func:`run` calls
+            it in the executor.
         """
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        async_chat.connect(self, (self.config['server'], self.config['port']))
-        asyncore.loop()
+        for process in processes:
+            process.stop()
+
+    async def finish_pending(self, timeout):
+        """
+            Waits up to `timeout` seconds for the coroutines started
+            with :func:`spawn`, i.e. by the hooks of `SOCK_CLOSED`, and
+            cancels those that are still running then.
+        """
+        if not self.pending:
+            return
+        done, running = await asyncio.wait(set(self.pending),
+                                           timeout=timeout)
+        for task in running:
+            task.cancel()
+        if running:
+            self.logger.warning("Cancelled %d tasks that did not finish "
+                                "in time." % len(running))
+            await asyncio.wait(running)
+
+    def handle_signals(self):
+        """
+            Makes `SIGUSR1` start and stop a `cpu` profile and
+            `SIGUSR2` a `sample` profile (see :class:`.Profiler`), where
+            the platform has these signals. With several bots in one
+            process, the signals go to the bot that connected last.
+        """
+        for name, mode in (('SIGUSR1', Profiler.CPU),
+                           ('SIGUSR2', Profiler.SAMPLE)):
+            number = getattr(signal, name, None)
+            if number is None:
+                continue
+            try:
+                self.loop.add_signal_handler(number, self.profiler.toggle,
+                                             mode)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
 
     def handle_connect(self):
         """
@@ -605,71 +1855,111 @@ class Alebot(async_chat, IRCCommandsMixin):
         event = Event('SOCK_CONNECTED')
         self.call_hooks(event)
 
-    def collect_incoming_data(self, data):
-        """
-            Collects the incoming data and adds it to the buffer.
-
-            :param data: The received data from the server.
-
-            **Please do not use this function manually! It is only
-            to be used by asnchat!**
-        """
-        self.buffer += data
-
-    def found_terminator(self):
+    def handle_line(self, line):
         """
             As IRC is a line based protocol which means every command
             is in its own line, this function is called as soon as a
             line and thus a command has been completely received.
 
-            The line is read from the buffer and the buffer cleared.
-
-            The function only does very basic syntax correction, to
-            clear up input that does not match the usual format.
-
-            I.e. a PING command does not follow the usual syntax.
-
-            Thusly the function will get the relevant parameter and
-            fill it into the usual structure.
+            The line is parsed by :func:`Event.parse` and the
+            resulting event passed on to the :class:`.StateTracker`,
+            and then to the func:`call_hooks` function.
 
-            This function will call the func:`call_hooks` function with
-            the extracted data.
+                :param line: the received line without the line ending.
         """
+        if not line:
+            return
+        event = Event.parse(line)
+        self.state.update(event)
+        self.call_hooks(event)
 
-        line = self.buffer
-        self.buffer = ''
-
-        line = line.split(' ', 3)
-
-        event = Event()
-
-        if (line[0][0] == ':'):
-
-            event.user = line[0][1:]
-            event.name = line[1]
-            event.target = line[2]
-
-            if(len(line) >= 4):
-                event.body = line[3][1:]
-
-        elif (line[0] == 'PING'):
-            event.name = line[0]
-            event.body = line[1][1:]
-        elif (line[0] == 'ERROR'):
-            event.name = 'ERROR'
-            event.body = ' '.join(line[1:])[1:]
-        else:
-            event.name = 'UNKNOWN'
-            event.body = ' '.join(line)
+    def admit(self, event):
+        """
+            Asks the :attr:`ingress` limiter whether the command may be
+            handed to its command hooks right away. Commands that are
+            deferred are handed over later, when the limits allow it.
+            Admins (the `auth.admins` masks) are never limited.
 
-        self.call_hooks(event)
+                :returns: whether to call the command hooks now.
+        """
+        ingress = self.ingress
+        if not ingress.enabled:
+            return True
+        admins = self.settings.admins
+        admins.set_lower(self.casemapping.lower)
+        if admins.match(event.user):
+            ingress.bypassed += 1
+            return True
+        channel = None
+        if event.is_channel:
+            channel = self.casemapping.key(event.target)
+        # without a running loop there is nothing to defer to
+        delay = ingress.check(self.casemapping.lower(event.user or ''),
+                              channel, defer=self.loop is not None)
+        if delay == 0:
+            return True
+        if delay is not None:
+            self.loop.call_later(delay, self.call_deferred, event)
+            return False
+        self.logger.debug("Dropped command '%s' of %s." % (event.command,
+                                                           event.user))
+        return False
+
+    def call_deferred(self, event):
+        """
+            Hands a command that was held back by the :attr:`ingress`
+            limiter to its command hooks. The other hooks had the event
+            already.
+        """
+        self.ingress.waiting -= 1
+        self.run_hooks(self.hooks_commands.get(event.command, ()), event)
 
     def send_raw(self, data):
         """
             Sends raw commands to the server. Only adds CLRF as a suffix.
 
+            The line is queued and written as soon as the flood limits
+            and the connection allow it. Commands listed in
+            :attr:`URGENT` skip the line of queued messages. It is safe
+            to call this from a :class:`.Task` or any other thread.
+
             :param data: the IRC command and body to send, fully
                 formatted as such.
         """
         crlfed = '%s\r\n' % data
-        self.push(crlfed.encode('utf-8', 'ignore'))
+        line = crlfed.encode('utf-8', 'ignore')
+        urgent = data.split(' ', 1)[0].upper() in self.URGENT
+        if self.loop is not None and \
+                threading.get_ident() != self._loop_thread:
+            self.loop.call_soon_threadsafe(self.push, line, urgent)
+        else:
+            self.push(line, urgent)
+
+    def push(self, line, urgent=False):
+        """
+            Queues an encoded line for sending. Must be called from the
+            event loop's thread, use :func:`send_raw` otherwise.
+        """
+        self.outgoing.push(line, urgent)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def write_outgoing(self):
+        """
+            Writes queued lines to the connection as fast as the flood
+            limits allow. After every batch it waits for the transport
+            to drain, so a slow connection slows down the writing
+            instead of piling up data in memory.
+        """
+        while True:
+            delay = self.outgoing.delay()
+            if delay is None:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            while self.outgoing.delay() == 0:
+                self.writer.write(self.outgoing.pop())
+            await self.writer.drain()
@@ -0,0 +1,129 @@
+import time
+
+
+class LineBuffer(object):
+
+    """
+        Collects the data received from the server and cuts it into
+        lines. Every chunk of data is split in one go, no matter how
+        many lines it contains, and only an incomplete last line is
+        kept around until the rest of it arrives.
+
+            :param max_length: the longest line accepted (in bytes,
+                without the line ending). Longer lines are thrown away
+                as a whole.
+            :param shrink_above: once a partial line made the buffer
+                grow beyond this many bytes, it is replaced with a
+                fresh one as soon as it is empty again, so a single
+                burst does not keep its memory around.
+            :param interval: how often (in seconds) the rates are
+                updated.
+
+        .. attribute:: bytes_per_second
+
+            The received bytes per second over the last interval.
+
+        .. attribute:: lines_per_second
+
+            The received lines per second over the last interval.
+    """
+
+    def __init__(self, max_length=16384, shrink_above=65536, interval=10):
+        self.max_length = max_length
+        self.shrink_above = shrink_above
+        self.interval = interval
+        self.buffer = bytearray()
+        self.peak = 0
+        self.discarding = False
+        self.bytes = 0
+        self.lines = 0
+        self.overlong = 0
+        self.bytes_per_second = 0.0
+        self.lines_per_second = 0.0
+        self._since = time.monotonic()
+        self._bytes_since = 0
+        self._lines_since = 0
+
+    def feed(self, data):
+        """
+            Adds received data to the buffer.
+
+                :param data: the received bytes
+                :returns: a list of all the lines completed by the
+                    data, without their line endings. Empty lines are
+                    left out.
+        """
+        self.bytes += len(data)
+        if self.buffer:
+            self.buffer += data
+            data = self.buffer
+        parts = data.split(b'\n')
+        rest = parts.pop()
+        self.peak = max(self.peak, len(data))
+
+        if self.discarding:
+            # skip the tail of a line that was already too long
+            if parts:
+                self.discarding = False
+                del parts[0]
+            else:
+                rest = b''
+
+        lines = []
+        max_length = self.max_length
+        for line in parts:
+            if line[-1:] == b'\r':
+                line = line[:-1]
+            if not line:
+                continue
+            if len(line) > max_length:
+                self.overlong += 1
+                continue
+            lines.append(line)
+
+        if data is self.buffer:
+            del self.buffer[:]
+        if len(rest) > max_length:
+            self.overlong += 1
+            self.discarding = True
+        elif rest:
+            self.buffer += rest
+        if not self.buffer and self.peak > self.shrink_above:
+            self.buffer = bytearray()
+            self.peak = 0
+
+        self.lines += len(lines)
+        self.update_rates()
+        return lines
+
+    def update_rates(self):
+        """
+            Recalculates :attr:`bytes_per_second` and
+            :attr:`lines_per_second` once the interval has passed.
+        """
+        now = time.monotonic()
+        elapsed = now - self._since
+        if elapsed < self.interval:
+            return
+        self.bytes_per_second = (self.bytes - self._bytes_since) / elapsed
+        self.lines_per_second = (self.lines - self._lines_since) / elapsed
+        self._since = now
+        self._bytes_since = self.bytes
+        self._lines_since = self.lines
+
+    def stats(self):
+        """
+            Returns the counters of the buffer as a dict: the total
+            `bytes` and `lines` received, the number of `overlong`
+            lines thrown away, the current `bytes_per_second` and
+            `lines_per_second` and the `buffered` bytes of an
+            incomplete line.
+        """
+        return {
+            'bytes': self.bytes,
+            'lines': self.lines,
+            'overlong': self.overlong,
+            'bytes_per_second': self.bytes_per_second,
+            'lines_per_second': self.lines_per_second,
+            'buffered': len(self.buffer),
+        }
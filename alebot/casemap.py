@@ -0,0 +1,104 @@
+import collections
+import string
+import sys
+
+
+class CaseMapping(object):
+
+    """
+        The rules by which the server compares nicks and channel names,
+        as announced in the `CASEMAPPING` token of its `005` reply.
+        Under `rfc1459`, the default, `[]\\~` are the upper case forms of
+        `{}|^`, so `Nick[away]` and `nick{AWAY}` are the same user.
+
+        :func:`lower` folds any string with a translation table. For
+        nicks and channel names, which come up again and again, use
+        :func:`key`: it remembers the folded form of the names it saw
+        last and returns it interned, so the keys of equal names are the
+        same object and can be used in dicts and sets, or even compared
+        with `is`, without folding them every time. Use :func:`lower`
+        for anything else, i.e. the text of messages, so it does not
+        push the names out of the cache.
+
+        Use :func:`get` rather than creating mappings yourself, so that
+        the bot, the state tracker and the plugins share one cache.
+
+            :param name: `ascii`, `rfc1459` or `strict-rfc1459`
+            :param cache_size: how many names are remembered, the
+                least recently used are forgotten first
+    """
+
+    UPPER = {
+        'ascii': string.ascii_uppercase,
+        'rfc1459': string.ascii_uppercase + '[]\\~',
+        'strict-rfc1459': string.ascii_uppercase + '[]\\',
+    }
+    LOWER = {
+        'ascii': string.ascii_lowercase,
+        'rfc1459': string.ascii_lowercase + '{}|^',
+        'strict-rfc1459': string.ascii_lowercase + '{}|',
+    }
+    DEFAULT = 'rfc1459'
+
+    # the shared instances, see get
+    MAPPINGS = {}
+
+    def __init__(self, name, cache_size=65536):
+        if name not in self.UPPER:
+            raise ValueError("Unknown casemapping '%s'." % name)
+        self.name = name
+        self.table = str.maketrans(self.UPPER[name], self.LOWER[name])
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+
+    def __repr__(self):
+        return '<alebot.CaseMapping %s>' % self.name
+
+    @classmethod
+    def get(cls, name=DEFAULT):
+        """
+            Returns the shared mapping of the given name, or `None` if
+            the name is unknown.
+        """
+        try:
+            return cls.MAPPINGS[name]
+        except KeyError:
+            if name not in cls.UPPER:
+                return None
+            mapping = cls.MAPPINGS[name] = cls(name)
+            return mapping
+
+    def lower(self, text):
+        """
+            Returns the string folded to lower case.
+        """
+        return text.translate(self.table)
+
+    def key(self, name):
+        """
+            Returns the interned, folded form of a nick or channel
+            name.
+        """
+        cache = self.cache
+        try:
+            key = cache[name]
+        except KeyError:
+            pass
+        else:
+            cache.move_to_end(name)
+            return key
+        # the cache holds on to the interned name, so that it does not
+        # keep a copy of every name that was looked up alive
+        name = sys.intern(name)
+        key = name.translate(self.table)
+        key = name if key == name else sys.intern(key)
+        if len(cache) >= self.cache_size:
+            cache.popitem(last=False)
+        cache[name] = key
+        return key
+
+    def equal(self, a, b):
+        """
+            Returns whether two nicks or channel names are the same.
+        """
+        return a == b or self.key(a) == self.key(b)
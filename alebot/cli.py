@@ -3,8 +3,12 @@ from . import Alebot
 
 
 @click.command()
-@click.option("--path", default=".",
-              help="Path in which confi.json and plugins are.")
+@click.option("--path", default=["."], multiple=True,
+              help="Path in which config.json and plugins are. Can be "
+                   "given several times to run one bot per path.")
 def run(path):
-    alebot = Alebot(path)
-    alebot.connect()
+    if len(path) == 1:
+        alebot = Alebot(path[0])
+        alebot.connect()
+    else:
+        Alebot.connect_all([Alebot(p) for p in path])
@@ -0,0 +1,308 @@
+import collections
+import time
+
+
+class TokenBucket(object):
+
+    """
+        A token bucket that fills up with `rate` tokens per second, up
+        to `burst` tokens. A `rate` of `None` means no limit.
+    """
+
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def refill(self, now):
+        """
+            Adds the tokens for the time passed since the last refill.
+        """
+        if self.rate:
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self, amount):
+        """
+            Returns how long it takes until `amount` tokens are
+            available, or 0 if they are right now. An amount larger
+            than the bucket only waits for a full bucket.
+        """
+        if not self.rate:
+            return 0
+        missing = min(amount, self.burst) - self.tokens
+        if missing <= 0:
+            return 0
+        return missing / self.rate
+
+    def take(self, amount):
+        """
+            Removes `amount` tokens, see :func:`delay`.
+        """
+        if self.rate:
+            self.tokens -= min(amount, self.burst)
+
+
+class SendQueue(object):
+
+    """
+        Sits between :func:`Alebot.send_raw` and the connection and
+        makes sure the bot does not send faster than the server
+        accepts, so it does not get kicked for excess flood.
+
+        There are two lanes: lines for the high priority lane (like
+        `PONG`, `NICK` or `QUIT`) are always sent before the ones in
+        the normal lane, so a burst of messages can not delay the
+        answer to a `PING`.
+
+        Sending is limited by two token buckets, one for lines and one
+        for bytes.
+
+            :param lines_per_second: how many lines may be sent per
+                second in the long run, `None` for no limit
+            :param burst_lines: how many lines may be sent at once
+            :param bytes_per_second: how many bytes may be sent per
+                second in the long run, `None` for no limit
+            :param burst_bytes: how many bytes may be sent at once
+    """
+
+    def __init__(self, lines_per_second=None, burst_lines=5,
+                 bytes_per_second=None, burst_bytes=2048):
+        self.high = collections.deque()
+        self.normal = collections.deque()
+        self.lines = TokenBucket()
+        self.bytes = TokenBucket()
+        self.sent = 0
+        self.sent_bytes = 0
+        self.delayed = 0
+        # the queued line that was last counted as delayed
+        self.waiting = None
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.configure(lines_per_second, burst_lines, bytes_per_second,
+                       burst_bytes)
+
+    def __len__(self):
+        return len(self.high) + len(self.normal)
+
+    def configure(self, lines_per_second=None, burst_lines=5,
+                  bytes_per_second=None, burst_bytes=2048):
+        """
+            Changes the limits. Queued lines stay queued.
+        """
+        self.lines = TokenBucket(lines_per_second, burst_lines)
+        self.bytes = TokenBucket(bytes_per_second, burst_bytes)
+
+    def push(self, line, urgent=False):
+        """
+            Queues an encoded line.
+
+                :param urgent: whether the line goes to the high
+                    priority lane
+        """
+        lane = self.high if urgent else self.normal
+        lane.append((line, time.monotonic()))
+
+    def delay(self):
+        """
+            Returns how many seconds to wait until the next line may be
+            sent, 0 if it may be sent right away, or `None` if there is
+            nothing to send.
+        """
+        lane = self.high or self.normal
+        if not lane:
+            return None
+        now = time.monotonic()
+        self.lines.refill(now)
+        self.bytes.refill(now)
+        delay = max(self.lines.delay(1), self.bytes.delay(len(lane[0][0])))
+        if delay and lane[0] is not self.waiting:
+            self.delayed += 1
+            self.waiting = lane[0]
+        return delay
+
+    def pop(self):
+        """
+            Takes the next line off the queue and out of the buckets.
+            Only call this if :func:`delay` returned 0.
+        """
+        lane = self.high or self.normal
+        line, queued = lane.popleft()
+        self.lines.take(1)
+        self.bytes.take(len(line))
+        waited = time.monotonic() - queued
+        self.sent += 1
+        self.sent_bytes += len(line)
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        return line
+
+    def stats(self):
+        """
+            Returns the counters of the queue as a dict: the current
+            depth of the `high` and `normal` lanes, the number of
+            lines `sent` and their `sent_bytes`, how many lines had to
+            wait for the buckets (`delayed`), and the average and
+            maximum time a line waited in the queue (`wait_avg` and
+            `wait_max`, in seconds).
+        """
+        return {
+            'high': len(self.high),
+            'normal': len(self.normal),
+            'sent': self.sent,
+            'sent_bytes': self.sent_bytes,
+            'delayed': self.delayed,
+            'wait_avg': self.wait_total / self.sent if self.sent else 0.0,
+            'wait_max': self.wait_max,
+        }
+
+
+class IngressLimiter(object):
+
+    """
+        Limits how many commands the bot takes from every user and in
+        every channel, before the command hooks see them, so that one
+        user spamming commands can not keep the hooks and the task pool
+        busy for everybody else (see :func:`Alebot.admit`).
+
+        Every user, by their prefix (`nick!ident@host`), and every
+        channel gets a token bucket. Commands beyond the limits are
+        dropped, or, with the `defer` action, handed to the command
+        hooks as soon as the buckets allow it, unless that would take
+        longer than `max_delay` seconds or more than `max_deferred`
+        commands wait already.
+
+        The buckets are kept in LRU tables of at most `size` users and
+        channels each, so a flood from many hosts can not make the
+        limiter grow without bounds.
+
+            :param lines_per_second: how many commands a user may send
+                per second in the long run, `None` for no limit
+            :param burst_lines: how many commands a user may send at
+                once
+            :param channel_lines_per_second: how many commands may be
+                sent in a channel per second in the long run, `None`
+                for no limit
+            :param channel_burst_lines: how many commands may be sent in
+                a channel at once
+            :param action: `drop` or `defer`
+            :param max_delay: the longest a command is deferred, in
+                seconds
+            :param max_deferred: how many commands may be deferred at
+                the same time
+            :param size: how many users and channels are remembered
+    """
+
+    DROP = 'drop'
+    DEFER = 'defer'
+
+    def __init__(self, lines_per_second=None, burst_lines=5,
+                 channel_lines_per_second=None, channel_burst_lines=10,
+                 action=DROP, max_delay=10, max_deferred=100, size=4096):
+        self.users = collections.OrderedDict()
+        self.channels = collections.OrderedDict()
+        self.waiting = 0
+        self.passed = 0
+        self.deferred = 0
+        self.dropped = 0
+        self.bypassed = 0
+        self.configure(lines_per_second, burst_lines,
+                       channel_lines_per_second, channel_burst_lines,
+                       action, max_delay, max_deferred, size)
+
+    @property
+    def enabled(self):
+        return bool(self.rate or self.channel_rate)
+
+    def configure(self, lines_per_second=None, burst_lines=5,
+                  channel_lines_per_second=None, channel_burst_lines=10,
+                  action=DROP, max_delay=10, max_deferred=100, size=4096):
+        """
+            Changes the limits and forgets all buckets.
+        """
+        if action not in (self.DROP, self.DEFER):
+            raise ValueError("Unknown ingress action '%s'." % action)
+        self.rate = lines_per_second
+        self.burst = burst_lines
+        self.channel_rate = channel_lines_per_second
+        self.channel_burst = channel_burst_lines
+        self.action = action
+        self.max_delay = max_delay
+        self.max_deferred = max_deferred
+        self.size = size
+        self.users.clear()
+        self.channels.clear()
+
+    def bucket(self, table, key, rate, burst):
+        """
+            Returns the bucket of the key, the least recently used one
+            is forgotten if the table is full.
+        """
+        bucket = table.get(key)
+        if bucket is None:
+            bucket = table[key] = TokenBucket(rate, burst)
+            if len(table) > self.size:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return bucket
+
+    def check(self, user, channel=None, defer=True):
+        """
+            Takes a command of the user in the channel (or in private,
+            if `channel` is `None`) out of the buckets.
+
+                :param defer: whether the command can be deferred, if
+                    the action is `defer`
+
+                :returns: `0` if the command may be handled right away,
+                    the seconds to defer it, or `None` if it is to be
+                    dropped.
+        """
+        now = time.monotonic()
+        buckets = []
+        if self.rate:
+            buckets.append(self.bucket(self.users, user, self.rate,
+                                       self.burst))
+        if channel is not None and self.channel_rate:
+            buckets.append(self.bucket(self.channels, channel,
+                                       self.channel_rate, self.channel_burst))
+        delay = 0
+        for bucket in buckets:
+            bucket.refill(now)
+            delay = max(delay, bucket.delay(1))
+        if delay and (self.action == self.DROP or not defer or
+                      delay > self.max_delay or
+                      self.waiting >= self.max_deferred):
+            self.dropped += 1
+            return None
+        # deferred commands take their tokens right away, so that the
+        # next ones wait for them
+        for bucket in buckets:
+            bucket.take(1)
+        if delay:
+            self.deferred += 1
+            self.waiting += 1
+        else:
+            self.passed += 1
+        return delay
+
+    def stats(self):
+        """
+            Returns the counters of the limiter as a dict: the commands
+            that `passed`, were `deferred`, `dropped` or `bypassed` the
+            limits, how many are `waiting` and how many `users` and
+            `channels` are remembered.
+        """
+        return {
+            'passed': self.passed,
+            'deferred': self.deferred,
+            'dropped': self.dropped,
+            'bypassed': self.bypassed,
+            'waiting': self.waiting,
+            'users': len(self.users),
+            'channels': len(self.channels),
+        }
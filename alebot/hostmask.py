@@ -0,0 +1,122 @@
+import re
+
+
+class HostmaskSet(object):
+
+    """
+        A set of `nick!ident@host` masks that a user can be matched
+        against, i.e. the admins of the bot. The masks may contain the
+        wildcards `*` and `?`. A mask without `!` and `@` is taken as a
+        nick and matches `nick!*@*`.
+
+        The masks are compiled once: masks without wildcards go into a
+        set, masks with a fixed nick are indexed by their nick, and only
+        the masks with wildcards in their nick end up in one combined
+        pattern. The result for every user is cached, so the cost of a
+        lookup does not grow with the number of masks.
+
+            :param masks: the masks
+            :param lower: the function used to make nicks and hosts
+                case insensitive
+            :param cache_size: how many users are remembered
+    """
+
+    def __init__(self, masks=(), lower=str.lower, cache_size=4096):
+        self.lower = lower
+        self.cache_size = cache_size
+        self.masks = tuple(masks)
+        self.exact = set()
+        self.nicks = {}
+        self.pattern = None
+        self.cache = {}
+        self.compile()
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __contains__(self, user):
+        return self.match(user)
+
+    @staticmethod
+    def normalize(mask):
+        """
+            Completes a mask to the `nick!ident@host` form.
+        """
+        nick, bang, rest = mask.partition('!')
+        if not bang:
+            nick, at, host = mask.partition('@')
+            return '%s!*@%s' % (nick, host if at else '*')
+        ident, at, host = rest.partition('@')
+        return '%s!%s@%s' % (nick or '*', ident or '*', host if at else '*')
+
+    @staticmethod
+    def translate(mask):
+        """
+            Returns the regular expression for a glob mask. Unlike
+            :mod:`fnmatch`, brackets are no character classes, as nicks
+            may contain them.
+        """
+        return re.escape(mask).replace('\\*', '.*').replace('\\?', '.')
+
+    def set_lower(self, lower):
+        """
+            Switches to another function to make nicks and hosts case
+            insensitive, i.e. :func:`CaseMapping.lower` once the server
+            announced its casemapping, and compiles the masks anew if
+            it differs.
+        """
+        if lower != self.lower:
+            self.lower = lower
+            self.compile()
+
+    def compile(self):
+        """
+            Sorts the masks into the exact set, the nick index and the
+            combined pattern and forgets the cached results.
+        """
+        self.exact = set()
+        self.cache = {}
+        wildcards = []
+        nicks = {}
+        for mask in self.masks:
+            mask = self.lower(self.normalize(mask))
+            if '*' not in mask and '?' not in mask:
+                self.exact.add(mask)
+                continue
+            nick, _, rest = mask.partition('!')
+            if '*' in nick or '?' in nick:
+                wildcards.append(self.translate(mask))
+            else:
+                nicks.setdefault(nick, []).append(self.translate(rest))
+        self.nicks = dict(
+            (nick, re.compile('(?:%s)\\Z' % '|'.join(patterns), re.S))
+            for nick, patterns in nicks.items())
+        self.pattern = None
+        if wildcards:
+            self.pattern = re.compile('(?:%s)\\Z' % '|'.join(wildcards),
+                                      re.S)
+
+    def match(self, user):
+        """
+            Returns whether the user (`nick!ident@host`) matches one of
+            the masks.
+        """
+        if not user:
+            return False
+        try:
+            return self.cache[user]
+        except KeyError:
+            pass
+        lowered = self.lower(user)
+        matched = lowered in self.exact
+        if not matched:
+            nick, bang, rest = lowered.partition('!')
+            pattern = self.nicks.get(nick)
+            matched = bool(bang) and (
+                (pattern is not None and pattern.match(rest) is not None)
+                or (self.pattern is not None and
+                    self.pattern.match(lowered) is not None))
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[user] = matched
+        return matched
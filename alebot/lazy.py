@@ -0,0 +1,39 @@
+from . import Hook
+
+
+class LazyHook(Hook):
+
+    """
+        Stands in for a hook of a plugin that has not been imported
+        yet. It is built from the plugin manifest and declares the same
+        events and command as the real hook, so it is only ever offered
+        events the real hook wants.
+
+        The first time it is offered an event, it has the bot import
+        the plugin (see :func:`Alebot.wake_plugin`) and hands the event
+        on to the real hook. From then on the real hook takes its place.
+
+            :param bot: the bot instance
+            :param plugin: the name of the plugin
+            :param entry: the manifest entry of the hook
+    """
+
+    def __init__(self, bot, plugin, entry):
+        super(LazyHook, self).__init__(bot)
+        self.plugin = plugin
+        self.name = entry['name']
+        self.events = tuple(entry['events'])
+        self.command = entry.get('command')
+        self.hook = None
+
+    def __repr__(self):
+        return '<alebot.LazyHook %s.%s>' % (self.plugin, self.name)
+
+    def match(self, event):
+        self.hook = self.bot.wake_plugin(self.plugin, self.name)
+        if self.hook is None:
+            return False
+        return self.hook.match(event)
+
+    def call(self, event):
+        return self.hook.call(event)
@@ -0,0 +1,278 @@
+import asyncio
+import bisect
+import time
+
+
+class Histogram(object):
+
+    """
+        Counts durations in fixed buckets, like a Prometheus histogram,
+        so that observing a value is a bisection and an increment.
+
+            :param buckets: the upper bounds of the buckets in seconds
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+               0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        """
+            Returns `(upper bound, count)` pairs with the number of
+            observations up to each bound, the last bound is `+Inf`.
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),),
+                                self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """
+            Returns the upper bound of the bucket the `q` quantile is
+            in, or `None` if nothing was observed.
+        """
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+
+
+class HookMetrics(object):
+
+    """
+        The timings and counters of one hook.
+    """
+
+    __slots__ = ('plugin', 'name', 'match', 'call', 'errors')
+
+    def __init__(self, plugin, name):
+        self.plugin = plugin
+        self.name = name
+        self.match = Histogram()
+        self.call = Histogram()
+        self.errors = 0
+
+
+class Metrics(object):
+
+    """
+        Collects how long the :func:`Hook.match` and :func:`Hook.call`
+        functions of every hook take, and renders them together with
+        the counters of the connection, the send queue and the task
+        pool, either as a short summary or in the Prometheus text
+        format (see :func:`serve`).
+
+        Timing a hook costs two clock reads and a bisection, so it is
+        cheap enough to be left on. Set the `metrics` option
+        `enabled` to `false` to turn it off anyway.
+
+            :param bot: the bot instance
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.hooks = {}
+        self.server = None
+
+    def hook(self, hook):
+        """
+            Returns the :class:`.HookMetrics` of the hook.
+        """
+        try:
+            return self.hooks[hook]
+        except KeyError:
+            plugin = getattr(hook, 'plugin', None) or \
+                hook.__class__.__module__
+            name = getattr(hook, 'name', None) or hook.__class__.__name__
+            metrics = self.hooks[hook] = HookMetrics(plugin, name)
+            return metrics
+
+    def forget(self, hooks):
+        """
+            Drops the metrics of the hooks that are no longer active.
+        """
+        for hook in list(self.hooks):
+            if hook not in hooks:
+                del self.hooks[hook]
+
+    def summary(self, top=3):
+        """
+            Returns a few lines about the bot's traffic and its slowest
+            hooks, short enough to be sent to IRC.
+        """
+        bot = self.bot
+        incoming = bot.incoming.stats()
+        outgoing = bot.outgoing.stats()
+        tasks = bot.tasks.stats()
+        ingress = bot.ingress.stats()
+        lines = [
+            'in: %d lines, %d bytes, %.1f lines/s. out: %d lines, %d '
+            'bytes, %d queued, %.0f ms max wait.' % (
+                incoming['lines'], incoming['bytes'],
+                incoming['lines_per_second'], outgoing['sent'],
+                outgoing['sent_bytes'], outgoing['high'] + outgoing['normal'],
+                outgoing['wait_max'] * 1000),
+            'tasks: %(queued)d queued, %(running)d running, %(completed)d '
+            'completed, %(failed)d failed, %(rejected)d rejected, '
+            '%(dropped)d dropped.' % tasks,
+            'commands: %(passed)d passed, %(deferred)d deferred, '
+            '%(dropped)d dropped, %(bypassed)d from admins.' % ingress,
+        ]
+        slowest = sorted(self.hooks.values(),
+                         key=lambda metrics: -(metrics.match.sum +
+                                               metrics.call.sum))[:top]
+        for metrics in slowest:
+            if not metrics.match.count:
+                continue
+            lines.append(
+                '%s.%s: %d matched in %.1f ms, %d called in %.1f ms '
+                '(p99 < %s ms), %d errors.' % (
+                    metrics.plugin, metrics.name, metrics.match.count,
+                    metrics.match.sum * 1000, metrics.call.count,
+                    metrics.call.sum * 1000,
+                    self.milliseconds(metrics.call.quantile(0.99)),
+                    metrics.errors))
+        return lines
+
+    @staticmethod
+    def milliseconds(seconds):
+        if seconds is None:
+            return '-'
+        if seconds == float('inf'):
+            return 'inf'
+        return '%g' % (seconds * 1000)
+
+    @staticmethod
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+            .replace('\n', '\\n')
+
+    def render(self):
+        """
+            Returns all the metrics in the Prometheus text format.
+        """
+        bot = self.escape(self.bot.name)
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append('# HELP alebot_%s %s' % (name, help))
+            lines.append('# TYPE alebot_%s %s' % (name, kind))
+            for suffix, labels, value in samples:
+                labels = ','.join(['bot="%s"' % bot] + [
+                    '%s="%s"' % (key, self.escape(label))
+                    for key, label in labels])
+                lines.append('alebot_%s%s{%s} %s' % (name, suffix, labels,
+                                                     value))
+
+        incoming = self.bot.incoming.stats()
+        outgoing = self.bot.outgoing.stats()
+        tasks = self.bot.tasks.stats()
+        ingress = self.bot.ingress.stats()
+        metric('received_bytes_total', 'counter', 'Bytes received.',
+               [('', (), incoming['bytes'])])
+        metric('received_lines_total', 'counter', 'Lines received.',
+               [('', (), incoming['lines'])])
+        metric('received_overlong_total', 'counter',
+               'Received lines thrown away for being too long.',
+               [('', (), incoming['overlong'])])
+        metric('commands_total', 'counter',
+               'Received commands by what the ingress limiter did.',
+               [('', (('result', result),), ingress[result])
+                for result in ('passed', 'deferred', 'dropped',
+                               'bypassed')])
+        metric('commands_deferred', 'gauge',
+               'Commands held back by the ingress limiter.',
+               [('', (), ingress['waiting'])])
+        metric('sent_lines_total', 'counter', 'Lines sent.',
+               [('', (), outgoing['sent'])])
+        metric('sent_bytes_total', 'counter', 'Bytes sent.',
+               [('', (), outgoing['sent_bytes'])])
+        metric('send_queue_lines', 'gauge', 'Lines waiting to be sent.',
+               [('', (('lane', 'high'),), outgoing['high']),
+                ('', (('lane', 'normal'),), outgoing['normal'])])
+        metric('send_delayed_total', 'counter',
+               'How often sending waited for the flood limits.',
+               [('', (), outgoing['delayed'])])
+        metric('send_wait_max_seconds', 'gauge',
+               'The longest time a line waited to be sent.',
+               [('', (), outgoing['wait_max'])])
+        metric('tasks', 'gauge', 'Tasks in the task pool.',
+               [('', (('state', state),), tasks[state])
+                for state in ('queued', 'running')])
+        metric('tasks_total', 'counter', 'Tasks the task pool handled.',
+               [('', (('result', result),), tasks[result])
+                for result in ('completed', 'failed', 'rejected',
+                               'dropped')])
+
+        for step in ('match', 'call'):
+            samples = []
+            for metrics in self.hooks.values():
+                histogram = getattr(metrics, step)
+                labels = (('plugin', metrics.plugin), ('hook', metrics.name))
+                for bound, total in histogram.cumulative():
+                    samples.append(('_bucket', labels + (
+                        ('le', '+Inf' if bound == float('inf')
+                         else repr(bound)),), total))
+                samples.append(('_sum', labels, histogram.sum))
+                samples.append(('_count', labels, histogram.count))
+            metric('hook_%s_seconds' % step, 'histogram',
+                   'Time spent in the %s function of the hooks.' % step,
+                   samples)
+        metric('hook_errors_total', 'counter', 'Exceptions raised by hooks.',
+               [('', (('plugin', metrics.plugin), ('hook', metrics.name)),
+                 metrics.errors) for metrics in self.hooks.values()])
+        return '\n'.join(lines) + '\n'
+
+    async def serve(self, host='127.0.0.1', port=None, path=None):
+        """
+            Serves :func:`render` over HTTP on a local port or on a
+            Unix socket at `path`, for Prometheus to scrape.
+        """
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            if request.split()[:1] != [b'GET']:
+                status, body = '405 Method Not Allowed', ''
+            else:
+                status, body = '200 OK', self.render()
+            body = body.encode('utf-8')
+            writer.write((
+                'HTTP/1.0 %s\r\n'
+                'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                'Content-Length: %d\r\n\r\n' % (status, len(body))
+            ).encode('ascii') + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -6,14 +6,16 @@ auth = Alebot.get_plugin('auth')
 class SaveHook(auth.AdminCommandHook):
 
     """
-        Save current config state to disk.
+        Save current config state to disk. The answer and the `SAVE`
+        event wait until the file was written.
     """
 
     command = 'save'
 
-    def call(self, event):
-        print("Saving")
-        self.bot.save_config()
+    async def call(self, event):
+        if not await self.bot.save_config_now():
+            self.msg(event.target, "could not save, see the log.")
+            return
         self.msg(event.target, "saved.")
         event = Event('SAVE')
         self.bot.call_hooks(event)
@@ -23,7 +25,9 @@ class SaveHook(auth.AdminCommandHook):
 class ReloadHook(auth.AdminCommandHook):
 
     """
-        Reloads config and plugins on request.
+        Reloads config and plugins on request. Only plugins whose
+        files changed, and the plugins depending on them, are imported
+        again, all the others keep running as they are.
     """
 
     command = 'reload'
@@ -31,8 +35,61 @@ class ReloadHook(auth.AdminCommandHook):
     def call(self, event):
         print("Reloading")
         self.bot.load_config()
-        self.bot.load_plugins()
-        self.bot.activate_hooks()
-        self.msg(event.target, "reloaded.")
+        reloaded = self.bot.reload_plugins()
+        if reloaded:
+            self.msg(event.target, "reloaded: %s." % ', '.join(reloaded))
+        else:
+            self.msg(event.target, "reloaded.")
         event = Event('RELOAD')
         self.bot.call_hooks(event)
+
+
+@Alebot.hook
+class StatsHook(auth.AdminCommandHook):
+
+    """
+        Tells how much traffic the bot had, how its task pool is doing
+        and which of its hooks took the most time.
+    """
+
+    command = 'stats'
+
+    def call(self, event):
+        for line in self.bot.metrics.summary():
+            self.msg(event.target, line)
+
+
+@Alebot.hook
+class ProfileHook(auth.AdminCommandParamHook):
+
+    """
+        Starts and stops profiling the bot, see :class:`.Profiler`:
+        `profile start [cpu|sample]` and `profile stop`.
+    """
+
+    command = 'profile'
+
+    def call(self, event):
+        args = event.args.split()
+        profiler = self.bot.profiler
+        if args[:1] == ['start']:
+            mode = args[1] if len(args) > 1 else profiler.CPU
+            if mode not in (profiler.CPU, profiler.SAMPLE):
+                self.msg(event.target, "Unknown mode: %s" % mode)
+            elif profiler.start(mode):
+                self.msg(event.target, "%s profiling started." % mode)
+            else:
+                self.msg(event.target, "%s profiling is already running." %
+                         profiler.mode)
+        elif args[:1] == ['stop']:
+            path = profiler.stop()
+            if path is None:
+                self.msg(event.target, "Not profiling.")
+                return
+            self.msg(event.target, "Writing the profile to %s." % path)
+            summary = profiler.summary()
+            if summary:
+                self.msg(event.target, "Plugins: %s." % summary)
+        else:
+            self.msg(event.target,
+                     "The required syntax is: start [cpu|sample] | stop")
@@ -14,8 +14,9 @@ def admin_required(f):
     """
     @wraps(f)
     def auth_and_match(self, event):
-        config = self.bot.config.get('auth', {})
-        if not event.nick or not event.nick in config.get('admins', []):
+        admins = self.bot.settings.admins
+        admins.set_lower(self.bot.casemapping.lower)
+        if not admins.match(event.user):
             return False
         return f(self, event)
     return auth_and_match
@@ -59,22 +60,24 @@ class AdminManager(object):
         if not self.bot.config.get('auth'):
             self.bot.config['auth'] = {}
 
-    def add_admin(self, nick):
+    def add_admin(self, mask):
         """
-            Add an admin to the list of admins.
+            Add an admin mask to the list of admins.
         """
         if not self.bot.config['auth'].get('admins'):
-            self.bot.config['auth']['admins'] = [nick]
-        elif not nick in self.bot.config['auth']['admins']:
-            self.bot.config['auth']['admins'].append(nick)
+            self.bot.config['auth']['admins'] = [mask]
+        elif mask not in self.bot.config['auth']['admins']:
+            self.bot.config['auth']['admins'].append(mask)
+        self.bot.update_settings()
         return True
 
-    def delete_admin(self, nick):
+    def delete_admin(self, mask):
         """
-            Remove an admin from the list of admins.
+            Remove an admin mask from the list of admins.
         """
-        if nick in self.bot.config['auth'].get('admins', []):
-            self.bot.config['auth']['admins'].remove(nick)
+        if mask in self.bot.config['auth'].get('admins', []):
+            self.bot.config['auth']['admins'].remove(mask)
+        self.bot.update_settings()
         return True
 
 
@@ -88,12 +91,12 @@ class AdminManagementHook(AdminManager, AdminCommandParamHook):
     command = 'admin'
 
     def msg_syntax_error(self, event):
-        self.msg(event.target, "The required syntax is: <action> [<nick>]")
+        self.msg(event.target, "The required syntax is: <action> [<mask>]")
 
     def call(self, event):
-        print "called."
+        print("called.")
 
-        args = event.body.split(' ')
+        args = event.words
         if (len(args) < 3):
             self.msg_syntax_error(event)
             return
@@ -102,15 +105,13 @@ class AdminManagementHook(AdminManager, AdminCommandParamHook):
         self.check_config()
 
         if action == 'list':
-            admins = ''
-            for admin in self.bot.config['auth'].get('admins', []):
-                admins += "%s, " % admin
-            admins = admins[:-2]
+            admins = ', '.join(self.bot.config['auth'].get('admins', []))
             self.msg(event.target, "Admins are: %s" % admins)
             return
 
         if(len(args) < 4):
             self.msg_syntax_error(event)
+            return
 
         nick = args[3]
 
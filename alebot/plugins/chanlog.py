@@ -0,0 +1,479 @@
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+import urllib.parse
+
+from alebot import Alebot, Hook, Settings, Task
+auth = Alebot.get_plugin('auth')
+
+Settings.option('chanlogChannels', 'chanlog.channels', list, [], tuple)
+Settings.option('chanlogPath', 'chanlog.path', str, 'logs')
+Settings.option('chanlogRotate', 'chanlog.rotate', str, 'day')
+Settings.option('chanlogMaxBytes', 'chanlog.maxBytes', int, 64 * 1024 * 1024)
+Settings.option('chanlogFlushDelay', 'chanlog.flushDelay', (int, float), 1)
+Settings.option('chanlogQueryLines', 'chanlog.queryLines', int, 20)
+
+
+class ChannelLog(object):
+
+    """
+        Appends the lines of the logged channels to one file per
+        channel and day (or hour, see `rotate`), in
+        `<root>/<channel>/<period>.log`. A file that grows beyond
+        `max_bytes` is continued in `<period>.1.log`, `<period>.2.log`
+        and so on.
+
+        Next to every log file there is an index, `<file>.idx`, with an
+        entry for every second that has lines: the second and the
+        offset of its first line, packed into 16 bytes. A range query
+        looks up the start and the end in the index by bisection and
+        reads the lines in between from the mmapped log file, without
+        looking at any other line.
+
+        The lines are written in batches by :func:`append`, which does
+        blocking file IO and should not be called on the event loop.
+
+            :param root: the directory of the logs
+            :param rotate: `day` or `hour`, the period of one file
+            :param max_bytes: the size of a file at which a new one is
+                started, `0` for no limit
+    """
+
+    INDEX = struct.Struct('<qQ')
+    PERIODS = {
+        'day': ('%Y-%m-%d', 24 * 3600),
+        'hour': ('%Y-%m-%d-%H', 3600),
+    }
+
+    def __init__(self, root, rotate='day', max_bytes=0):
+        if rotate not in self.PERIODS:
+            raise ValueError("Unknown rotation '%s'." % rotate)
+        self.root = root
+        self.rotate = rotate
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # the file every channel currently writes to:
+        # directory -> [period, part, size, last indexed second]
+        self.current = {}
+
+    @staticmethod
+    def directory(channel):
+        """
+            Returns the name of the directory of a channel, which must
+            be given as its :func:`CaseMapping.key`.
+        """
+        return urllib.parse.quote(channel, safe='#&+!-_.')
+
+    def period(self, timestamp):
+        return time.strftime(self.PERIODS[self.rotate][0],
+                             time.localtime(timestamp))
+
+    def path(self, directory, period, part=0):
+        name = '%s.%d.log' % (period, part) if part else '%s.log' % period
+        return os.path.join(self.root, directory, name)
+
+    def open_period(self, directory, period):
+        """
+            Finds the last part of the period and how far it is
+            written.
+        """
+        part = 0
+        while os.path.exists(self.path(directory, period, part + 1)):
+            part += 1
+        return self.open_part(directory, period, part)
+
+    def open_part(self, directory, period, part):
+        path = self.path(directory, period, part)
+        size = last = -1
+        try:
+            size = os.path.getsize(path)
+            with open(path + '.idx', 'r+b') as f:
+                entries = os.fstat(f.fileno()).st_size // self.INDEX.size
+                # a write that was cut off leaves part of an entry
+                f.truncate(entries * self.INDEX.size)
+                if entries:
+                    f.seek((entries - 1) * self.INDEX.size)
+                    last = self.INDEX.unpack(f.read(self.INDEX.size))[0]
+        except (OSError, struct.error):
+            pass
+        return [period, part, max(size, 0), last]
+
+    def append(self, records):
+        """
+            Writes the records, `(timestamp, channel key, text)`
+            tuples, to their files with one write per file.
+        """
+        batches = {}
+        directories = {}
+        clock = None
+        with self.lock:
+            for timestamp, channel, text in records:
+                directory = directories.get(channel)
+                if directory is None:
+                    directory = directories[channel] = \
+                        self.directory(channel)
+                # a batch is about a second of lines, so the time is
+                # formatted once per second
+                second = int(timestamp)
+                if clock is None or clock[0] != second:
+                    local = time.localtime(second)
+                    clock = (second, time.strftime(
+                        self.PERIODS[self.rotate][0], local),
+                        time.strftime('[%H:%M:%S] ', local))
+                period = clock[1]
+                current = self.current.get(directory)
+                if current is None or current[0] != period:
+                    current = self.current[directory] = \
+                        self.open_period(directory, period)
+                line = (clock[2] + text + '\n').encode('utf-8', 'replace')
+                if self.max_bytes and current[2] and \
+                        current[2] + len(line) > self.max_bytes:
+                    current[:] = self.open_part(directory, period,
+                                                current[1] + 1)
+                path = self.path(directory, period, current[1])
+                batch = batches.get(path)
+                if batch is None:
+                    batch = batches[path] = ([], [])
+                if second > current[3]:
+                    batch[1].append(self.INDEX.pack(second, current[2]))
+                    current[3] = second
+                batch[0].append(line)
+                current[2] += len(line)
+            try:
+                for path, (lines, index) in batches.items():
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, 'ab') as f:
+                        f.write(b''.join(lines))
+                    if index:
+                        with open(path + '.idx', 'ab') as f:
+                            f.write(b''.join(index))
+            except OSError:
+                # the sizes are not known anymore, find them out again
+                self.current.clear()
+                raise
+
+    def query(self, channel, start, end, limit=None):
+        """
+            Returns the lines of the channel from `start` to `end`,
+            both timestamps and both included, to the second.
+
+                :param channel: the :func:`CaseMapping.key` of the
+                    channel
+                :param limit: return at most this many lines, the
+                    first ones
+        """
+        start, end = int(start), int(end)
+        directory = self.directory(channel)
+        seconds = self.PERIODS[self.rotate][1]
+        periods = []
+        for timestamp in range(start - start % 3600, end + seconds, 3600):
+            period = self.period(min(timestamp, end))
+            if not periods or periods[-1] != period:
+                periods.append(period)
+        lines = []
+        for period in periods:
+            part = 0
+            while limit is None or len(lines) < limit:
+                path = self.path(directory, period, part)
+                if not os.path.exists(path):
+                    break
+                lines.extend(self.read_range(path, start, end))
+                part += 1
+        return lines[:limit] if limit is not None else lines
+
+    def read_range(self, path, start, end):
+        """
+            Returns the lines of one log file from `start` to `end`,
+            found with its index.
+        """
+        try:
+            with open(path + '.idx', 'rb') as f:
+                index = self.map(f)
+            with open(path, 'rb') as f:
+                data = self.map(f)
+        except OSError:
+            return []
+        if index is None or data is None:
+            return []
+        with index, data:
+            count = len(index) // self.INDEX.size
+            first = self.bisect(index, count, start)
+            if first == count:
+                return []
+            last = self.bisect(index, count, end + 1)
+            begin = self.INDEX.unpack_from(index, first * self.INDEX.size)[1]
+            stop = len(data)
+            if last < count:
+                stop = self.INDEX.unpack_from(index,
+                                              last * self.INDEX.size)[1]
+            chunk = data[begin:stop]
+        return chunk.decode('utf-8', 'replace').splitlines()
+
+    @staticmethod
+    def map(f):
+        """
+            Maps the whole file read only, or returns `None` if it is
+            empty, as an empty file can not be mapped.
+        """
+        if not os.fstat(f.fileno()).st_size:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def bisect(self, index, count, second):
+        """
+            Returns the number of the first index entry at or after
+            `second`.
+        """
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self.INDEX.unpack_from(index,
+                                      middle * self.INDEX.size)[0] < second:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class ChannelLogSettings(object):
+
+    """
+        Builds the :class:`.ChannelLog` from the `chanlog` settings, for
+        the hooks that write and read the logs.
+    """
+
+    log = None
+    options = None
+
+    def get_log(self):
+        """
+            Returns the :class:`.ChannelLog`, which is built anew
+            whenever the settings changed.
+        """
+        settings = self.bot.settings
+        options = (settings.chanlogPath, settings.chanlogRotate,
+                   settings.chanlogMaxBytes)
+        if self.log is None or options != self.options:
+            path = os.path.join(self.bot.path or '', settings.chanlogPath)
+            rotate = settings.chanlogRotate
+            if rotate not in ChannelLog.PERIODS:
+                self.bot.logger.warning("Unknown log rotation '%s', "
+                                        "using 'day'." % rotate)
+                rotate = 'day'
+            self.log = ChannelLog(path, rotate, settings.chanlogMaxBytes)
+            self.options = options
+        return self.log
+
+
+@Alebot.hook
+class ChannelLogHook(ChannelLogSettings, Hook):
+
+    """
+        Logs the channels listed in the `chanlog` setting `channels`,
+        or all channels the bot is in if it contains `*`, with a
+        :class:`.ChannelLog`.
+
+        The hook only queues the lines. They are written every
+        `flushDelay` seconds (default: 1) in a thread of the event
+        loop's executor, so the bot never waits for the disk, no matter
+        how busy the channels are.
+    """
+
+    events = ('PRIVMSG', 'NOTICE', 'JOIN', 'PART', 'KICK', 'QUIT', 'NICK',
+              'TOPIC', 'MODE', 'SOCK_CLOSED')
+
+    def __init__(self, bot):
+        super(ChannelLogHook, self).__init__(bot)
+        self.logged = None
+        self.pending = []
+        self.flushing = None
+
+    def channels(self):
+        """
+            Returns the keys of the logged channels, or `True` for all.
+        """
+        settings = self.bot.settings
+        casemapping = self.bot.casemapping
+        if self.logged is None or self.logged[0] is not settings or \
+                self.logged[1] is not casemapping:
+            channels = settings.chanlogChannels
+            keys = True if '*' in channels else \
+                frozenset(casemapping.key(channel) for channel in channels)
+            self.logged = (settings, casemapping, keys)
+        return self.logged[2]
+
+    def logs(self, channel):
+        logged = self.channels()
+        return logged is True or self.bot.casemapping.key(channel) in logged
+
+    def targets(self, event):
+        """
+            Returns the channels the event is to be logged in.
+        """
+        if event.name in ('QUIT', 'NICK'):
+            state = self.bot.state
+            if state is None:
+                return []
+            if event.name == 'QUIT':
+                channels = (event.cache or {}).get('state.channels', ())
+            else:
+                channels = state.channels_of(event.target or '')
+            return [channel for channel in channels if self.logs(channel)]
+        target = event.target
+        if not event.is_channel or not self.logs(target):
+            return []
+        return [target]
+
+    def match(self, event):
+        if event.name == 'SOCK_CLOSED':
+            return bool(self.pending)
+        if not self.bot.settings.chanlogChannels:
+            return False
+        return bool(event.memo('chanlog.targets', self.targets))
+
+    def format(self, event):
+        """
+            Returns the text of the log line of the event.
+        """
+        name = event.name
+        nick = event.nick
+        if name == 'PRIVMSG':
+            body = event.body or ''
+            if body.startswith('\x01ACTION ') and body.endswith('\x01'):
+                return '* %s %s' % (nick, body[8:-1])
+            return '<%s> %s' % (nick, body)
+        if name == 'NOTICE':
+            return '-%s- %s' % (nick, event.body)
+        if name == 'JOIN':
+            return '-!- %s (%s@%s) joined' % (nick, event.ident, event.host)
+        if name == 'PART':
+            reason = event.params[1] if len(event.params) > 1 else ''
+            return '-!- %s left (%s)' % (nick, reason)
+        if name == 'KICK':
+            reason = event.params[2] if len(event.params) > 2 else ''
+            return '-!- %s was kicked by %s (%s)' % (event.params[1], nick,
+                                                     reason)
+        if name == 'QUIT':
+            return '-!- %s quit (%s)' % (nick, event.body or '')
+        if name == 'NICK':
+            return '-!- %s is now known as %s' % (nick, event.target)
+        if name == 'TOPIC':
+            return '-!- %s changed the topic to: %s' % (nick, event.body)
+        return '-!- %s sets mode %s' % (nick or event.user,
+                                        ' '.join(event.params[1:]))
+
+    def call(self, event):
+        if event.name == 'SOCK_CLOSED':
+            self.flush()
+            return
+        timestamp = time.time()
+        text = self.format(event)
+        for channel in event.memo('chanlog.targets', self.targets):
+            self.pending.append((timestamp, self.bot.casemapping.key(channel),
+                                 text))
+        if self.bot.loop is None:
+            self.flush()
+        elif self.flushing is None:
+            self.flushing = self.bot.spawn(self.flush_later())
+
+    def flush(self):
+        """
+            Writes the queued lines right away.
+        """
+        records, self.pending = self.pending, []
+        if records:
+            self.write(records)
+
+    async def flush_later(self):
+        """
+            Waits for more lines and then writes them in the executor,
+            as long as new ones came in in the meantime.
+        """
+        try:
+            await asyncio.sleep(self.bot.settings.chanlogFlushDelay)
+            while self.pending:
+                records, self.pending = self.pending, []
+                await self.bot.loop.run_in_executor(None, self.write,
+                                                    records)
+        finally:
+            self.flushing = None
+
+    def write(self, records):
+        try:
+            self.get_log().append(records)
+        except Exception as e:
+            self.bot.logger.error("Could not write %d log lines: %s" %
+                                  (len(records), e))
+
+
+@Alebot.hook
+class LogQueryHook(ChannelLogSettings, auth.AdminCommandParamHook):
+
+    """
+        Sends the logged lines of a channel in a range of time in
+        private: `log <channel> [<date>] <from> <to>`, i.e.
+        `log #ops 14:00 14:05` for today or
+        `log #ops 2014-03-17 14:00 14:05`. At most `queryLines` lines
+        (default: 20) are sent.
+    """
+
+    command = 'log'
+
+    def call(self, event):
+        args = event.args.split()
+        if len(args) == 3:
+            args.insert(1, time.strftime('%Y-%m-%d'))
+        try:
+            channel, day, start, end = args
+            start = self.parse_time(day, start)
+            end = self.parse_time(day, end, 59)
+        except ValueError:
+            self.msg(event.target, "The required syntax is: <channel> "
+                     "[<YYYY-MM-DD>] <HH:MM[:SS]> <HH:MM[:SS]>")
+            return
+        LogQueryTask(self, event, channel, min(start, end),
+                     max(start, end)).start()
+
+    @staticmethod
+    def parse_time(day, clock, seconds=0):
+        """
+            Returns the timestamp of a local time, with `seconds` added
+            if the time has none.
+        """
+        if clock.count(':') == 2:
+            return time.mktime(time.strptime('%s %s' % (day, clock),
+                                             '%Y-%m-%d %H:%M:%S'))
+        return time.mktime(time.strptime('%s %s' % (day, clock),
+                                         '%Y-%m-%d %H:%M')) + seconds
+
+
+class LogQueryTask(Task):
+
+    """
+        Reads the lines of a log query in the background and sends
+        them to the nick that asked.
+    """
+
+    def __init__(self, hook, event, channel, start, end):
+        super(LogQueryTask, self).__init__(hook, event)
+        self.channel = channel
+        self.start_time = start
+        self.end_time = end
+
+    def do(self):
+        limit = self.bot.settings.chanlogQueryLines
+        channel = self.bot.casemapping.lower(self.channel)
+        lines = self.hook.get_log().query(channel, self.start_time,
+                                          self.end_time, limit + 1)
+        nick = self.event.nick
+        if not lines:
+            self.bot.msg(nick, "Nothing was logged in %s then." %
+                         self.channel)
+            return
+        for line in lines[:limit]:
+            self.bot.msg(nick, line)
+        if len(lines) > limit:
+            self.bot.msg(nick, "(more lines left out)")
@@ -13,6 +13,8 @@ class ConnectionReadyHook(Hook):
         to actually do something.
     """
 
+    events = ('376', '422')
+
     def match(self, event):
         return (event.name == '376' or event.name == '422')
 
@@ -23,13 +25,17 @@ class CommandHook(Hook):
         to a message on a channel or in private. It will react to the
         bot's current nickname followed by a colon and the command
         specified in the command attribute.
+
+        The bot looks these hooks up by their command, so they are only
+        offered messages that carry it.
     """
 
     command = None
+    events = ('PRIVMSG',)
 
     def match(self, event):
-        return (event.name == 'PRIVMSG' and event.body == '%s: %s' % (
-            self.bot.config.get('nick'), self.command))
+        return (event.name == 'PRIVMSG' and event.command == self.command
+                and event.args is None)
 
 
 class CommandParamHook(Hook):
@@ -38,9 +44,12 @@ class CommandParamHook(Hook):
         In case you want your command to take parameters, too.
     """
 
+    command = None
+    events = ('PRIVMSG',)
+
     def match(self, event):
-        return (event.name == 'PRIVMSG' and event.body.startswith('%s: %s ' %
-                (self.bot.config.get('nick'), self.command)))
+        return (event.name == 'PRIVMSG' and event.command == self.command
+                and event.args is not None)
 
 
 @Alebot.hook
@@ -54,19 +63,43 @@ class SocketConnectedHook(Hook):
         an actual IRC event..
     """
 
+    events = ('SOCK_CONNECTED',)
+
     def match(self, event):
         return (event.name == 'SOCK_CONNECTED')
 
     def call(self, event):
         self.bot.logger.info("Socket is ready, logging in.")
-        self.send_raw("NICK %s" % self.bot.config['nick'])
+        settings = self.bot.settings
+        self.bot.nick = settings.nick
+        self.send_raw("NICK %s" % self.bot.nick)
         self.send_raw("USER %s * %s :%s" % (
-            self.bot.config['ident'],
-            self.bot.config['ident'],
-            self.bot.config['realname']
+            settings.ident,
+            settings.ident,
+            settings.realname
         ))
 
 
+@Alebot.hook
+class NickChangeHook(Hook):
+
+    """
+        Keeps track of the bot's current nick, in case it is changed
+        on the server, so that commands keep working.
+    """
+
+    events = ('NICK',)
+
+    def match(self, event):
+        return (event.name == 'NICK' and bool(event.nick) and
+                bool(event.target) and
+                self.bot.casemapping.equal(event.nick, self.bot.nick))
+
+    def call(self, event):
+        self.bot.nick = event.target
+        self.bot.logger.info("Nick changed to '%s'." % self.bot.nick)
+
+
 @Alebot.hook
 class PingPong(Hook):
 
@@ -77,6 +110,8 @@ class PingPong(Hook):
         It matches the `PING` event to do that.
     """
 
+    events = ('PING',)
+
     def match(self, event):
         return (event.name == 'PING')
 
@@ -1,7 +1,296 @@
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
 import re
+import threading
+import time
+
 import requests
-import json
-from alebot import Alebot, Hook, Task
+import requests.adapters
+from alebot import Alebot, Hook, Settings, Task
+
+Settings.option('shortlink', 'shortlink', dict, {})
+Settings.option('shortlinkLength', 'shortlink.length', int, 50)
+
+
+class ShortLinkBackend(object):
+
+    """
+        The interface of the services that shorten links. A backend
+        only has to implement :func:`shorten`, caching and coalescing
+        are done by the :class:`.Shortener`.
+
+        Every backend is built with the `shortlink` settings as keyword
+        arguments and should ignore the ones it does not know.
+    """
+
+    def __init__(self, **settings):
+        self.settings = settings
+
+    def shorten(self, url):
+        """
+            Override this to return the short version of `url`. Raise
+            an exception if that is not possible.
+        """
+        raise NotImplementedError()
+
+    def shorten_many(self, urls):
+        """
+            Returns the short versions of all the `urls` as a list.
+            Override this if the service can shorten several urls with
+            one request, this implementation shortens them one by one.
+        """
+        return [self.shorten(url) for url in urls]
+
+    def close(self):
+        """
+            Frees whatever the backend holds on to.
+        """
+        pass
+
+
+class HttpBackend(ShortLinkBackend):
+
+    """
+        Shortens links with an is.gd compatible web service: the long
+        url is passed as the `url` query parameter and the short one is
+        returned as plain text.
+
+        All requests go through one session, so the connection to the
+        service is kept open and reused. The service cannot shorten
+        several urls with one request, so :func:`shorten_many` sends
+        the requests at the same time instead, one per connection.
+
+            :param api: the address of the service
+            :param timeout: how long to wait for the connection and for
+                the answer, in seconds, or a list of both
+            :param connections: how many connections may be kept open
+    """
+
+    def __init__(self, api='https://is.gd/create.php', timeout=5,
+                 connections=4, **settings):
+        super(HttpBackend, self).__init__(**settings)
+        self.api = api
+        self.timeout = tuple(timeout) if isinstance(timeout, list) \
+            else timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            connections, thread_name_prefix='alebot-shortlink')
+
+    def shorten(self, url):
+        r = self.session.get(self.api, timeout=self.timeout,
+                             params={'format': 'simple', 'url': url})
+        r.raise_for_status()
+        return r.text.strip()
+
+    def shorten_many(self, urls):
+        if len(urls) < 2:
+            return [self.shorten(url) for url in urls]
+        return list(self.executor.map(self.shorten, urls))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+class LocalBackend(ShortLinkBackend):
+
+    """
+        Makes up short links without asking anybody, for tests and load
+        runs. The same url always gets the same short link.
+
+            :param base: what the short links start with
+            :param delay: how long every link takes, in seconds, to
+                pretend there is a service
+    """
+
+    def __init__(self, base='https://short.invalid/', delay=0, **settings):
+        super(LocalBackend, self).__init__(**settings)
+        self.base = base
+        self.delay = delay
+        self.calls = 0
+
+    def shorten(self, url):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return self.base + hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]
+
+
+class LinkCache(object):
+
+    """
+        Remembers the short links of the most recently used long urls,
+        up to `size` of them, each for `ttl` seconds. If a `path` is
+        given, the cache is read from and written to that file, so it
+        survives restarts. The file is written `save_delay` seconds
+        after a link was added, together with the links added in the
+        meantime, and by :func:`close`.
+    """
+
+    def __init__(self, size=1024, ttl=7 * 24 * 3600, path=None,
+                 save_delay=5):
+        self.size = size
+        self.ttl = ttl
+        self.path = path
+        self.save_delay = save_delay
+        self.links = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.timer = None
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def get(self, url):
+        """
+            Returns the short link of `url` or `None`.
+        """
+        with self.lock:
+            link = self.links.get(url)
+            if link is None or link[1] < time.time():
+                if link is not None:
+                    del self.links[url]
+                self.misses += 1
+                return None
+            self.links.move_to_end(url)
+            self.hits += 1
+            return link[0]
+
+    def put(self, url, short):
+        """
+            Remembers the short link of `url`, and writes the cache
+            later.
+        """
+        with self.lock:
+            self.links[url] = (short, time.time() + self.ttl)
+            self.links.move_to_end(url)
+            while len(self.links) > self.size:
+                self.links.popitem(last=False)
+            if not self.path:
+                return
+            self.dirty = True
+            if self.timer is None:
+                self.timer = threading.Timer(self.save_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """
+            Writes the cache right away, if links were added since it
+            was written last.
+        """
+        with self.lock:
+            self.timer = None
+            if self.dirty:
+                self.dirty = False
+                self.save()
+
+    def close(self):
+        """
+            Writes the links that were not written yet.
+        """
+        with self.lock:
+            timer = self.timer
+        if timer is not None:
+            timer.cancel()
+        self.flush()
+
+    def load(self):
+        """
+            Reads the links that did not expire yet from the file.
+        """
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                links = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for url, short, expires in links[-self.size:]:
+            if expires > now:
+                self.links[url] = (short, expires)
+
+    def save(self):
+        """
+            Writes the links to the file, oldest first.
+        """
+        if not self.path:
+            return
+        links = [(url, short, expires)
+                 for url, (short, expires) in self.links.items()]
+        try:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(links, f)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError:
+            pass
+
+
+class Shortener(object):
+
+    """
+        Shortens links with a :class:`.ShortLinkBackend` and keeps the
+        results in a :class:`.LinkCache`. If several tasks want the same
+        link shortened at once, only the first one asks the backend and
+        the others wait for its answer.
+    """
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.running = {}
+
+    def shorten(self, url):
+        """
+            Returns the short link of `url`, raises whatever the
+            backend raised.
+        """
+        return self.shorten_many([url])[0]
+
+    def shorten_many(self, urls):
+        """
+            Returns the short links of all the `urls` as a list. The
+            ones that are neither cached nor being shortened already
+            are passed to the backend at once.
+        """
+        shorts = [self.cache.get(url) for url in urls]
+        owned = []
+        futures = {}
+        with self.lock:
+            for url, short in zip(urls, shorts):
+                if short is not None or url in futures:
+                    continue
+                future = self.running.get(url)
+                if future is None:
+                    future = self.running[url] = concurrent.futures.Future()
+                    owned.append(url)
+                futures[url] = future
+        if owned:
+            try:
+                for url, short in zip(owned,
+                                      self.backend.shorten_many(owned)):
+                    self.cache.put(url, short)
+                    futures[url].set_result(short)
+            except Exception as e:
+                for url in owned:
+                    if not futures[url].done():
+                        futures[url].set_exception(e)
+                raise
+            finally:
+                with self.lock:
+                    for url in owned:
+                        del self.running[url]
+        return [short if short is not None else futures[url].result()
+                for url, short in zip(urls, shorts)]
 
 
 @Alebot.hook
@@ -10,54 +299,138 @@ class ShortLink(Hook):
     """
         Shorten links that are too long.
 
-        Tries to find all http links and spawns a background task
-        that generates a goo.gl shortlink with the help of the google
-        api.
+        Finds all http links in a message and spawns one background
+        task that shortens the long ones with the configured backend
+        and sends the short links to the channel.
 
         Use the config setting "shortlink": {"length": <int>}. If not
         specified links from 50 chars up will be converted, if
         specified from the given number of chars up.
+
+        The other settings of the "shortlink" key are:
+
+            - "backend": "http" (the default) or "local", see
+              :attr:`backends`
+            - "api" and "timeout": passed to the :class:`.HttpBackend`
+            - "cacheSize" and "cacheTtl": how many links are
+              remembered (default: 1024) and for how many seconds
+              (default: a week)
+
+        .. attribute:: backends
+
+            The backends that can be configured, by name. Plugins may
+            add their own :class:`.ShortLinkBackend` here.
     """
 
-    url_regex = re.compile(
-        "http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|"
-        + "(?:%[0-9a-fA-F][0-9a-fA-F]))+"
-    )
+    # a single character class, so that scanning never backtracks
+    url_regex = re.compile(r'https?://[^\s<>"\'\x00-\x1f\x7f]+', re.I)
+    events = ('PRIVMSG', 'SOCK_CLOSED')
+    backends = {
+        'http': HttpBackend,
+        'local': LocalBackend,
+    }
+
+    def __init__(self, bot):
+        super(ShortLink, self).__init__(bot)
+        self.shortener = None
+        self.settings = None
+        self.lock = threading.Lock()
+
+    def get_shortener(self):
+        """
+            Returns the :class:`.Shortener`, which is built anew
+            whenever the settings changed.
+        """
+        settings = self.bot.settings.shortlink
+        with self.lock:
+            if self.shortener is None or settings != self.settings:
+                if self.shortener is not None:
+                    self.shortener.backend.close()
+                    self.shortener.cache.close()
+                self.settings = dict(settings)
+                Backend = self.backends[settings.get('backend', 'http')]
+                backend = Backend(**dict((key, value) for key, value
+                                         in settings.items()
+                                         if key != 'backend'))
+                path = None
+                if self.bot.path:
+                    path = os.path.join(self.bot.path, 'shortlinks.json')
+                cache = LinkCache(settings.get('cacheSize', 1024),
+                                  settings.get('cacheTtl', 7 * 24 * 3600),
+                                  path)
+                self.shortener = Shortener(backend, cache)
+            return self.shortener
+
+    @classmethod
+    def scan(cls, text):
+        """
+            Returns all the urls in `text`, in one pass over it.
+            Punctuation at the end of an url is left out, and so is a
+            closing parenthesis without an opening one.
+        """
+        urls = []
+        for url in cls.url_regex.findall(text):
+            url = url.rstrip('.,;:!?')
+            # the parentheses are counted once, then the closing ones
+            # without a partner are cut off the end
+            excess = url.count(')') - url.count('(')
+            end = len(url)
+            while excess > 0 and url[end - 1] == ')':
+                end -= 1
+                excess -= 1
+                while url[end - 1] in '.,;:!?':
+                    end -= 1
+            urls.append(url[:end])
+        return urls
+
+    def long_urls(self, event):
+        """
+            Returns the urls of the event that are long enough to be
+            shortened. They are kept in :attr:`Event.cache`, so the
+            message is only scanned once.
+        """
+        return event.memo('shortlink.urls', self.find_long_urls)
+
+    def find_long_urls(self, event):
+        length = self.bot.settings.shortlinkLength
+        return [url for url in self.scan(event.body or '')
+                if len(url) >= length]
 
     def match(self, event):
         """
-            Check whether the event is a message, whether an url is given
-            and whether the url is long enough to match.
+            Check whether the event is a message and whether it
+            contains an url that is long enough.
         """
+        if event.name == 'SOCK_CLOSED':
+            return self.shortener is not None
         if (event.name != 'PRIVMSG'):
             return False
-        length = self.bot.config.get('shortlink', {}).get('length', 50)
-        match = self.url_regex.match(event.body)
-        if (match and len(match.group(0)) >= length):
-            return True
-        return False
+        return bool(self.long_urls(event))
 
     def call(self, event):
         """
-            Spawn background task with the url.
+            Spawn background task with the urls. When the connection
+            is closed, write the links that were not written yet.
         """
-        self.long_url = self.url_regex.match(event.body).group(0)
-        task = RequestShortLink(self, event)
+        if event.name == 'SOCK_CLOSED':
+            self.shortener.cache.close()
+            return
+        task = RequestShortLink(self, event, self.long_urls(event))
         task.start()
 
 
 class RequestShortLink(Task):
 
     """
-        Uses requests to rshorten the url with google.
-        As soon as the answer is received, it sends the result to
-        the channel.
+        Shortens the urls with the hook's :class:`.Shortener`.
+        As soon as the answer is received, it sends the results to
+        the channel in one message.
     """
 
-    def do(self):
-        url = 'https://www.googleapis.com/urlshortener/v1/url'
-        headers = {'content-type': 'application/json'}
-        payload = {'longUrl': self.hook.long_url}
-        r = requests.post(url, data=json.dumps(payload), headers=headers)
+    def __init__(self, hook, event, urls):
+        super(RequestShortLink, self).__init__(hook, event)
+        self.urls = urls
 
-        self.bot.msg(self.event.target, r.json()['id'])
+    def do(self):
+        shorts = self.hook.get_shortener().shorten_many(self.urls)
+        self.bot.msg(self.event.target, ' '.join(shorts))
@@ -0,0 +1,151 @@
+import collections
+import logging
+import threading
+
+
+class TaskPool(object):
+
+    """
+        A fixed number of worker threads that run :class:`.Task`
+        objects from a bounded queue, so that a burst of tasks can not
+        turn into a burst of threads.
+
+            :param workers: the number of worker threads
+            :param queue_size: how many tasks may wait for a worker
+            :param overflow: what to do with a new task if the queue
+                is full, one of:
+
+                `reject`: the new task is not run at all.
+
+                `drop_oldest`: the task that has been waiting the
+                longest is thrown away to make room.
+
+                `block`: the caller waits until there is room. Keep in
+                mind that the caller usually is the bot's event loop.
+
+            :param per_plugin: how many tasks of the same plugin may run
+                at the same time, or `None` for no limit.
+            :param logger: where to report failed and dropped tasks
+
+        Workers are only started once there is something to do.
+    """
+
+    REJECT = 'reject'
+    DROP_OLDEST = 'drop_oldest'
+    BLOCK = 'block'
+
+    def __init__(self, workers=4, queue_size=100, overflow=REJECT,
+                 per_plugin=None, logger=None):
+        self.lock = threading.Condition()
+        self.queue = collections.deque()
+        self.threads = []
+        self.active = collections.Counter()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.logger = logger or logging.getLogger('alebot')
+        self.configure(workers, queue_size, overflow, per_plugin)
+
+    def configure(self, workers=4, queue_size=100, overflow=REJECT,
+                  per_plugin=None):
+        """
+            Changes the limits of the pool. Already queued or running
+            tasks are not affected, surplus workers are not stopped
+            though.
+        """
+        if overflow not in (self.REJECT, self.DROP_OLDEST, self.BLOCK):
+            raise ValueError("Unknown overflow policy '%s'." % overflow)
+        with self.lock:
+            self.workers = max(1, int(workers))
+            self.queue_size = max(1, int(queue_size))
+            self.overflow = overflow
+            self.per_plugin = per_plugin
+            self.lock.notify_all()
+
+    def submit(self, task):
+        """
+            Queues a task to be run by one of the workers.
+
+                :returns: `False` if the task was rejected, `True`
+                    otherwise.
+        """
+        with self.lock:
+            while len(self.queue) >= self.queue_size:
+                if self.overflow == self.BLOCK:
+                    self.lock.wait()
+                elif self.overflow == self.DROP_OLDEST:
+                    dropped = self.queue.popleft()
+                    dropped.done.set()
+                    self.dropped += 1
+                    self.logger.warning("Task queue full, dropped %s."
+                                        % dropped)
+                else:
+                    task.done.set()
+                    self.rejected += 1
+                    self.logger.warning("Task queue full, rejected %s."
+                                        % task)
+                    return False
+            self.queue.append(task)
+            if len(self.threads) < self.workers:
+                thread = threading.Thread(target=self.work,
+                                          name='alebot-task-%d' %
+                                          len(self.threads))
+                thread.daemon = True
+                self.threads.append(thread)
+                thread.start()
+            self.lock.notify_all()
+        return True
+
+    def next_task(self):
+        """
+            Takes the first waiting task whose plugin is below its
+            concurrency limit off the queue, or returns `None`. Has to
+            be called with the lock held.
+        """
+        for i, task in enumerate(self.queue):
+            if self.per_plugin is None or \
+                    self.active[task.plugin] < self.per_plugin:
+                del self.queue[i]
+                return task
+        return None
+
+    def work(self):
+        """
+            The worker threads' main loop.
+        """
+        while True:
+            with self.lock:
+                task = self.next_task()
+                while task is None:
+                    self.lock.wait()
+                    task = self.next_task()
+                self.active[task.plugin] += 1
+                # there is room in the queue again
+                self.lock.notify_all()
+            succeeded = task.run()
+            with self.lock:
+                self.active[task.plugin] -= 1
+                if not self.active[task.plugin]:
+                    del self.active[task.plugin]
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.lock.notify_all()
+
+    def stats(self):
+        """
+            Returns the current counters of the pool as a dict:
+            `queued` and `running` tasks right now, and the totals of
+            `completed`, `failed`, `rejected` and `dropped` tasks.
+        """
+        with self.lock:
+            return {
+                'queued': len(self.queue),
+                'running': sum(self.active.values()),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'dropped': self.dropped,
+            }
@@ -0,0 +1,249 @@
+import logging
+import marshal
+import multiprocessing
+import queue
+import threading
+
+from . import Alebot, CaseMapping, Event, Hook, IngressLimiter
+
+
+class PluginProcess(Hook):
+
+    """
+        Runs the hooks of one plugin in a worker process of its own, so
+        that a CPU heavy plugin does not hold up the bot. The bot uses
+        it in place of the plugin's hooks for every plugin listed in
+        the `processPlugins` setting, the plugin itself does not have
+        to be changed.
+
+        It is offered the events the plugin's hooks declared and sends
+        them to the worker, which matches and calls the hooks just like
+        the bot would. Whatever the hooks send is handed back to
+        :func:`Alebot.send_raw` of the bot.
+
+        Inside the worker the hooks get a :class:`.PluginHost` as their
+        bot. It has a copy of the configuration, but changes to it do
+        not find their way back.
+
+        The events are handed to the worker by a thread of its own, so
+        that a worker that falls behind does not hold up the bot. Once
+        :attr:`QUEUE_SIZE` events are waiting, further events are
+        dropped and counted in :attr:`dropped`.
+
+            :param bot: the bot instance
+            :param plugin: the name of the plugin
+            :param Hooks: the plugin's hook classes
+
+        .. attribute:: dropped
+
+            How many events were dropped because the worker fell
+            behind.
+    """
+
+    context = multiprocessing.get_context('spawn')
+    # events waiting for the worker, before further ones are dropped
+    QUEUE_SIZE = 1000
+
+    def __init__(self, bot, plugin, Hooks):
+        super(PluginProcess, self).__init__(bot)
+        self.plugin = plugin
+        self.classes = list(Hooks)
+        self.events = self.collect_events(Hooks)
+        self.commands = self.collect_commands(Hooks)
+        self.conn, child = self.context.Pipe()
+        self.process = self.context.Process(
+            target=PluginHost.serve, name='alebot-%s' % plugin,
+            args=(child, bot.name, plugin, bot.Paths(), bot.config))
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        self.queue = queue.Queue(self.QUEUE_SIZE)
+        self.dropped = 0
+        self.overflowing = False
+        self.stopping = False
+        self.sender = threading.Thread(target=self.send,
+                                       name='alebot-%s-sender' % plugin)
+        self.sender.daemon = True
+        self.sender.start()
+        self.reader = threading.Thread(target=self.receive,
+                                       name='alebot-%s-reader' % plugin)
+        self.reader.daemon = True
+        self.reader.start()
+        bot.logger.info("Started plugin '%s' in process %s." %
+                        (plugin, self.process.pid))
+
+    def __repr__(self):
+        return '<alebot.PluginProcess %s>' % self.plugin
+
+    @staticmethod
+    def collect_events(Hooks):
+        """
+            Returns the event names any of the hooks is interested in,
+            or `None` if one of them wants all events.
+        """
+        events = set()
+        for Class in Hooks:
+            if Class.events is None:
+                return None
+            events.update(Class.events)
+        return tuple(events)
+
+    @staticmethod
+    def collect_commands(Hooks):
+        """
+            Returns the commands of the hooks, if all the hooks that
+            handle `PRIVMSG` are command hooks, otherwise `None`.
+        """
+        commands = set()
+        for Class in Hooks:
+            if Class.events is not None and 'PRIVMSG' not in Class.events:
+                continue
+            command = getattr(Class, 'command', None)
+            if command is None:
+                return None
+            commands.add(command)
+        return commands
+
+    def match(self, event):
+        # with commands, the bot only offers the PRIVMSG events that
+        # carry one of them, after its ingress limits (see index_hooks)
+        return True
+
+    def call(self, event):
+        data = marshal.dumps((event.name, event.user, event.target,
+                              event.body, event.params, event.tags,
+                              self.bot.nick, self.bot.casemapping.name))
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            self.dropped += 1
+            if not self.overflowing:
+                self.overflowing = True
+                self.bot.logger.warning("Plugin process '%s' fell behind, "
+                                        "dropping events." % self.plugin)
+            return
+        if self.overflowing:
+            self.overflowing = False
+            self.bot.logger.warning("Plugin process '%s' caught up, %d "
+                                    "events dropped so far." %
+                                    (self.plugin, self.dropped))
+
+    def send(self):
+        """
+            Hands the queued events to the worker, until the worker
+            goes away or :func:`stop` is called.
+        """
+        while True:
+            data = self.queue.get()
+            try:
+                if data is None:
+                    # tells the worker to exit; closing the connection
+                    # does not, as the reader is still blocked on it
+                    self.conn.send_bytes(b'')
+                    break
+                self.conn.send_bytes(data)
+            except (EOFError, OSError):
+                break
+
+    def receive(self):
+        """
+            Hands the lines the worker wants to send to the bot, until
+            the worker goes away.
+        """
+        while True:
+            try:
+                data = self.conn.recv_bytes()
+            except (EOFError, OSError):
+                break
+            self.bot.send_raw(marshal.loads(data))
+        if not self.stopping and self.process.exitcode not in (None, 0):
+            self.bot.logger.error("Plugin process '%s' died with exit code "
+                                  "%s." % (self.plugin, self.process.exitcode))
+
+    def stop(self):
+        """
+            Shuts the worker down, after it got the events that are
+            queued already. A worker that does not exit within a second
+            is terminated.
+        """
+        self.stopping = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.sender.join(1)
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        self.reader.join(1)
+        self.conn.close()
+
+
+class PluginHost(Alebot):
+
+    """
+        The bot the hooks of a :class:`.PluginProcess` see inside their
+        worker process. It loads only their plugin, dispatches the
+        events it receives like a bot would, and sends whatever the
+        hooks want to send back to the real bot.
+    """
+
+    def __init__(self, conn, name, plugin, paths, config):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.name = name
+        self.path = None
+        self.logger = logging.getLogger('alebot.%s.%s' % (name, plugin))
+        self.logger.propagate = False
+        self.loop = None
+        self.tasks = None
+        self.metrics = None
+        # without limits: the bot admits the commands of a process
+        # plugin before it sends them, and hooks without a command are
+        # not limited in the bot either
+        self.ingress = IngressLimiter()
+        self.casemapping = CaseMapping.get()
+        self.state = None
+        self.config = dict(config)
+        self.config['processPlugins'] = []
+        self.update_settings()
+        self.configure_logging()
+        self.configure_tasks()
+        self.nick = self.settings.nick
+        self._command_nick = None
+        self._command_prefix = None
+        Alebot._Paths = list(paths)
+        self.manifest = {}
+        self.plugins = []
+        if self.load_plugin(plugin, logger=self.logger):
+            self.plugins.append(plugin)
+        self.activate_hooks()
+
+    @classmethod
+    def serve(cls, conn, name, plugin, paths, config):
+        """
+            The worker process' main function: receives events until
+            the bot stops it or closes the connection.
+        """
+        host = cls(conn, name, plugin, paths, config)
+        while True:
+            try:
+                data = conn.recv_bytes()
+            except (EOFError, OSError):
+                break
+            if not data:
+                break
+            name, user, target, body, params, tags, nick, casemapping = \
+                marshal.loads(data)
+            host.nick = nick
+            host.casemapping = CaseMapping.get(casemapping)
+            host.call_hooks(Event(name, user, target, body, params, tags))
+
+    def send_raw(self, data):
+        """
+            Sends the line to the real bot, which sends it to the
+            server.
+        """
+        with self.lock:
+            self.conn.send_bytes(marshal.dumps(data))
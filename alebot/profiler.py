@@ -0,0 +1,237 @@
+import collections
+import cProfile
+import os
+import sys
+import threading
+import time
+
+
+class SamplingProfiler(object):
+
+    """
+        Looks at the stacks of all threads every `interval` seconds
+        from a thread of its own and counts how often each stack was
+        seen. Unlike :mod:`cProfile` it costs the profiled code next to
+        nothing and sees the task pool's threads, too.
+
+        Every sample is attributed to the innermost plugin on the stack
+        and, if that frame belongs to a hook or task, to its class, so
+        it is easy to tell which plugin the time went to. Samples
+        without a plugin on the stack are attributed to `(alebot)` in
+        the stacks, but not counted in :attr:`owners`.
+
+            :param plugins: a function that returns the names of the
+                plugin modules. It is asked before every sample, so
+                plugins that are loaded or reloaded in the meantime are
+                recognized.
+            :param interval: the time between two samples, in seconds
+    """
+
+    def __init__(self, plugins, interval=0.005):
+        self.plugins = plugins
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.owners = collections.Counter()
+        self.samples = 0
+        self.running = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.running.set()
+        self.thread = threading.Thread(target=self.run,
+                                       name='alebot-profiler')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.thread.join()
+
+    def run(self):
+        own = threading.get_ident()
+        names = dict((thread.ident, thread.name)
+                     for thread in threading.enumerate())
+        while self.running.is_set():
+            plugins = self.plugins()
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = dict((thread.ident, thread.name)
+                                 for thread in threading.enumerate())
+                self.sample(names.get(ident, str(ident)), frame, plugins)
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def sample(self, thread, frame, plugins):
+        """
+            Counts the stack of one thread.
+        """
+        stack = []
+        owner = None
+        while frame is not None:
+            code = frame.f_code
+            stack.append('%s (%s:%d)' % (code.co_name,
+                                         os.path.basename(code.co_filename),
+                                         code.co_firstlineno))
+            if owner is None:
+                module = frame.f_globals.get('__name__')
+                if module in plugins:
+                    owner = module
+                    if 'self' in code.co_varnames[:1]:
+                        instance = frame.f_locals.get('self')
+                        if instance is not None:
+                            owner = '%s.%s' % (
+                                module, instance.__class__.__name__)
+            frame = frame.f_back
+        stack.append(owner or '(alebot)')
+        stack.append(thread)
+        stack.reverse()
+        self.stacks[';'.join(stack)] += 1
+        if owner is not None:
+            self.owners[owner] += 1
+
+    def dump(self, path):
+        """
+            Writes the stacks in the folded format that flamegraph.pl
+            and speedscope read: one stack per line, the frames from the
+            outermost to the innermost separated by semicolons, followed
+            by the number of samples.
+        """
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write('%s %d\n' % (stack, count))
+
+
+class Profiler(object):
+
+    """
+        Profiles the running bot on demand, either deterministically
+        with :mod:`cProfile` (`cpu` mode), which only sees the event
+        loop's thread, or with the :class:`.SamplingProfiler` (`sample`
+        mode). It is started and stopped by the `profile` command of
+        the admin plugin or by a signal (see :func:`Alebot.handle_signals`).
+
+        The profiles are written to the bot path as
+        `profile-<time>.prof`, which can be loaded with :mod:`pstats`,
+        or as `profile-<time>.folded` for flamegraphs. On the event
+        loop, they are written in its executor.
+
+            :param bot: the bot instance
+
+        .. attribute:: writing
+
+            The future of the profile that is being written in the
+            executor, or `None`.
+    """
+
+    CPU = 'cpu'
+    SAMPLE = 'sample'
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.mode = None
+        self.profile = None
+        self.started = None
+        self.last = None
+        self.writing = None
+        self.lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.mode is not None
+
+    def start(self, mode=CPU, interval=0.005):
+        """
+            Starts profiling. `cpu` mode has to be started from the
+            thread that should be profiled, usually the event loop's.
+
+                :returns: `False` if a profile is already running.
+        """
+        if mode not in (self.CPU, self.SAMPLE):
+            raise ValueError("Unknown profiling mode '%s'." % mode)
+        with self.lock:
+            if self.running:
+                return False
+            if mode == self.CPU:
+                self.profile = cProfile.Profile()
+                self.profile.enable()
+            else:
+                # the plugins are replaced when they are reloaded
+                self.profile = SamplingProfiler(
+                    lambda: self.bot.Plugins, interval)
+                self.profile.start()
+            self.mode = mode
+            self.started = time.time()
+        self.bot.logger.info("Started %s profiling." % mode)
+        return True
+
+    def stop(self):
+        """
+            Stops profiling and writes the profile, in the executor if
+            this is called on the event loop (see :attr:`writing`).
+
+                :returns: the path of the profile, or `None` if no
+                    profile was running.
+        """
+        with self.lock:
+            if not self.running:
+                return None
+            mode, profile = self.mode, self.profile
+            self.mode = self.profile = None
+            name = 'profile-%s' % time.strftime('%Y%m%d-%H%M%S')
+            if mode == self.CPU:
+                profile.disable()
+                path = os.path.join(self.bot.path, name + '.prof')
+            else:
+                profile.stop()
+                path = os.path.join(self.bot.path, name + '.folded')
+            self.last = profile
+        duration = time.time() - self.started
+        loop = self.bot.loop
+        if loop is not None and \
+                threading.get_ident() == self.bot._loop_thread:
+            self.writing = loop.run_in_executor(None, self.write, mode,
+                                                profile, path, duration)
+        else:
+            self.write(mode, profile, path, duration)
+        return path
+
+    def write(self, mode, profile, path, duration):
+        """
+            Writes a stopped profile to `path`.
+        """
+        try:
+            if mode == self.CPU:
+                profile.dump_stats(path)
+            else:
+                profile.dump(path)
+        except OSError as e:
+            self.bot.logger.error("Could not write the %s profile to "
+                                  "'%s': %s" % (mode, path, e))
+            return
+        self.bot.logger.info("Wrote %s profile of %.1f s to '%s'." % (
+            mode, duration, path))
+
+    def toggle(self, mode=CPU):
+        """
+            Starts profiling if it is not running, stops it otherwise.
+        """
+        if self.running:
+            return self.stop()
+        self.start(mode)
+
+    def summary(self, top=3):
+        """
+            Returns a line about the last sampling profile: the plugins
+            and hooks most of the samples in plugins were attributed
+            to, or `None` if there is none.
+        """
+        profile = self.last
+        if not isinstance(profile, SamplingProfiler) or \
+                not profile.owners:
+            return None
+        total = sum(profile.owners.values())
+        return ', '.join('%s %.0f%%' % (owner, count * 100.0 / total)
+                         for owner, count in
+                         profile.owners.most_common(top))
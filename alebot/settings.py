@@ -0,0 +1,191 @@
+import re
+from types import MappingProxyType
+
+from .flood import IngressLimiter
+from .hostmask import HostmaskSet
+from .pool import TaskPool
+
+
+class Settings(object):
+
+    """
+        A read only snapshot of the bot's configuration, built whenever
+        it is loaded or changed (see :func:`Alebot.update_settings`).
+        Every option is checked against its type once, when the
+        snapshot is built, and missing or invalid options get their
+        default, so code that runs for every event only has to read an
+        attribute instead of digging through the config dict.
+
+        The options are registered with :func:`option`. Plugins may
+        register their own, they are filled in from the configuration
+        the first time they are read.
+
+        Options that are objects, i.e. `flood`, are copies that can not
+        be changed, so that the snapshot stays what was checked.
+
+            :param config: the configuration dict
+
+        .. attribute:: errors
+
+            A list of messages about the options that had an invalid
+            value and got their default instead.
+    """
+
+    OPTIONS = {}
+
+    def __init__(self, config):
+        object.__setattr__(self, 'config', config)
+        object.__setattr__(self, 'errors', [])
+        for name in self.OPTIONS:
+            object.__setattr__(self, name, self.build(name))
+
+    def __getattr__(self, name):
+        # options registered after the snapshot was built
+        if name not in self.OPTIONS:
+            raise AttributeError(name)
+        value = self.build(name)
+        object.__setattr__(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are read only, change the config "
+                             "and call Alebot.update_settings instead.")
+
+    def __repr__(self):
+        return '<alebot.Settings %s>' % ', '.join(sorted(self.OPTIONS))
+
+    @classmethod
+    def option(cls, name, path, types, default, convert=None, check=None):
+        """
+            Registers an option.
+
+                :param name: the attribute the option is available as
+                :param path: the key of the option in the config, with
+                    dots between the keys of nested objects, i.e.
+                    `shortlink.length`
+                :param types: the type or tuple of types the value must
+                    have. For an object with known keys, a dict of the
+                    keys to a tuple of their types, their default and
+                    optionally their check, so that every key is
+                    checked on its own and the defaults are filled in.
+                :param default: the value if the option is missing or
+                    invalid
+                :param convert: an optional function that turns the
+                    value into what the attribute holds, i.e. `tuple`
+                :param check: an optional function that returns whether
+                    a value of the right type is valid
+        """
+        cls.OPTIONS[name] = (tuple(path.split('.')), types, default, convert,
+                             check)
+
+    def build(self, name):
+        """
+            Looks up, checks and converts the value of an option.
+        """
+        path, types, default, convert, check = self.OPTIONS[name]
+        value = self.config
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                value = default
+                break
+            value = value[key]
+        if isinstance(types, dict):
+            value = self.validate(path, dict, default, value=value)
+            value = dict(value)
+            for key, spec in types.items():
+                value[key] = self.validate(path + (key,), *spec,
+                                           value=value.get(key, spec[1]))
+        else:
+            value = self.validate(path, types, default, check, value)
+        if isinstance(value, dict):
+            value = MappingProxyType(dict(value))
+        if convert is not None:
+            value = convert(value)
+        return value
+
+    def validate(self, path, types, default, check=None, value=None):
+        """
+            Returns the value if it has the right type and passes the
+            check, otherwise records an error and returns the default.
+        """
+        if value is default:
+            return value
+        if isinstance(value, types) and (check is None or check(value)):
+            return value
+        self.errors.append("Option '%s' is %r, using %r instead." %
+                           ('.'.join(path), value, default))
+        return default
+
+
+def positive(value):
+    """
+        Whether a limit is a positive number, or `None` for no limit.
+    """
+    return value is None or value > 0
+
+
+def one_of(*choices):
+    """
+        Returns a check whether a value is one of the choices.
+    """
+    return lambda value: value in choices
+
+
+def list_of(types):
+    """
+        Returns a check whether every item of a list has one of the
+        types.
+    """
+    return lambda value: all(isinstance(item, types) for item in value)
+
+
+# a letter or one of []\`_^{|} first, then digits and dashes as well
+NICK = re.compile(r'[A-Za-z\[\]\\`_^{|}][A-Za-z0-9\[\]\\`_^{|}-]*\Z')
+WORD = re.compile(r'[^\s@]+\Z')
+
+
+Settings.option('nick', 'nick', str, 'alebot', check=NICK.match)
+Settings.option('ident', 'ident', str, 'alebot', check=WORD.match)
+Settings.option('realname', 'realname', str, 'alebot python irc bot. '
+                'https://github.com/alexex/alebot',
+                check=lambda value: '\r' not in value and '\n' not in value)
+Settings.option('server', 'server', str, 'irc.freenode.net')
+Settings.option('port', 'port', int, 6667)
+Settings.option('tasks', 'tasks', {
+    'workers': (int, 4, positive),
+    'queueSize': (int, 100, positive),
+    'overflow': (str, TaskPool.REJECT,
+                 one_of(TaskPool.REJECT, TaskPool.DROP_OLDEST,
+                        TaskPool.BLOCK)),
+    'perPlugin': ((int, type(None)), None, positive),
+}, {})
+Settings.option('flood', 'flood', {
+    'linesPerSecond': ((int, float, type(None)), None, positive),
+    'burstLines': (int, 5, positive),
+    'bytesPerSecond': ((int, float, type(None)), None, positive),
+    'burstBytes': (int, 2560, positive),
+}, {})
+Settings.option('ingress', 'ingress', {
+    'linesPerSecond': ((int, float, type(None)), None, positive),
+    'burstLines': (int, 5, positive),
+    'channelLinesPerSecond': ((int, float, type(None)), None, positive),
+    'channelBurstLines': (int, 10, positive),
+    'action': (str, IngressLimiter.DEFER,
+               one_of(IngressLimiter.DROP, IngressLimiter.DEFER)),
+    'maxDelay': ((int, float), 10, positive),
+    'maxDeferred': (int, 100, positive),
+    'tableSize': (int, 4096, positive),
+}, {})
+# the masks of the admins, which the core needs for the ingress limits and
+# the auth plugin for the admin commands
+Settings.option('admins', 'auth.admins', list, [], HostmaskSet,
+                check=list_of(str))
+Settings.option('processPlugins', 'processPlugins', list, [], frozenset,
+                check=list_of(str))
+Settings.option('lazyPlugins', 'lazyPlugins', bool, True)
+Settings.option('saveDelay', 'saveDelay', (int, float), 1)
+Settings.option('watchConfig', 'watchConfig', (bool, int, float), False)
+Settings.option('metricsEnabled', 'metrics.enabled', bool, True)
+Settings.option('metricsHost', 'metrics.host', str, '127.0.0.1')
+Settings.option('metricsPort', 'metrics.port', int, None)
+Settings.option('metricsSocket', 'metrics.socket', str, None)
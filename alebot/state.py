@@ -0,0 +1,404 @@
+import sys
+
+
+class User(object):
+
+    """
+        A user the bot shares at least one channel with.
+
+        .. attribute:: nick
+
+            The nick as the server spelled it.
+
+        .. attribute:: ident
+
+            The ident, or `None` if the bot did not see it yet.
+
+        .. attribute:: host
+
+            The host, or `None` if the bot did not see it yet.
+
+        .. attribute:: channels
+
+            A tuple of the keys of the channels the user is in. It is
+            a tuple rather than a set, as a user is in a few channels
+            at most and a set would take several times the memory.
+    """
+
+    __slots__ = ('nick', 'ident', 'host', 'channels')
+
+    def __init__(self, nick, ident=None, host=None):
+        self.nick = nick
+        self.ident = ident
+        self.host = host
+        self.channels = ()
+
+    def __repr__(self):
+        return '<alebot.User %s>' % self.nick
+
+
+class Channel(object):
+
+    """
+        A channel the bot is in.
+
+        .. attribute:: name
+
+            The name as the server spelled it.
+
+        .. attribute:: members
+
+            A dict of the keys of the nicks in the channel to their
+            prefixes, i.e. `'@'` for an operator or `''`.
+
+        .. attribute:: synced
+
+            Whether the `NAMES` of the channel have been received
+            completely.
+    """
+
+    __slots__ = ('name', 'members', 'synced', '_names')
+
+    def __init__(self, name):
+        self.name = name
+        self.members = {}
+        self.synced = False
+        self._names = None
+
+    def __repr__(self):
+        return '<alebot.Channel %s>' % self.name
+
+
+class StateTracker(object):
+
+    """
+        Keeps track of the channels the bot is in and the users in
+        them, so that plugins do not have to ask the server with `WHO`
+        or `NAMES` themselves. The bot feeds it every event before the
+        hooks get it (see :func:`Alebot.handle_line`), and clears it
+        when the connection is closed.
+
+        Channels and users are stored by their key under the server's
+        casemapping (see :func:`CaseMapping.key`) in dicts, so that
+        asking whether a nick is in a channel or which channels a nick
+        is in costs one or two lookups. The keys are interned and
+        shared between the channels and the users, and users are
+        forgotten as soon as the bot shares no channel with them
+        anymore, so it stays small even with hundreds of thousands of
+        users.
+
+        As users are already removed when the hooks get a `QUIT`, the
+        names of the channels the user was in are put into
+        :attr:`Event.cache` under `state.channels`.
+
+            :param bot: the bot instance
+
+        .. attribute:: channels
+
+            The :class:`.Channel` objects by their key.
+
+        .. attribute:: users
+
+            The :class:`.User` objects by their key.
+    """
+
+    # the prefixes of channel members and the modes that set them, until
+    # the server tells otherwise with ISUPPORT
+    PREFIX = ('ov', '@+')
+    # the channel modes that take a parameter: always, and only when set
+    CHANMODES = ('beIkqaohv', 'l')
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.channels = {}
+        self.users = {}
+        self.clear()
+        self.handlers = {
+            'JOIN': self.on_join,
+            'PART': self.on_part,
+            'KICK': self.on_kick,
+            'QUIT': self.on_quit,
+            'NICK': self.on_nick,
+            'MODE': self.on_mode,
+            '353': self.on_names,
+            '366': self.on_end_of_names,
+            '005': self.on_isupport,
+        }
+
+    def configure_prefix(self, modes, prefixes):
+        self.prefix_modes = dict(zip(modes, prefixes))
+        self.prefixes = prefixes
+        # higher ranks first, as the server sends them
+        self.prefix_rank = dict((prefix, rank)
+                                for rank, prefix in enumerate(prefixes))
+
+    def key(self, name):
+        """
+            Returns the key of a nick or channel name under the
+            casemapping of the server.
+        """
+        return self.bot.casemapping.key(name)
+
+    def update(self, event):
+        """
+            Updates the state with the event.
+        """
+        handler = self.handlers.get(event.name)
+        if handler is not None:
+            handler(event)
+
+    def is_me(self, nick):
+        return self.key(nick) == self.key(self.bot.nick)
+
+    def add_member(self, channel, nick, prefix='', ident=None, host=None):
+        key = self.key(nick)
+        user = self.users.get(key)
+        if user is None:
+            user = self.users[key] = User(sys.intern(nick), ident, host)
+        elif ident is not None:
+            user.ident = ident
+            user.host = host
+        channel_key = self.key(channel.name)
+        if channel_key not in user.channels:
+            user.channels += (channel_key,)
+        channel.members[key] = sys.intern(prefix)
+
+    def remove_member(self, channel, nick):
+        key = self.key(nick)
+        channel.members.pop(key, None)
+        user = self.users.get(key)
+        if user is not None:
+            channel_key = self.key(channel.name)
+            user.channels = tuple(other for other in user.channels
+                                  if other != channel_key)
+            if not user.channels:
+                del self.users[key]
+
+    def clear(self):
+        self.channels.clear()
+        self.users.clear()
+        self.configure_prefix(*self.PREFIX)
+        self.param_modes, self.set_param_modes = self.CHANMODES
+
+    def rekey(self):
+        """
+            Builds the keys anew after the casemapping changed.
+        """
+        users = dict((old, self.key(user.nick))
+                     for old, user in self.users.items())
+        channels = dict((old, self.key(channel.name))
+                        for old, channel in self.channels.items())
+        self.users = dict((users[old], user)
+                          for old, user in self.users.items())
+        self.channels = dict((channels[old], channel)
+                             for old, channel in self.channels.items())
+        for user in self.users.values():
+            user.channels = tuple(channels[key] for key in user.channels)
+        for channel in self.channels.values():
+            channel.members = dict((users[key], prefix)
+                                   for key, prefix in channel.members.items())
+            if channel._names is not None:
+                channel._names = set(users.get(key, key)
+                                     for key in channel._names)
+
+    def remove_channel(self, name):
+        channel = self.channels.pop(self.key(name), None)
+        if channel is None:
+            return
+        for nick in list(channel.members):
+            self.remove_member(channel, nick)
+
+    def on_join(self, event):
+        if not event.nick or not event.target:
+            return
+        if self.is_me(event.nick):
+            key = self.key(event.target)
+            if key not in self.channels:
+                self.channels[key] = Channel(sys.intern(event.target))
+        channel = self.channels.get(self.key(event.target))
+        if channel is not None:
+            self.add_member(channel, event.nick, '', event.ident, event.host)
+
+    def on_part(self, event):
+        if not event.nick or not event.target:
+            return
+        if self.is_me(event.nick):
+            self.remove_channel(event.target)
+            return
+        channel = self.channels.get(self.key(event.target))
+        if channel is not None:
+            self.remove_member(channel, event.nick)
+
+    def on_kick(self, event):
+        if len(event.params) < 2:
+            return
+        nick = event.params[1]
+        if self.is_me(nick):
+            self.remove_channel(event.target)
+            return
+        channel = self.channels.get(self.key(event.target))
+        if channel is not None:
+            self.remove_member(channel, nick)
+
+    def on_quit(self, event):
+        if not event.nick:
+            return
+        user = self.users.get(self.key(event.nick))
+        if user is None:
+            return
+        names = tuple(self.channels[key].name for key in user.channels)
+        event.memo('state.channels', lambda event: names)
+        for key in user.channels:
+            self.remove_member(self.channels[key], event.nick)
+
+    def on_nick(self, event):
+        if not event.nick or not event.target:
+            return
+        old = self.key(event.nick)
+        new = self.key(event.target)
+        user = self.users.pop(old, None)
+        if user is None:
+            return
+        user.nick = sys.intern(event.target)
+        self.users[new] = user
+        for key in user.channels:
+            members = self.channels[key].members
+            members[new] = members.pop(old, '')
+
+    def on_mode(self, event):
+        params = event.params
+        if len(params) < 3:
+            return
+        channel = self.channels.get(self.key(params[0]))
+        if channel is None:
+            return
+        args = iter(params[2:])
+        adding = True
+        for mode in params[1]:
+            if mode == '+':
+                adding = True
+            elif mode == '-':
+                adding = False
+            elif mode in self.prefix_modes:
+                nick = next(args, None)
+                key = self.key(nick) if nick else None
+                if key in channel.members:
+                    self.set_prefix(channel, key, self.prefix_modes[mode],
+                                    adding)
+            elif mode in self.param_modes or \
+                    (adding and mode in self.set_param_modes):
+                next(args, None)
+
+    def set_prefix(self, channel, key, prefix, adding):
+        """
+            Adds or removes a prefix of a member, keeping the prefixes
+            ordered from the highest rank down.
+        """
+        current = channel.members[key]
+        if adding and prefix not in current:
+            current = ''.join(sorted(current + prefix,
+                                     key=self.prefix_rank.get))
+        elif not adding:
+            current = current.replace(prefix, '')
+        channel.members[key] = sys.intern(current)
+
+    def on_names(self, event):
+        params = event.params
+        if len(params) < 4:
+            return
+        channel = self.channels.get(self.key(params[2]))
+        if channel is None:
+            return
+        if channel.synced:
+            # a new NAMES reply replaces what we know
+            channel.synced = False
+            channel._names = set()
+        elif channel._names is None:
+            channel._names = set()
+        prefixes = self.prefixes
+        for name in params[3].split():
+            stripped = name.lstrip(prefixes)
+            prefix = name[:len(name) - len(stripped)]
+            nick, bang, rest = stripped.partition('!')
+            ident, host = None, None
+            if bang:
+                ident, _, host = rest.partition('@')
+            self.add_member(channel, nick, prefix, ident, host)
+            channel._names.add(self.key(nick))
+
+    def on_end_of_names(self, event):
+        if len(event.params) < 2:
+            return
+        channel = self.channels.get(self.key(event.params[1]))
+        if channel is None:
+            return
+        if channel._names is not None:
+            for key in list(channel.members):
+                if key not in channel._names:
+                    self.remove_member(channel, key)
+        channel._names = None
+        channel.synced = True
+
+    def on_isupport(self, event):
+        for token in event.params[1:-1]:
+            name, _, value = token.partition('=')
+            if name == 'CASEMAPPING':
+                self.bot.set_casemapping(value)
+            elif name == 'PREFIX' and value.startswith('('):
+                modes, _, prefixes = value[1:].partition(')')
+                if len(modes) == len(prefixes):
+                    self.configure_prefix(modes, prefixes)
+            elif name == 'CHANMODES':
+                kinds = value.split(',')
+                if len(kinds) >= 3:
+                    self.param_modes = kinds[0] + kinds[1] + \
+                        ''.join(self.prefix_modes)
+                    self.set_param_modes = kinds[2]
+
+    def is_on(self, nick, channel):
+        """
+            Returns whether the nick is in the channel.
+        """
+        channel = self.channels.get(self.key(channel))
+        return channel is not None and self.key(nick) in channel.members
+
+    def channels_of(self, nick):
+        """
+            Returns the names of the channels the nick shares with the
+            bot.
+        """
+        user = self.users.get(self.key(nick))
+        if user is None:
+            return []
+        return [self.channels[key].name for key in user.channels]
+
+    def users_in(self, channel):
+        """
+            Returns the nicks in the channel.
+        """
+        channel = self.channels.get(self.key(channel))
+        if channel is None:
+            return []
+        return [self.users[key].nick for key in channel.members]
+
+    def prefix(self, nick, channel):
+        """
+            Returns the prefixes of the nick in the channel, i.e. `'@'`,
+            or `None` if the nick is not in it.
+        """
+        channel = self.channels.get(self.key(channel))
+        if channel is None:
+            return None
+        return channel.members.get(self.key(nick))
+
+    def stats(self):
+        """
+            Returns the number of `channels`, `users` and `memberships`
+            tracked.
+        """
+        return {
+            'channels': len(self.channels),
+            'users': len(self.users),
+            'memberships': sum(len(channel.members)
+                               for channel in self.channels.values()),
+        }
@@ -0,0 +1,357 @@
+import asyncio
+import time
+
+from .flood import TokenBucket
+from . import Event
+
+
+class FakeClient(object):
+
+    """
+        A connection to the :class:`.FakeServer`.
+    """
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.nick = None
+        self.ident = None
+        self.registered = False
+        self.channels = set()
+        self.bucket = TokenBucket(server.lines_per_second, server.burst)
+        self.flooded = 0
+
+    def __repr__(self):
+        return '<alebot.FakeClient %s>' % self.nick
+
+    @property
+    def prefix(self):
+        return '%s!%s@%s' % (self.nick, self.ident, self.server.host)
+
+    def send(self, line):
+        """
+            Sends a line to the client.
+        """
+        self.writer.write(line.encode('utf-8') + b'\r\n')
+        self.server.lines_out += 1
+
+
+class FakeServer(object):
+
+    """
+        A small IRC server for tests and load runs, so that the bot can
+        be run against something else than a real network. It runs on
+        an asyncio event loop and knows registration, `JOIN`, `PART`,
+        `PRIVMSG`, `NOTICE`, `NAMES`, `PING` and `PONG`.
+
+        Besides the real connections it has simulated users, which are
+        only names in channels (see :func:`add_user`), and can make them
+        talk (see :func:`say`), so that thousands of users do not need
+        thousands of connections.
+
+        Like a real server it limits how fast clients may send with a
+        token bucket. Lines beyond the limit are counted in
+        :attr:`FakeClient.flooded`, and if `kill_on_flood` is set the
+        client is disconnected for excess flood.
+
+            :param host: the address to listen on
+            :param port: the port to listen on, 0 for any free one
+            :param name: the name of the server
+            :param lines_per_second: how many lines a client may send per
+                second in the long run, `None` for no limit
+            :param burst: how many lines a client may send at once
+
+        .. attribute:: on_message
+
+            Called with the client, the target and the text of every
+            `PRIVMSG` a client sends, if set.
+
+        .. attribute:: on_pong
+
+            Called with the client and the token of every `PONG` a
+            client sends, if set.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, name='irc.test',
+                 lines_per_second=None, burst=10, kill_on_flood=False):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.lines_per_second = lines_per_second
+        self.burst = burst
+        self.kill_on_flood = kill_on_flood
+        self.server = None
+        self.clients = set()
+        self.nicks = {}
+        self.users = {}
+        self.channels = {}
+        self.on_message = None
+        self.on_pong = None
+        self.lines_in = 0
+        self.lines_out = 0
+        self.flooded = 0
+        self.started = time.time()
+
+    async def start(self):
+        """
+            Starts listening. :attr:`port` is the actual port
+            afterwards.
+        """
+        self.server = await asyncio.start_server(self.serve, self.host,
+                                                 self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+            Disconnects all clients and stops listening.
+        """
+        for client in list(self.clients):
+            client.send('ERROR :Closing Link: server shutting down')
+            client.writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def serve(self, reader, writer):
+        client = FakeClient(self, reader, writer)
+        self.clients.add(client)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.lines_in += 1
+                if not self.check_flood(client):
+                    break
+                self.handle(client, line.decode('utf-8', 'replace')
+                            .rstrip('\r\n'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.remove(client)
+            writer.close()
+
+    def check_flood(self, client):
+        """
+            Takes a token for the line from the client's bucket and
+            returns whether the client may stay.
+        """
+        bucket = client.bucket
+        bucket.refill(time.monotonic())
+        if bucket.delay(1):
+            client.flooded += 1
+            self.flooded += 1
+            if self.kill_on_flood:
+                client.send('ERROR :Closing Link: %s (Excess Flood)' %
+                            client.nick)
+                return False
+        bucket.take(1)
+        return True
+
+    def remove(self, client):
+        self.clients.discard(client)
+        if self.nicks.get(client.nick) is client:
+            del self.nicks[client.nick]
+        for channel in client.channels:
+            self.channels.get(channel, set()).discard(client)
+
+    def handle(self, client, line):
+        """
+            Handles a line a client sent.
+        """
+        event = Event.parse(line)
+        handler = getattr(self, 'handle_%s' % event.name.lower(), None)
+        if handler is None:
+            if client.registered:
+                client.send(':%s 421 %s %s :Unknown command' %
+                            (self.name, client.nick, event.name))
+            return
+        handler(client, event)
+
+    def handle_nick(self, client, event):
+        nick = event.target or event.body
+        if nick in self.nicks or nick in self.users:
+            client.send(':%s 433 %s %s :Nickname is already in use' %
+                        (self.name, client.nick or '*', nick))
+            return
+        if client.registered:
+            self.send_channels(client, ':%s NICK :%s' % (client.prefix, nick),
+                               True)
+            del self.nicks[client.nick]
+        client.nick = nick
+        self.nicks[nick] = client
+        self.register(client)
+
+    def handle_user(self, client, event):
+        client.ident = event.target
+        self.register(client)
+
+    def register(self, client):
+        if client.registered or not client.nick or not client.ident:
+            return
+        client.registered = True
+        for number, text in (
+                ('001', ':Welcome to the fake network %s' % client.prefix),
+                ('002', ':Your host is %s' % self.name),
+                ('003', ':This server was created %s' %
+                 time.ctime(self.started)),
+                ('004', '%s alebot-fake o o' % self.name),
+                ('005', 'CHANTYPES=# CASEMAPPING=rfc1459 PREFIX=(ov)@+ '
+                 ':are supported by this server'),
+                ('375', ':- %s Message of the day -' % self.name),
+                ('372', ':- This server is fake.'),
+                ('376', ':End of /MOTD command.')):
+            client.send(':%s %s %s %s' % (self.name, number, client.nick,
+                                          text))
+
+    def handle_ping(self, client, event):
+        client.send(':%s PONG %s :%s' % (self.name, self.name,
+                                         event.body or ''))
+
+    def handle_pong(self, client, event):
+        if self.on_pong:
+            self.on_pong(client, event.body)
+
+    def handle_join(self, client, event):
+        for channel in (event.target or '').split(','):
+            if not channel.startswith('#') or channel in client.channels:
+                continue
+            client.channels.add(channel)
+            self.channels.setdefault(channel, set()).add(client)
+            self.send_channel(channel, ':%s JOIN %s' % (client.prefix,
+                                                        channel))
+            self.send_names(client, channel)
+
+    def handle_part(self, client, event):
+        for channel in (event.target or '').split(','):
+            if channel not in client.channels:
+                continue
+            self.send_channel(channel, ':%s PART %s' % (client.prefix,
+                                                        channel))
+            client.channels.discard(channel)
+            self.channels[channel].discard(client)
+
+    def handle_names(self, client, event):
+        self.send_names(client, event.target)
+
+    def handle_privmsg(self, client, event):
+        self.deliver(client, 'PRIVMSG', event.target, event.body)
+        if self.on_message:
+            self.on_message(client, event.target, event.body)
+
+    def handle_notice(self, client, event):
+        self.deliver(client, 'NOTICE', event.target, event.body)
+
+    def handle_quit(self, client, event):
+        self.send_channels(client, ':%s QUIT :%s' % (client.prefix,
+                                                     event.body or ''))
+        client.send('ERROR :Closing Link: %s (Quit)' % client.nick)
+        client.writer.close()
+
+    def deliver(self, client, command, target, text):
+        line = ':%s %s %s :%s' % (client.prefix, command, target, text)
+        if target in self.channels:
+            self.send_channel(target, line, client)
+        elif target in self.nicks:
+            self.nicks[target].send(line)
+
+    def send_channel(self, channel, line, sender=None):
+        """
+            Sends a line to all the clients in a channel.
+        """
+        for client in self.channels.get(channel, ()):
+            if client is not sender:
+                client.send(line)
+
+    def send_channels(self, client, line, itself=False):
+        """
+            Sends a line to everybody who shares a channel with the
+            client, each of them once.
+        """
+        receivers = set()
+        for channel in client.channels:
+            receivers.update(self.channels.get(channel, ()))
+        if itself:
+            receivers.add(client)
+        else:
+            receivers.discard(client)
+        for receiver in receivers:
+            receiver.send(line)
+
+    def send_names(self, client, channel):
+        """
+            Sends the `NAMES` of a channel in replies of up to 40 nicks.
+        """
+        nicks = [other.nick for other in self.channels.get(channel, ())]
+        nicks.extend(nick for nick, channels in self.users.items()
+                     if channel in channels)
+        for i in range(0, len(nicks), 40):
+            client.send(':%s 353 %s = %s :%s' % (
+                self.name, client.nick, channel, ' '.join(nicks[i:i + 40])))
+        client.send(':%s 366 %s %s :End of /NAMES list.' %
+                    (self.name, client.nick, channel))
+
+    def add_user(self, nick, channels=()):
+        """
+            Adds a simulated user to the channels.
+        """
+        self.users.setdefault(nick, set()).update(channels)
+
+    def user_prefix(self, nick):
+        return '%s!%s@users.%s' % (nick, nick.lower(), self.name)
+
+    def say(self, nick, target, text):
+        """
+            Makes a simulated user send a message to a channel or to
+            the client with the nick `target`.
+        """
+        line = ':%s PRIVMSG %s :%s' % (self.user_prefix(nick), target, text)
+        if target in self.channels:
+            self.send_channel(target, line)
+        elif target in self.nicks:
+            self.nicks[target].send(line)
+
+    def quit(self, nick, reason='Quit'):
+        """
+            Makes a simulated user quit.
+        """
+        channels = self.users.pop(nick, ())
+        line = ':%s QUIT :%s' % (self.user_prefix(nick), reason)
+        receivers = set()
+        for channel in channels:
+            receivers.update(self.channels.get(channel, ()))
+        for client in receivers:
+            client.send(line)
+
+    def ping(self, client, token):
+        """
+            Sends a `PING` to the client.
+        """
+        client.send('PING :%s' % token)
+
+    async def flush(self):
+        """
+            Waits until the data for all clients has been sent.
+        """
+        for client in list(self.clients):
+            try:
+                await client.writer.drain()
+            except ConnectionError:
+                pass
+
+    def stats(self):
+        """
+            Returns the counters of the server as a dict: the number of
+            `clients`, simulated `users` and `channels`, the lines
+            received (`lines_in`) and sent (`lines_out`), and how many
+            lines went beyond the flood limit (`flooded`).
+        """
+        return {
+            'clients': len(self.clients),
+            'users': len(self.users),
+            'channels': len(self.channels),
+            'lines_in': self.lines_in,
+            'lines_out': self.lines_out,
+            'flooded': self.flooded,
+        }
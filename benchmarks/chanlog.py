@@ -0,0 +1,122 @@
+"""
+    Compares logging a busy channel with a :class:`logging.FileHandler`,
+    which writes every line on the event loop, with the chanlog
+    plugin's :class:`ChannelLog`, which writes batches in the
+    background, and times a range query with the index against reading
+    the whole file.
+
+    Run it from the repository root with::
+
+        python benchmarks/chanlog.py --lines 200000
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from alebot import Alebot  # noqa: E402
+
+
+def log_with_handler(path, lines):
+    """
+        Returns the seconds the event loop would spend per line.
+    """
+    logger = logging.getLogger('benchmark.chanlog')
+    logger.propagate = False
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    started = time.perf_counter()
+    for timestamp, channel, text in lines:
+        logger.info(text)
+    elapsed = time.perf_counter() - started
+    logger.removeHandler(handler)
+    handler.close()
+    return elapsed / len(lines)
+
+
+def log_in_batches(log, lines, batch):
+    """
+        Returns the seconds per line of queueing, which is all the
+        event loop does, and of writing the batches.
+    """
+    pending = []
+    queued = 0.0
+    written = 0.0
+    for start in range(0, len(lines), batch):
+        started = time.perf_counter()
+        for record in lines[start:start + batch]:
+            pending.append(record)
+        queued += time.perf_counter() - started
+        started = time.perf_counter()
+        records, pending = pending, []
+        log.append(records)
+        written += time.perf_counter() - started
+    return queued / len(lines), written / len(lines)
+
+
+def scan(path, start, end):
+    """
+        Finds the lines of a range by reading the whole file, as
+        without an index.
+    """
+    first = time.strftime('[%H:%M:%S]', time.localtime(start))
+    last = time.strftime('[%H:%M:%S]', time.localtime(end))
+    with open(path, encoding='utf-8') as f:
+        return [line for line in f if first <= line[:10] <= last]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--rate', type=float, default=50,
+                        help='lines per second in the channel')
+    parser.add_argument('--batch', type=int, default=50,
+                        help='lines per write, i.e. a second of lines')
+    args = parser.parse_args()
+
+    Alebot.load_plugin('default')
+    Alebot.load_plugin('auth')
+    Alebot.load_plugin('chanlog')
+    ChannelLog = Alebot.get_plugin('chanlog').ChannelLog
+
+    # a day starting at midnight, so that all lines go to one file
+    base = time.mktime(time.strptime('2014-03-17', '%Y-%m-%d'))
+    lines = [(base + i / args.rate, '#channel',
+              '<nick%d> a line of chatter, number %d' % (i % 100, i))
+             for i in range(args.lines)]
+    root = tempfile.mkdtemp(prefix='alebot-chanlog-')
+    try:
+        handler = log_with_handler(os.path.join(root, 'handler.log'), lines)
+        log = ChannelLog(os.path.join(root, 'logs'), 'day', 0)
+        queued, written = log_in_batches(log, lines, args.batch)
+        print('%-24s %10s' % ('', 'us/line'))
+        print('%-24s %10.3f' % ('FileHandler (on loop)', handler * 1e6))
+        print('%-24s %10.3f' % ('ChannelLog queue (loop)', queued * 1e6))
+        print('%-24s %10.3f' % ('ChannelLog write (bg)', written * 1e6))
+
+        path = log.path(log.directory('#channel'), log.period(base))
+        middle = base + args.lines / args.rate / 2
+        start, end = middle, middle + 300
+        started = time.perf_counter()
+        found = log.query('#channel', start, end)
+        indexed = time.perf_counter() - started
+        started = time.perf_counter()
+        scanned = scan(path, start, end)
+        full = time.perf_counter() - started
+        print('query of 5 minutes in %.1f MB: %.2f ms with the index, '
+              '%.2f ms reading the file (%d and %d lines)' % (
+                  os.path.getsize(path) / 1e6, indexed * 1000, full * 1000,
+                  len(found), len(scanned)))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+    Compares the cost of parsing a line into an :class:`alebot.Event`
+    with the line splitting alebot did before :func:`Event.parse`
+    existed: time per line and memory per event.
+
+    Run it from the repository root with::
+
+        python benchmarks/parser.py
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from alebot import Event  # noqa: E402
+
+
+LINES = [
+    'PING :irc.example.net',
+    ':nick!ident@host.example.com PRIVMSG #channel :hello there, how are '
+    'you doing today?',
+    '@time=2014-03-17T09:20:30.000Z;msgid=abc :nick!ident@host.example.com '
+    'PRIVMSG #channel :a tagged message',
+    ':irc.example.net 353 alebot = #channel :alice bob @carol +dave eve '
+    'mallory trent',
+    ':nick!ident@host.example.com QUIT :irc.example.net other.example.net',
+    ':nick!ident@host.example.com MODE #channel +o other',
+]
+
+
+class LegacyEvent(object):
+
+    """
+        The event class as it was before it got slots.
+    """
+
+    def __init__(self, name=None, user=None, target=None, body=None):
+        self.name = name
+        self.user = user
+        self.body = body
+        self.target = target
+        self._nick = False
+        self._ident = False
+        self._host = False
+
+
+def legacy_parse(line):
+    """
+        The line splitting of the old `found_terminator`.
+    """
+    line = line.split(' ', 3)
+    event = LegacyEvent()
+    if (line[0][0] == ':'):
+        event.user = line[0][1:]
+        event.name = line[1]
+        event.target = line[2]
+        if len(line) >= 4:
+            event.body = line[3][1:]
+    elif (line[0] == 'PING'):
+        event.name = line[0]
+        event.body = line[1][1:]
+    elif (line[0] == 'ERROR'):
+        event.name = 'ERROR'
+        event.body = ' '.join(line[1:])[1:]
+    else:
+        event.name = 'UNKNOWN'
+        event.body = ' '.join(line)
+    return event
+
+
+def time_per_line(parse, number=20000):
+    """
+        Returns the best time per line in microseconds.
+    """
+    def run():
+        for line in LINES:
+            parse(line)
+    best = min(timeit.repeat(run, number=number, repeat=5))
+    return best / number / len(LINES) * 1e6
+
+
+def memory_per_event(parse, count=10000):
+    """
+        Returns the bytes allocated per event that is kept alive,
+        including its attributes.
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    events = [parse(LINES[i % len(LINES)]) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del events
+    return size / count
+
+
+def object_size(parse):
+    """
+        Returns the size of the event object alone, without the
+        strings it refers to, averaged over the lines.
+    """
+    size = 0
+    for line in LINES:
+        event = parse(line)
+        size += sys.getsizeof(event)
+        if hasattr(event, '__dict__'):
+            size += sys.getsizeof(event.__dict__)
+    return size / len(LINES)
+
+
+def main():
+    print('%-10s %10s %14s %14s' % ('parser', 'us/line', 'bytes/event',
+                                    'bytes/object'))
+    for name, parse in (('legacy', legacy_parse), ('parse', Event.parse)):
+        print('%-10s %10.3f %14.1f %14.1f' % (
+            name, time_per_line(parse), memory_per_event(parse),
+            object_size(parse)))
+
+
+if __name__ == '__main__':
+    main()
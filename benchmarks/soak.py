@@ -0,0 +1,334 @@
+"""
+    Runs the bot with the bundled plugins against the fake IRC server
+    of :mod:`alebot.testing` under load and measures what a user would
+    notice:
+
+    - the latency of a command, from the server sending the `PRIVMSG`
+      to the server receiving the reply,
+    - whether the `PING` of the server is answered in time,
+    - how much memory the process grows by over the run.
+
+    The server simulates thousands of users in hundreds of channels.
+    They chat, some of them send `echo` commands to the bot, and some
+    quit and new ones join. The bot is run with :func:`Alebot.connect`
+    in a thread of its own, just like it runs for real.
+
+    Run it from the repository root, i.e.::
+
+        python benchmarks/soak.py --users 5000 --channels 200 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from alebot import Alebot  # noqa: E402
+from alebot.testing import FakeServer  # noqa: E402
+
+
+ECHO_PLUGIN = '''
+from alebot import Alebot
+default = Alebot.get_plugin('default')
+
+
+@Alebot.hook
+class EchoCommand(default.CommandParamHook):
+
+    command = 'echo'
+
+    def call(self, event):
+        self.msg(event.target, event.args)
+'''
+
+
+def rss():
+    """
+        Returns the resident memory of the process in bytes, or `None`
+        where that can not be found out.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def percentiles(values):
+    """
+        Returns the 50th, 90th and 99th percentile and the maximum.
+    """
+    values = sorted(values)
+    if not values:
+        return {}
+    count = len(values)
+    result = dict(('p%d' % p, values[min(count - 1, int(count * p / 100))])
+                  for p in (50, 90, 99))
+    result['max'] = values[-1]
+    return result
+
+
+class Soak(object):
+
+    """
+        Sets up the server and the bot and generates the load.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.server = FakeServer(lines_per_second=args.server_rate,
+                                 burst=args.server_burst)
+        self.server.on_message = self.on_message
+        self.server.on_pong = self.on_pong
+        self.channels = ['#channel%d' % i for i in range(args.channels)]
+        self.users = []
+        self.next_user = 0
+        self.commands = {}
+        self.latencies = []
+        self.pings = {}
+        self.pongs = []
+        self.memory = []
+        self.path = None
+        self.bot = None
+
+    def add_user(self):
+        nick = 'user%d' % self.next_user
+        self.next_user += 1
+        channels = self.rng.sample(self.channels,
+                                   min(len(self.channels), 3))
+        self.server.add_user(nick, channels)
+        self.users.append((nick, channels))
+
+    def on_message(self, client, target, text):
+        sent = self.commands.pop(text, None)
+        if sent is not None:
+            self.latencies.append(time.perf_counter() - sent)
+
+    def on_pong(self, client, token):
+        sent = self.pings.pop(token, None)
+        if sent is not None:
+            self.pongs.append(time.perf_counter() - sent)
+
+    def setup_bot(self):
+        self.path = tempfile.mkdtemp(prefix='alebot-soak-')
+        os.mkdir(os.path.join(self.path, 'plugins'))
+        with open(os.path.join(self.path, 'plugins', 'soakecho.py'),
+                  'w') as f:
+            f.write(ECHO_PLUGIN)
+        with open(os.path.join(self.path, 'config.json'), 'w') as f:
+            json.dump({
+                'server': self.server.host,
+                'port': self.server.port,
+                'nick': 'alebot',
+                'channels': self.channels,
+                'logToStdout': False,
+                'logLevel': 'WARNING',
+                'flood': {'linesPerSecond': self.args.bot_rate,
+                          'burstLines': self.args.server_burst,
+                          'bytesPerSecond': None},
+            }, f)
+        self.bot = Alebot(self.path, disableLog=True)
+
+    async def wait_joined(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            client = self.server.nicks.get('alebot')
+            if client and len(client.channels) == len(self.channels):
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    async def generate(self):
+        """
+            Sends chatter, commands, churn and `PING` for the duration
+            of the run, in ticks of 10 ms.
+        """
+        args = self.args
+        tick = 0.01
+        started = time.monotonic()
+        next_ping = started
+        next_sample = started
+        number = 0
+        chatter = commands = churn = 0.0
+        while time.monotonic() - started < args.duration:
+            now = time.monotonic()
+            chatter += args.rate * tick
+            commands += args.commands * tick
+            churn += args.churn * tick
+            while chatter >= 1:
+                chatter -= 1
+                nick, channels = self.rng.choice(self.users)
+                self.server.say(nick, self.rng.choice(channels),
+                                'just chatting, message %d' % number)
+                number += 1
+            while commands >= 1:
+                commands -= 1
+                nick, channels = self.rng.choice(self.users)
+                text = 'command %d' % number
+                number += 1
+                self.commands[text] = time.perf_counter()
+                self.server.say(nick, self.rng.choice(channels),
+                                'alebot: echo %s' % text)
+            while churn >= 1 and self.users:
+                churn -= 1
+                nick, _ = self.users.pop(self.rng.randrange(len(self.users)))
+                self.server.quit(nick, 'Ping timeout')
+                self.add_user()
+            if now >= next_ping:
+                next_ping += args.ping_interval
+                client = self.server.nicks.get('alebot')
+                if client:
+                    token = 'soak%d' % number
+                    number += 1
+                    self.pings[token] = time.perf_counter()
+                    self.server.ping(client, token)
+            if now >= next_sample:
+                next_sample += 1
+                self.sample()
+            await self.server.flush()
+            await asyncio.sleep(max(0, tick - (time.monotonic() - now)))
+        await asyncio.sleep(args.pong_timeout)
+        self.sample()
+
+    def sample(self):
+        current = tracemalloc.get_traced_memory()[0] \
+            if tracemalloc.is_tracing() else None
+        self.memory.append((time.monotonic(), rss(), current))
+
+    async def main(self):
+        await self.server.start()
+        for _ in range(self.args.users):
+            self.add_user()
+        self.setup_bot()
+        if self.args.tracemalloc:
+            tracemalloc.start()
+        thread = threading.Thread(target=self.bot.connect, name='alebot')
+        thread.daemon = True
+        thread.start()
+        started = time.perf_counter()
+        if not await self.wait_joined(self.args.join_timeout):
+            print('The bot did not join all channels in time.')
+        joined = time.perf_counter() - started
+        await self.generate()
+        await self.server.stop()
+        await asyncio.get_running_loop().run_in_executor(None, thread.join,
+                                                         10)
+        return self.report(joined)
+
+    def report(self, joined):
+        args = self.args
+        late = [seconds for seconds in self.pongs
+                if seconds > args.pong_timeout]
+        first, last = self.memory[0], self.memory[-1]
+        result = {
+            'users': args.users,
+            'channels': args.channels,
+            'duration': args.duration,
+            'join_seconds': joined,
+            'commands': {
+                'answered': len(self.latencies),
+                'unanswered': len(self.commands),
+                'latency': percentiles(self.latencies),
+            },
+            'pongs': {
+                'answered': len(self.pongs),
+                'late': len(late),
+                'dropped': len(self.pings),
+                'latency': percentiles(self.pongs),
+            },
+            'memory': {
+                'rss_start': first[1],
+                'rss_end': last[1],
+                'rss_peak': max(sample[1] or 0 for sample in self.memory),
+                'traced_start': first[2],
+                'traced_end': last[2],
+            },
+            'server': self.server.stats(),
+            'bot': {
+                'incoming': self.bot.incoming.stats(),
+                'outgoing': self.bot.outgoing.stats(),
+                'tasks': self.bot.tasks.stats(),
+                'state': self.bot.state.stats(),
+                'ingress': self.bot.ingress.stats(),
+            },
+        }
+        return result
+
+
+def print_report(result):
+    def ms(values):
+        return ', '.join('%s %.1f ms' % (key, value * 1000)
+                         for key, value in sorted(values.items()))
+
+    commands = result['commands']
+    pongs = result['pongs']
+    memory = result['memory']
+    print('joined %d channels in %.1f s' % (result['channels'],
+                                            result['join_seconds']))
+    print('commands: %d answered, %d unanswered' % (commands['answered'],
+                                                    commands['unanswered']))
+    print('  latency: %s' % ms(commands['latency']))
+    print('pongs: %d answered, %d late, %d dropped' % (
+        pongs['answered'], pongs['late'], pongs['dropped']))
+    print('  latency: %s' % ms(pongs['latency']))
+    if memory['rss_start']:
+        print('memory: rss %.1f MB -> %.1f MB (peak %.1f MB)' % (
+            memory['rss_start'] / 1e6, memory['rss_end'] / 1e6,
+            memory['rss_peak'] / 1e6))
+    if memory['traced_start'] is not None:
+        print('  traced: %.1f MB -> %.1f MB' % (
+            memory['traced_start'] / 1e6, memory['traced_end'] / 1e6))
+    print('server: %s' % result['server'])
+    print('bot outgoing: %s' % result['bot']['outgoing'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--channels', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=60,
+                        help='seconds of load')
+    parser.add_argument('--rate', type=float, default=500,
+                        help='chat lines per second')
+    parser.add_argument('--commands', type=float, default=5,
+                        help='echo commands per second')
+    parser.add_argument('--churn', type=float, default=5,
+                        help='users quitting and joining per second')
+    parser.add_argument('--ping-interval', type=float, default=5)
+    parser.add_argument('--pong-timeout', type=float, default=2,
+                        help='seconds after which a PONG counts as late')
+    parser.add_argument('--server-rate', type=float, default=20,
+                        help='lines per second the server accepts')
+    parser.add_argument('--server-burst', type=int, default=20)
+    parser.add_argument('--bot-rate', type=float, default=15,
+                        help='lines per second the bot sends')
+    parser.add_argument('--join-timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='also trace python allocations (slower)')
+    parser.add_argument('--output', help='save the results to this file')
+    args = parser.parse_args()
+
+    soak = Soak(args)
+    try:
+        result = asyncio.run(soak.main())
+    finally:
+        if soak.path:
+            shutil.rmtree(soak.path, ignore_errors=True)
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
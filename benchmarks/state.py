@@ -0,0 +1,148 @@
+"""
+    Measures the :class:`alebot.StateTracker` with a large network:
+    the memory it keeps per user and per channel membership, how long
+    updating it takes per event, and how long the lookups take, as
+    well as what folding a name with the casemapping costs.
+
+    The users join the channels with `JOIN` events, then the `NAMES`
+    of every channel are received once more, as after a reconnect, and
+    some of the users quit.
+
+    Run it from the repository root with::
+
+        python benchmarks/state.py --users 100000 --channels 1000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from alebot import CaseMapping, Event, StateTracker  # noqa: E402
+
+
+class Bot(object):
+
+    nick = 'alebot'
+    casemapping = CaseMapping.get()
+
+
+def network(args):
+    """
+        Returns the lines of the network: the bot joining every
+        channel, then every user joining `per_user` channels, and the
+        `NAMES` replies of the channels.
+    """
+    rng = random.Random(args.seed)
+    channels = ['#channel%d' % i for i in range(args.channels)]
+    lines = [':alebot!alebot@bot.example.com JOIN %s' % channel
+             for channel in channels]
+    members = dict((channel, []) for channel in channels)
+    for i in range(args.users):
+        nick = 'User%d' % i
+        for channel in rng.sample(channels, args.per_user):
+            lines.append(':%s!ident%d@host%d.example.com JOIN %s' % (
+                nick, i, i, channel))
+            members[channel].append(nick)
+    names = []
+    for channel, nicks in members.items():
+        for start in range(0, len(nicks), 40):
+            names.append(':irc.example.net 353 alebot = %s :%s' % (
+                channel, ' '.join(('@' if n.endswith('0') else '') + n
+                                  for n in nicks[start:start + 40])))
+        names.append(':irc.example.net 366 alebot %s :End of /NAMES list.'
+                     % channel)
+    return lines, names
+
+
+def memory(lines):
+    """
+        Returns the bytes the tracker keeps after the lines. They are
+        parsed one after the other, so that only what the tracker
+        holds on to is counted, not the events.
+    """
+    gc.collect()
+    tracker = StateTracker(Bot())
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for line in lines:
+        tracker.update(Event.parse(line))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--channels', type=int, default=1000)
+    parser.add_argument('--per-user', type=int, default=3,
+                        help='channels every user is in')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    lines, names = network(args)
+    memberships = args.users * args.per_user
+    size = memory(lines)
+
+    joins = [Event.parse(line) for line in lines]
+    names = [Event.parse(line) for line in names]
+    tracker = StateTracker(Bot())
+    started = time.perf_counter()
+    for event in joins:
+        tracker.update(event)
+    joined = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for event in names:
+        tracker.update(event)
+    synced = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    nicks = ['user%d' % rng.randrange(args.users) for _ in range(1000)]
+    channels = ['#CHANNEL%d' % rng.randrange(args.channels)
+                for _ in range(1000)]
+    pairs = list(zip(nicks, channels))
+    number = 100
+    is_on = min(timeit.repeat(
+        lambda: [tracker.is_on(nick, channel) for nick, channel in pairs],
+        number=number, repeat=5)) / number / len(pairs)
+    channels_of = min(timeit.repeat(
+        lambda: [tracker.channels_of(nick) for nick in nicks],
+        number=number, repeat=5)) / number / len(nicks)
+
+    mapping = Bot.casemapping
+    lower = min(timeit.repeat(
+        lambda: [mapping.lower(nick) for nick in nicks],
+        number=number, repeat=5)) / number / len(nicks)
+    key = min(timeit.repeat(
+        lambda: [mapping.key(nick) for nick in nicks],
+        number=number, repeat=5)) / number / len(nicks)
+
+    quits = [Event.parse(':%s!i@h QUIT :bye' % nick) for nick in nicks]
+    started = time.perf_counter()
+    for event in quits:
+        tracker.update(event)
+    quit = (time.perf_counter() - started) / len(quits)
+
+    stats = tracker.stats()
+    print('%d users, %d channels, %d memberships' % (
+        args.users, args.channels, memberships))
+    print('memory:      %.1f MB, %.1f bytes/user, %.1f bytes/membership' % (
+        size / 1e6, size / args.users, size / memberships))
+    print('JOIN:        %.2f us/event' % (joined / len(joins) * 1e6))
+    print('NAMES:       %.2f us/line' % (synced / len(names) * 1e6))
+    print('QUIT:        %.2f us/event' % (quit * 1e6))
+    print('is_on:       %.3f us' % (is_on * 1e6))
+    print('channels_of: %.3f us' % (channels_of * 1e6))
+    print('lower:       %.3f us, key: %.3f us' % (lower * 1e6, key * 1e6))
+    print('left: %(users)d users, %(memberships)d memberships' % stats)
+
+
+if __name__ == '__main__':
+    main()
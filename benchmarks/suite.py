@@ -0,0 +1,354 @@
+"""
+    Measures the hot paths of the bot on synthetic traffic: cutting
+    received data into lines, parsing them into events, building
+    events, dispatching them to the hooks of the bundled plugins,
+    handling received lines as a whole and queueing lines for
+    sending.
+
+    Every stage runs on every corpus and is reported in lines per
+    second, microseconds per line and percentiles of the time per
+    line. The results can be saved as JSON and compared with an
+    earlier run::
+
+        python benchmarks/suite.py --output before.json
+        # change something
+        python benchmarks/suite.py --compare before.json
+
+    Run it from the repository root.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from alebot import Alebot, Event, LineBuffer  # noqa: E402
+
+
+SERVER = 'irc.example.net'
+
+
+def users(rng, count):
+    return ['user%d!~ident%d@host%d.example.com' % (i, i, rng.randrange(1000))
+            for i in range(count)]
+
+
+def ping_corpus(rng, size):
+    """
+        Mostly `PING`, with a few messages in between.
+    """
+    people = users(rng, 50)
+    lines = []
+    for i in range(size):
+        if rng.random() < 0.9:
+            lines.append('PING :%s' % SERVER)
+        else:
+            lines.append(':%s PRIVMSG #channel :still there?' %
+                         rng.choice(people))
+    return lines
+
+
+def chatty_corpus(rng, size):
+    """
+        Channel messages of many users, some of them tagged, some
+        addressed to the bot.
+    """
+    people = users(rng, 500)
+    words = ('hello', 'there', 'how', 'are', 'you', 'today', 'the', 'bot',
+             'irc', 'python', 'seems', 'fine', 'to', 'me', 'lol')
+    lines = []
+    for i in range(size):
+        body = ' '.join(rng.choice(words)
+                        for _ in range(rng.randrange(2, 16)))
+        roll = rng.random()
+        if roll < 0.05:
+            body = 'alebot: admin list'
+        elif roll < 0.1:
+            body = 'alebot: reload'
+        line = ':%s PRIVMSG #channel%d :%s' % (rng.choice(people),
+                                               rng.randrange(20), body)
+        if rng.random() < 0.3:
+            line = '@time=2014-03-17T09:20:30.000Z;msgid=%d %s' % (i, line)
+        lines.append(line)
+    return lines
+
+
+def names_corpus(rng, size):
+    """
+        `353` replies with lots of nicks each, as sent when joining
+        big channels, each channel ended by a `366`.
+    """
+    lines = []
+    channel = 0
+    while len(lines) < size:
+        for _ in range(rng.randrange(5, 30)):
+            nicks = ' '.join('%suser%d' % (rng.choice(('', '', '@', '+')),
+                                           rng.randrange(100000))
+                             for _ in range(40))
+            lines.append(':%s 353 alebot = #channel%d :%s' %
+                         (SERVER, channel, nicks))
+        lines.append(':%s 366 alebot #channel%d :End of /NAMES list.' %
+                     (SERVER, channel))
+        channel += 1
+    return lines[:size]
+
+
+def netsplit_corpus(rng, size):
+    """
+        A storm of `QUIT` messages as a server splits off.
+    """
+    people = users(rng, size)
+    return [':%s QUIT :%s split.example.net' % (user, SERVER)
+            for user in people]
+
+
+def spam_corpus(rng, size):
+    """
+        One user flooding the bot with commands between the chatter of
+        a few others, for the ingress limits.
+    """
+    people = users(rng, 20)
+    spammer = 'spammer!~spam@spam.example.com'
+    lines = []
+    for i in range(size):
+        if rng.random() < 0.5:
+            lines.append(':%s PRIVMSG #channel :alebot: admin list' %
+                         spammer)
+        else:
+            lines.append(':%s PRIVMSG #channel :nothing to see %d' %
+                         (rng.choice(people), i))
+    return lines
+
+
+CORPORA = {
+    'ping': ping_corpus,
+    'chatty': chatty_corpus,
+    'names': names_corpus,
+    'netsplit': netsplit_corpus,
+    'spam': spam_corpus,
+}
+
+
+def make_bot():
+    """
+        Returns a bot with the bundled plugins that is not connected.
+    """
+    path = tempfile.mkdtemp(prefix='alebot-bench-')
+    os.mkdir(os.path.join(path, 'plugins'))
+    with open(os.path.join(path, 'config.json'), 'w') as f:
+        json.dump({'logToStdout': False, 'logLevel': 'ERROR',
+                   'lazyPlugins': False,
+                   'ingress': {'linesPerSecond': 1,
+                               'channelLinesPerSecond': 2},
+                   'auth': {'admins': ['admin!*@admin.example.com']}}, f)
+    bot = Alebot(path, disableLog=True)
+    return bot, path
+
+
+def summarize(timings, total):
+    """
+        Turns the time per line (in seconds) of every line and the
+        total time into the reported numbers.
+    """
+    timings = sorted(timings)
+    count = len(timings)
+
+    def percentile(p):
+        return timings[min(count - 1, int(count * p / 100))] * 1e6
+
+    return {
+        'lines': count,
+        'lines_per_second': count / total if total else 0.0,
+        'us_per_line': total / count * 1e6,
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'p99': percentile(99),
+        'max': timings[-1] * 1e6,
+    }
+
+
+def measure(function, items):
+    """
+        Calls `function` with every item and returns the time every
+        call took and the total time.
+    """
+    clock = time.perf_counter
+    timings = []
+    append = timings.append
+    gc.collect()
+    started = clock()
+    for item in items:
+        before = clock()
+        function(item)
+        append(clock() - before)
+    return timings, clock() - started
+
+
+def bench_read(lines, chunk=4096):
+    """
+        Cutting received chunks of data into lines and parsing them, as
+        the bot's read loop does.
+    """
+    data = b''.join(line.encode('utf-8') + b'\r\n' for line in lines)
+    chunks = [data[i:i + chunk] for i in range(0, len(data), chunk)]
+    buffer = LineBuffer()
+    counts = []
+
+    def read(data):
+        lines = buffer.feed(data)
+        for line in lines:
+            Event.parse(line.decode('utf-8', 'replace'))
+        counts.append(len(lines))
+
+    timings, total = measure(read, chunks)
+    # spread the time of every chunk over its lines
+    per_line = []
+    for seconds, count in zip(timings, counts):
+        if count:
+            per_line.extend([seconds / count] * count)
+    return summarize(per_line, total)
+
+
+def bench_parse(lines):
+    return summarize(*measure(Event.parse, lines))
+
+
+def bench_construct(lines):
+    """
+        Building events from already split lines, as plugins do for
+        their own events.
+    """
+    parts = []
+    for line in lines:
+        event = Event.parse(line)
+        parts.append((event.name, event.user, event.target, event.body))
+    return summarize(*measure(lambda args: Event(*args), parts))
+
+
+def bench_dispatch(lines, bot):
+    """
+        Offering parsed events to the hooks of the bundled plugins.
+    """
+    events = [Event.parse(line) for line in lines]
+    result = summarize(*measure(bot.call_hooks, events))
+    bot.outgoing.high.clear()
+    bot.outgoing.normal.clear()
+    return result
+
+
+def bench_handle(lines, bot):
+    """
+        Handling received lines as a whole: parsing, the state
+        tracker, the ingress limits and dispatching.
+    """
+    result = summarize(*measure(bot.handle_line, lines))
+    bot.outgoing.high.clear()
+    bot.outgoing.normal.clear()
+    return result
+
+
+def bench_send(lines, bot):
+    """
+        Encoding and queueing lines with :func:`Alebot.send_raw`.
+    """
+    replies = ['PRIVMSG #channel :%s' % line[-60:] for line in lines]
+    result = summarize(*measure(bot.send_raw, replies))
+    bot.outgoing.high.clear()
+    bot.outgoing.normal.clear()
+    return result
+
+
+STAGES = ('read', 'parse', 'construct', 'dispatch', 'handle', 'send')
+
+
+def run(size, seed, corpora, stages):
+    bot, path = make_bot()
+    results = {}
+    try:
+        for name in corpora:
+            lines = CORPORA[name](random.Random(seed), size)
+            results[name] = {}
+            for stage in stages:
+                if stage in ('dispatch', 'handle', 'send'):
+                    result = globals()['bench_' + stage](lines, bot)
+                else:
+                    result = globals()['bench_' + stage](lines)
+                results[name][stage] = result
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return results
+
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, previous=None):
+    header = '%-9s %-10s %12s %9s %8s %8s %8s %9s' % (
+        'corpus', 'stage', 'lines/s', 'us/line', 'p50', 'p90', 'p99', 'max')
+    if previous:
+        header += ' %9s' % 'vs before'
+    print(header)
+    for corpus, stages in results.items():
+        for stage, result in stages.items():
+            line = '%-9s %-10s %12.0f %9.2f %8.2f %8.2f %8.2f %9.1f' % (
+                corpus, stage, result['lines_per_second'],
+                result['us_per_line'], result['p50'], result['p90'],
+                result['p99'], result['max'])
+            before = (previous or {}).get(corpus, {}).get(stage)
+            if before:
+                line += ' %8.2fx' % (before['us_per_line'] /
+                                     result['us_per_line'])
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=20000,
+                        help='lines per corpus')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--corpus', action='append', choices=CORPORA,
+                        help='only run this corpus, may be repeated')
+    parser.add_argument('--stage', action='append', choices=STAGES,
+                        help='only run this stage, may be repeated')
+    parser.add_argument('--output', help='save the results to this file')
+    parser.add_argument('--compare', help='compare with the results saved '
+                        'in this file, a factor above 1 is faster')
+    args = parser.parse_args()
+
+    results = run(args.size, args.seed, args.corpus or list(CORPORA),
+                  args.stage or STAGES)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+    report(results, previous)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'revision': revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'size': args.size,
+                'seed': args.seed,
+                'results': results,
+            }, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
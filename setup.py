@@ -27,6 +27,7 @@ setup(
     packages=['alebot', 'alebot.plugins'],
     zip_safe=False,
     platforms='any',
+    python_requires='>=3.7',
     install_requires=[
         'click'
     ],
@@ -0,0 +1,21 @@
+import sys
+
+import pytest
+
+from alebot import Alebot
+
+
+@pytest.fixture(autouse=True)
+def plugins(monkeypatch):
+    """
+        Every test starts without imported plugins and with the system
+        plugin path only, as plugins are shared by all the bots of a
+        process.
+    """
+    monkeypatch.setattr(Alebot, '_Paths', [])
+    monkeypatch.setattr(Alebot, '_Names', {})
+    Alebot.unload_plugins()
+    yield
+    for name in Alebot.Plugins:
+        sys.modules.pop(name, None)
+    Alebot.unload_plugins()
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+import time
+
+from alebot import Alebot
+from alebot.testing import FakeServer
+
+
+ECHO = '''
+from alebot import Alebot
+default = Alebot.get_plugin('default')
+
+
+@Alebot.hook
+class EchoHook(default.CommandParamHook):
+
+    command = 'echo'
+
+    def call(self, event):
+        self.msg(event.target, event.args)
+'''
+
+
+def write_plugin(path, name, source):
+    os.makedirs(os.path.join(path, 'plugins'), exist_ok=True)
+    with open(os.path.join(path, 'plugins', '%s.py' % name), 'w') as f:
+        f.write(source)
+    # the modification time has to change for reload_plugins
+    stamp = time.time() + len(Alebot.Files)
+    os.utime(os.path.join(path, 'plugins', '%s.py' % name), (stamp, stamp))
+
+
+def make_bot(path, plugins=None, **config):
+    """
+        Returns a bot in `path` with the given user plugins and
+        configuration.
+    """
+    for name, source in (plugins or {}).items():
+        write_plugin(path, name, source)
+    config.setdefault('logLevel', 'WARNING')
+    config.setdefault('logToStdout', False)
+    with open(os.path.join(path, 'config.json'), 'w') as f:
+        json.dump(config, f)
+    return Alebot(str(path), disableLog=True)
+
+
+async def wait_for(condition, timeout=5):
+    started = time.monotonic()
+    while not condition():
+        if time.monotonic() - started > timeout:
+            raise AssertionError('timed out')
+        await asyncio.sleep(0.01)
+
+
+def run(path, scenario, plugins=None, channels=('#alebot',), **config):
+    """
+        Connects a bot to a :class:`.FakeServer`, waits until it joined
+        its channels, runs `scenario(bot, server, sent)` and disconnects.
+
+            :returns: the bot and the messages it sent, as tuples of
+                target and text.
+    """
+    sent = []
+
+    async def main():
+        server = FakeServer()
+        await server.start()
+        server.on_message = lambda client, target, text: \
+            sent.append((target, text))
+        bot = make_bot(path, plugins, server=server.host, port=server.port,
+                       channels=list(channels), **config)
+        running = asyncio.get_running_loop().create_task(bot.run())
+        await wait_for(lambda: all(bot.state.is_on(bot.nick, channel)
+                                   for channel in channels))
+        try:
+            await scenario(bot, server, sent)
+        finally:
+            await server.stop()
+            await asyncio.wait_for(running, 5)
+        return bot
+
+    return asyncio.run(main()), sent
@@ -0,0 +1,45 @@
+from alebot.buffer import LineBuffer
+
+
+def test_crlf_and_bare_lf():
+    buffer = LineBuffer()
+    assert buffer.feed(b'one\r\ntwo\nthree\r\n\r\n\n') == \
+        [b'one', b'two', b'three']
+    assert buffer.stats()['lines'] == 3
+
+
+def test_partial_line_kept_between_feeds():
+    buffer = LineBuffer()
+    assert buffer.feed(b'PING :to') == []
+    assert buffer.stats()['buffered'] == 8
+    assert buffer.feed(b'ken\r') == []
+    assert buffer.feed(b'\nPING :next\r\nPI') == \
+        [b'PING :token', b'PING :next']
+    assert buffer.feed(b'NG\n') == [b'PING']
+    assert buffer.stats()['buffered'] == 0
+
+
+def test_overlong_line_split_across_chunks():
+    buffer = LineBuffer(max_length=10)
+    assert buffer.feed(b'before\r\n' + b'x' * 8) == [b'before']
+    # too long now, the rest of it is thrown away as it comes in
+    assert buffer.feed(b'x' * 8) == []
+    assert buffer.stats()['buffered'] == 0
+    assert buffer.feed(b'x' * 20) == []
+    assert buffer.feed(b'xx\r\nafter\r\n') == [b'after']
+    assert buffer.stats()['overlong'] == 1
+
+    # a complete overlong line within one chunk
+    assert buffer.feed(b'y' * 11 + b'\r\nok\r\n') == [b'ok']
+    # exactly the maximum is fine
+    assert buffer.feed(b'z' * 10 + b'\r\n') == [b'z' * 10]
+    assert buffer.stats()['overlong'] == 2
+
+
+def test_shrink_after_burst():
+    buffer = LineBuffer(shrink_above=100)
+    buffer.feed(b'x' * 200)
+    burst = buffer.buffer
+    assert buffer.feed(b'\r\n') == [b'x' * 200]
+    assert buffer.buffer is not burst
+    assert buffer.peak == 0
@@ -0,0 +1,51 @@
+import pytest
+
+from alebot.casemap import CaseMapping
+
+
+def test_ascii():
+    mapping = CaseMapping('ascii')
+    assert mapping.lower('NiCk[]\\~') == 'nick[]\\~'
+    assert not mapping.equal('nick[a]', 'nick{a}')
+
+
+def test_rfc1459():
+    mapping = CaseMapping('rfc1459')
+    assert mapping.lower('NiCk[]\\~') == 'nick{}|^'
+    assert mapping.equal('Nick[away]', 'nick{AWAY}')
+    assert mapping.equal('a~b', 'a^b')
+
+
+def test_strict_rfc1459():
+    mapping = CaseMapping('strict-rfc1459')
+    assert mapping.lower('NiCk[]\\~') == 'nick{}|~'
+    assert mapping.equal('Nick[away]', 'nick{AWAY}')
+    assert not mapping.equal('a~b', 'a^b')
+
+
+def test_get():
+    assert CaseMapping.get('ascii') is CaseMapping.get('ascii')
+    assert CaseMapping.get().name == 'rfc1459'
+    assert CaseMapping.get('unknown') is None
+    with pytest.raises(ValueError):
+        CaseMapping('unknown')
+
+
+def test_keys_are_interned():
+    mapping = CaseMapping('rfc1459')
+    first = mapping.key(''.join(['Nick', '[away]']))
+    assert first == 'nick{away}'
+    assert mapping.key(''.join(['NICK', '{AWAY}'])) is first
+    # a name that is its own key is not copied
+    name = mapping.key('lower')
+    assert mapping.key('lower') is name
+
+
+def test_key_cache_is_lru():
+    mapping = CaseMapping('rfc1459', cache_size=3)
+    for name in ('A', 'B', 'C'):
+        mapping.key(name)
+    mapping.key('A')
+    mapping.key('D')
+    assert list(mapping.cache) == ['C', 'A', 'D']
+    assert len(mapping.cache) == 3
@@ -0,0 +1,128 @@
+import os
+import time
+
+import pytest
+
+from alebot import Alebot, Event
+
+from helpers import make_bot
+
+
+@pytest.fixture
+def chanlog(tmp_path):
+    make_bot(tmp_path)
+    return Alebot.get_plugin('chanlog')
+
+
+def stamp(text):
+    return time.mktime(time.strptime(text, '%Y-%m-%d %H:%M:%S'))
+
+
+def files(root):
+    return sorted(os.listdir(os.path.join(str(root), '#chan')))
+
+
+def test_index(chanlog, tmp_path):
+    log = chanlog.ChannelLog(str(tmp_path))
+    start = stamp('2014-03-17 14:00:00')
+    log.append([(start, '#chan', 'one'), (start + 0.5, '#chan', 'two'),
+                (start + 2, '#chan', 'three')])
+    assert files(tmp_path) == ['2014-03-17.log', '2014-03-17.log.idx']
+    path = os.path.join(str(tmp_path), '#chan', '2014-03-17.log')
+    with open(path + '.idx', 'rb') as f:
+        index = f.read()
+    # one 16 byte entry per second with lines: the second and the offset
+    assert len(index) == 2 * 16
+    assert chanlog.ChannelLog.INDEX.unpack_from(index, 0) == (start, 0)
+    assert chanlog.ChannelLog.INDEX.unpack_from(index, 16) == \
+        (start + 2, len(b'[14:00:00] one\n[14:00:00] two\n'))
+    assert log.query('#chan', start, start) == \
+        ['[14:00:00] one', '[14:00:00] two']
+    assert log.query('#chan', start + 1, start + 5) == ['[14:00:02] three']
+
+
+def test_rollover(chanlog, tmp_path):
+    start = stamp('2014-03-17 23:59:59')
+    records = [(start, '#chan', 'late'), (start + 2, '#chan', 'early')]
+    chanlog.ChannelLog(str(tmp_path / 'day')).append(records)
+    assert files(tmp_path / 'day') == [
+        '2014-03-17.log', '2014-03-17.log.idx',
+        '2014-03-18.log', '2014-03-18.log.idx']
+
+    start = stamp('2014-03-17 13:59:59')
+    records = [(start, '#chan', 'late'), (start + 2, '#chan', 'early')]
+    chanlog.ChannelLog(str(tmp_path / 'hour'), 'hour').append(records)
+    assert files(tmp_path / 'hour') == [
+        '2014-03-17-13.log', '2014-03-17-13.log.idx',
+        '2014-03-17-14.log', '2014-03-17-14.log.idx']
+
+
+def test_max_bytes(chanlog, tmp_path):
+    log = chanlog.ChannelLog(str(tmp_path), max_bytes=40)
+    start = stamp('2014-03-17 14:00:00')
+    # 20 bytes per line, so two lines per part
+    log.append([(start + i, '#chan', 'line %d' % i) for i in range(5)])
+    assert files(tmp_path) == [
+        '2014-03-17.1.log', '2014-03-17.1.log.idx',
+        '2014-03-17.2.log', '2014-03-17.2.log.idx',
+        '2014-03-17.log', '2014-03-17.log.idx']
+    # a new log goes on with the last part
+    log = chanlog.ChannelLog(str(tmp_path), max_bytes=40)
+    log.append([(start + 5, '#chan', 'line 5')])
+    assert len(files(tmp_path)) == 6
+    assert log.query('#chan', start + 1, start + 5) == [
+        '[14:00:0%d] line %d' % (i, i) for i in range(1, 6)]
+
+
+def test_query_across_two_files(chanlog, tmp_path):
+    log = chanlog.ChannelLog(str(tmp_path))
+    start = stamp('2014-03-17 23:59:58')
+    log.append([(start + i, '#chan', 'line %d' % i) for i in range(4)])
+    assert log.query('#chan', start + 1, start + 2) == [
+        '[23:59:59] line 1', '[00:00:00] line 2']
+    assert log.query('#chan', start, start + 3, limit=3) == [
+        '[23:59:58] line 0', '[23:59:59] line 1', '[00:00:00] line 2']
+    assert log.query('#chan', start + 10, start + 20) == []
+    assert log.query('#other', start, start + 3) == []
+
+
+def test_missing_or_truncated_index(chanlog, tmp_path):
+    log = chanlog.ChannelLog(str(tmp_path))
+    start = stamp('2014-03-17 14:00:00')
+    log.append([(start + i, '#chan', 'line %d' % i) for i in range(3)])
+    path = os.path.join(str(tmp_path), '#chan', '2014-03-17.log.idx')
+
+    # half an entry: the whole entries still work
+    with open(path, 'r+b') as f:
+        f.truncate(2 * 16 + 8)
+    assert log.query('#chan', start, start + 2) == [
+        '[14:00:00] line 0', '[14:00:01] line 1', '[14:00:02] line 2']
+    log = chanlog.ChannelLog(str(tmp_path))
+    log.append([(start + 3, '#chan', 'line 3')])
+    assert log.query('#chan', start + 3, start + 3) == ['[14:00:03] line 3']
+
+    os.remove(path)
+    assert log.query('#chan', start, start + 3) == []
+
+
+def test_log_query_task(chanlog, tmp_path, monkeypatch):
+    bot = make_bot(tmp_path, chanlog={'queryLines': 2})
+    hook, = [hook for hook in bot.hooks
+             if isinstance(hook, chanlog.LogQueryHook)]
+    start = stamp('2014-03-17 14:00:00')
+    hook.get_log().append([(start + i, '#chan', 'line %d' % i)
+                           for i in range(3)])
+    sent = []
+    monkeypatch.setattr(bot, 'msg', lambda target, text:
+                        sent.append((target, text)))
+    event = Event.parse(':boss!b@b.test PRIVMSG #ops :alebot: log ...')
+
+    chanlog.LogQueryTask(hook, event, '#CHAN', start, start + 1).do()
+    assert sent == [('boss', '[14:00:00] line 0'),
+                    ('boss', '[14:00:01] line 1')]
+    del sent[:]
+    chanlog.LogQueryTask(hook, event, '#chan', start, start + 2).do()
+    assert sent[-1] == ('boss', '(more lines left out)')
+    del sent[:]
+    chanlog.LogQueryTask(hook, event, '#chan', start + 5, start + 9).do()
+    assert sent == [('boss', 'Nothing was logged in #chan then.')]
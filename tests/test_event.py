@@ -0,0 +1,71 @@
+from alebot import Event
+
+
+def test_parse_tags_with_escapes():
+    event = Event.parse('@a=one\\:two\\sthree;b;c=back\\\\slash\\r\\n;d=x\\y;'
+                        'e=end\\ :irc.test PING :token')
+    assert event.tags == {'a': 'one;two three', 'b': True,
+                          'c': 'back\\slash\r\n', 'd': 'xy', 'e': 'end'}
+    assert event.name == 'PING'
+    assert event.body == 'token'
+    assert Event.parse_tags('=novalue;;key=') == {'key': ''}
+
+
+def test_parse_without_tags():
+    assert Event.parse('PING :token').tags is None
+
+
+def test_parse_prefix():
+    event = Event.parse(':alice!a@example.com PRIVMSG #c :hi')
+    assert (event.nick, event.ident, event.host) == \
+        ('alice', 'a', 'example.com')
+
+    # a server, without user and host
+    event = Event.parse(':irc.test NOTICE * :Looking up your hostname')
+    assert event.user == 'irc.test'
+    assert (event.nick, event.ident, event.host) == (None, None, None)
+    assert event.target == '*'
+
+
+def test_parse_params():
+    event = Event.parse(':irc.test 353 alebot = #c :alice @bob +carol')
+    assert event.name == '353'
+    assert event.params == ('alebot', '=', '#c', 'alice @bob +carol')
+    assert event.target == 'alebot'
+    assert event.body == 'alice @bob +carol'
+
+
+def test_parse_trailing_with_colon():
+    event = Event.parse(':alice!a@example.com PRIVMSG #c :see: http://x :)')
+    assert event.params == ('#c', 'see: http://x :)')
+    assert event.body == 'see: http://x :)'
+
+
+def test_parse_empty_trailing():
+    event = Event.parse(':alice!a@example.com PRIVMSG #c :')
+    assert event.params == ('#c', '')
+    assert event.target == '#c'
+    assert event.body == ''
+
+
+def test_parse_without_params():
+    event = Event.parse(':alice!a@example.com away')
+    assert event.name == 'AWAY'
+    assert event.params == ()
+    assert event.target is None
+    assert event.body is None
+
+
+def test_parse_body_only():
+    event = Event.parse(':alice!a@example.com QUIT :Bye: all')
+    assert event.target is None
+    assert event.body == 'Bye: all'
+
+
+def test_parse_unknown():
+    event = Event.parse(':irc.test')
+    assert event.name == 'UNKNOWN'
+    assert event.user == 'irc.test'
+    event = Event.parse('@a=b ')
+    assert event.name == 'UNKNOWN'
+    assert event.tags == {'a': 'b'}
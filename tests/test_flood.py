@@ -0,0 +1,70 @@
+import pytest
+
+from alebot import Settings
+from alebot.flood import SendQueue, TokenBucket
+
+
+def test_token_bucket():
+    bucket = TokenBucket(2, 4)
+    bucket.stamp = 100.0
+    assert bucket.delay(4) == 0
+    bucket.take(4)
+    assert bucket.delay(1) == pytest.approx(0.5)
+    bucket.refill(101.0)
+    assert bucket.tokens == pytest.approx(2)
+    # it never holds more than the burst
+    bucket.refill(200.0)
+    assert bucket.tokens == 4
+    # more than the bucket holds only waits for a full bucket
+    bucket.take(3)
+    assert bucket.delay(10) == pytest.approx(1.5)
+
+
+def test_token_bucket_without_rate():
+    bucket = TokenBucket()
+    bucket.take(100)
+    assert bucket.delay(100) == 0
+
+
+def test_high_priority_lane():
+    queue = SendQueue()
+    queue.push(b'PRIVMSG #c :one\r\n')
+    queue.push(b'PRIVMSG #c :two\r\n')
+    queue.push(b'PONG :token\r\n', urgent=True)
+    assert queue.stats()['high'] == 1
+    assert len(queue) == 3
+    assert queue.delay() == 0
+    assert [queue.pop() for i in range(3)] == [
+        b'PONG :token\r\n', b'PRIVMSG #c :one\r\n', b'PRIVMSG #c :two\r\n']
+    assert queue.delay() is None
+
+
+def test_delayed_counts_lines():
+    queue = SendQueue(lines_per_second=1, burst_lines=1)
+    for i in range(3):
+        queue.push(b'PRIVMSG #c :%d\r\n' % i)
+    assert queue.delay() == 0
+    queue.pop()
+    # however often it is asked, the waiting line is counted once
+    for i in range(5):
+        assert queue.delay() > 0
+    assert queue.stats()['delayed'] == 1
+    queue.lines.tokens = 1
+    queue.pop()
+    assert queue.delay() > 0
+    assert queue.stats()['delayed'] == 2
+
+
+def test_bytes_limit():
+    queue = SendQueue(bytes_per_second=10, burst_bytes=20)
+    queue.push(b'x' * 15)
+    queue.push(b'y' * 15)
+    assert queue.delay() == 0
+    queue.pop()
+    assert queue.delay() == pytest.approx(1.0, abs=0.1)
+
+
+def test_flood_limits_are_opt_in():
+    flood = Settings({}).flood
+    assert flood['linesPerSecond'] is None
+    assert flood['bytesPerSecond'] is None
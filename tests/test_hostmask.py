@@ -0,0 +1,67 @@
+from alebot import Alebot
+from alebot.casemap import CaseMapping
+from alebot.hostmask import HostmaskSet
+
+from helpers import make_bot
+
+
+def test_exact_masks():
+    masks = HostmaskSet(['Boss!b@b.test'])
+    assert masks.exact == {'boss!b@b.test'}
+    assert masks.match('boss!B@B.test')
+    assert not masks.match('boss!b@other.test')
+    assert not masks.match(None)
+
+
+def test_nick_masks():
+    masks = HostmaskSet(['boss', 'chief!*@*.example.com'])
+    assert set(masks.nicks) == {'boss', 'chief'}
+    assert masks.pattern is None
+    assert masks.match('Boss!anything@anywhere')
+    assert masks.match('chief!c@host.example.com')
+    assert not masks.match('chief!c@example.org')
+    # no user at all, i.e. a server
+    assert not masks.match('boss')
+
+
+def test_wildcard_masks():
+    masks = HostmaskSet(['*!*@trusted.test', 'bot?!*@*', '*@cloak/[x]'])
+    assert masks.pattern is not None
+    assert masks.match('anyone!a@trusted.test')
+    assert masks.match('bot1!b@b.test')
+    assert not masks.match('bot12!b@b.test')
+    # brackets are not character classes
+    assert masks.match('someone!s@cloak/[x]')
+    assert not masks.match('someone!s@cloak/x')
+
+
+def test_rfc1459_folding():
+    masks = HostmaskSet(['Nick[away]'], CaseMapping.get('rfc1459').lower)
+    assert masks.match('nick{AWAY}!n@n.test')
+    masks.set_lower(CaseMapping.get('ascii').lower)
+    assert not masks.match('nick{AWAY}!n@n.test')
+    assert masks.match('NICK[away]!n@n.test')
+
+
+def test_cache():
+    masks = HostmaskSet(['boss'], cache_size=2)
+    for user in ('a!a@a', 'b!b@b', 'boss!b@b'):
+        masks.match(user)
+    assert len(masks.cache) <= 2
+    assert masks.match('boss!b@b')
+
+
+def test_add_and_delete_admin(tmp_path):
+    bot = make_bot(tmp_path, auth={'admins': ['boss']})
+    auth = Alebot.get_plugin('auth')
+    manager, = [hook for hook in bot.hooks
+                if isinstance(hook, auth.AdminManagementHook)]
+    assert not bot.settings.admins.match('eve!e@e.test')
+
+    manager.add_admin('eve!*@e.test')
+    assert bot.settings.admins.match('eve!e@e.test')
+    assert bot.settings.admins.match('boss!b@b.test')
+
+    manager.delete_admin('eve!*@e.test')
+    assert not bot.settings.admins.match('eve!e@e.test')
+    assert bot.config['auth']['admins'] == ['boss']
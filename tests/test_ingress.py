@@ -0,0 +1,65 @@
+import asyncio
+import glob
+import os
+
+from helpers import ECHO, make_bot, run, wait_for
+
+
+def test_ingress_limits_commands_but_not_the_log(tmp_path):
+    async def scenario(bot, server, sent):
+        for i in range(10):
+            server.say('spammer', '#alebot', 'alebot: echo spam %d' % i)
+        for i in range(5):
+            server.say('boss', '#alebot', 'alebot: echo boss %d' % i)
+        await server.flush()
+        await wait_for(lambda: bot.ingress.passed +
+                       bot.ingress.dropped + bot.ingress.bypassed >= 15)
+        await asyncio.sleep(0.3)
+
+    bot, sent = run(tmp_path, scenario, {'echo': ECHO},
+                    flood={'linesPerSecond': None},
+                    ingress={'linesPerSecond': 1, 'burstLines': 2,
+                             'channelLinesPerSecond': None,
+                             'action': 'drop'},
+                    auth={'admins': ['boss!*@*']},
+                    chanlog={'channels': ['#alebot'], 'flushDelay': 0.05})
+    texts = [text for target, text in sent]
+    assert texts.count('spam 0') == 1
+    assert len([text for text in texts if text.startswith('spam')]) == 2
+    assert len([text for text in texts if text.startswith('boss')]) == 5
+    assert bot.ingress.stats()['dropped'] == 8
+
+    logged = ''
+    for name in glob.glob(os.path.join(str(tmp_path), 'logs', '**', '*.log'),
+                          recursive=True):
+        with open(name, encoding='utf-8') as f:
+            logged += f.read()
+    for i in range(10):
+        assert 'echo spam %d' % i in logged
+
+
+def test_ingress_limits_process_plugin_commands(tmp_path):
+    async def scenario(bot, server, sent):
+        for i in range(10):
+            server.say('spammer', '#alebot', 'alebot: echo spam %d' % i)
+        await server.flush()
+        await wait_for(lambda: bot.ingress.passed +
+                       bot.ingress.dropped >= 10)
+        await wait_for(lambda: len(sent) >= 2)
+        await asyncio.sleep(0.3)
+
+    bot, sent = run(tmp_path, scenario, {'echo': ECHO},
+                    processPlugins=['echo'],
+                    flood={'linesPerSecond': None},
+                    ingress={'linesPerSecond': 1, 'burstLines': 2,
+                             'channelLinesPerSecond': None,
+                             'action': 'drop'})
+    assert [text for target, text in sent] == ['spam 0', 'spam 1']
+    assert bot.ingress.stats()['dropped'] == 8
+
+
+def test_ingress_limits_are_opt_in(tmp_path):
+    bot = make_bot(tmp_path)
+    assert bot.settings.ingress['linesPerSecond'] is None
+    assert bot.settings.ingress['channelLinesPerSecond'] is None
+    assert not bot.ingress.enabled
@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from alebot.pool import TaskPool
+
+
+class FakeTask(object):
+
+    def __init__(self, plugin='plugin', gate=None, result=True):
+        self.plugin = plugin
+        self.gate = gate
+        self.result = result
+        self.started = threading.Event()
+        self.done = threading.Event()
+
+    def run(self):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.done.set()
+        return self.result
+
+
+def busy_pool(overflow, queue_size=2):
+    """
+        Returns a pool with one worker that is held up by a task, and
+        that task's gate.
+    """
+    gate = threading.Event()
+    pool = TaskPool(1, queue_size, overflow)
+    first = FakeTask(gate=gate)
+    pool.submit(first)
+    assert first.started.wait(5)
+    return pool, gate
+
+
+def test_bounded_queue_and_counters():
+    pool = TaskPool(2, 10)
+    tasks = [FakeTask(result=i % 2 == 0) for i in range(6)]
+    for task in tasks:
+        assert pool.submit(task)
+    for task in tasks:
+        assert task.done.wait(5)
+    # workers are only started when needed, and never more than asked
+    assert len(pool.threads) == 2
+    with pool.lock:
+        pool.lock.wait_for(lambda: not pool.active, 5)
+    stats = pool.stats()
+    assert (stats['completed'], stats['failed'], stats['queued']) == \
+        (3, 3, 0)
+
+
+def test_reject():
+    pool, gate = busy_pool(TaskPool.REJECT)
+    queued = [FakeTask(), FakeTask()]
+    assert all(pool.submit(task) for task in queued)
+    rejected = FakeTask()
+    assert not pool.submit(rejected)
+    # the rejected task counts as done, so nobody waits for it
+    assert rejected.done.is_set() and not rejected.started.is_set()
+    gate.set()
+    assert all(task.done.wait(5) for task in queued)
+    assert pool.stats()['rejected'] == 1
+
+
+def test_drop_oldest():
+    pool, gate = busy_pool(TaskPool.DROP_OLDEST)
+    oldest, second, newest = FakeTask(), FakeTask(), FakeTask()
+    for task in (oldest, second, newest):
+        assert pool.submit(task)
+    assert oldest.done.is_set()
+    gate.set()
+    assert second.done.wait(5) and newest.done.wait(5)
+    assert not oldest.started.is_set()
+    assert pool.stats()['dropped'] == 1
+
+
+def test_block():
+    pool, gate = busy_pool(TaskPool.BLOCK, queue_size=1)
+    pool.submit(FakeTask())
+    blocked = FakeTask()
+    submitting = threading.Thread(target=pool.submit, args=(blocked,))
+    submitting.start()
+    submitting.join(0.1)
+    assert submitting.is_alive()
+    gate.set()
+    submitting.join(5)
+    assert not submitting.is_alive()
+    assert blocked.done.wait(5)
+    assert pool.stats()['rejected'] == pool.stats()['dropped'] == 0
+
+
+def test_per_plugin_limit():
+    gate = threading.Event()
+    pool = TaskPool(3, 10, per_plugin=1)
+    slow = [FakeTask('slow', gate) for i in range(2)]
+    fast = FakeTask('fast')
+    for task in slow + [fast]:
+        pool.submit(task)
+    # the second slow task waits, but does not hold up the other plugin
+    assert slow[0].started.wait(5)
+    assert fast.done.wait(5)
+    assert not slow[1].started.is_set()
+    assert pool.stats()['queued'] == 1
+    gate.set()
+    assert slow[1].done.wait(5)
+
+
+def test_unknown_overflow():
+    with pytest.raises(ValueError):
+        TaskPool(overflow='explode')
@@ -0,0 +1,38 @@
+import logging
+
+from alebot.process import PluginProcess
+
+from helpers import ECHO, run, wait_for
+
+
+def test_process_plugin(tmp_path, caplog):
+    processes = []
+
+    async def scenario(bot, server, sent):
+        processes.extend(hook for hook in bot.hooks
+                         if isinstance(hook, PluginProcess))
+        server.say('alice', '#alebot', 'alebot: echo hello')
+        await wait_for(lambda: sent)
+
+    with caplog.at_level(logging.INFO):
+        bot, sent = run(tmp_path, scenario, {'echo': ECHO},
+                        processPlugins=['echo'])
+    assert sent == [('#alebot', 'hello')]
+
+    # the worker is stopped when the connection closes, and that is
+    # not an error
+    process, = processes
+    assert process.stopping
+    assert not process.process.is_alive()
+    process.reader.join(5)
+    assert not [record for record in caplog.records
+                if record.levelno >= logging.ERROR]
+    assert not [hook for hook in bot.hooks
+                if isinstance(hook, PluginProcess)]
+
+    # and started again when it connects again
+    async def again(bot, server, sent):
+        await wait_for(lambda: any(isinstance(hook, PluginProcess)
+                                   for hook in bot.hooks))
+
+    run(tmp_path, again, processPlugins=['echo'])
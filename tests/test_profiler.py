@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+import threading
+
+from alebot import Alebot
+from alebot.profiler import Profiler, SamplingProfiler
+
+from helpers import make_bot
+
+
+def test_sample_attribution():
+    plugins = {}
+    profile = SamplingProfiler(lambda: plugins)
+    frame = sys._getframe()
+    profile.sample('main', frame, plugins)
+    assert not profile.owners
+    # the module of this test counts as a plugin from now on
+    plugins[__name__] = None
+    profile.sample('main', frame, plugins)
+    assert list(profile.owners) == [__name__]
+
+
+def test_sampling_profile_sees_reloaded_plugins(tmp_path):
+    bot = make_bot(tmp_path)
+    bot.profiler.start(Profiler.SAMPLE, interval=0.001)
+    # the plugins are replaced, i.e. by a reload
+    Alebot.Plugins = dict(Alebot.Plugins, profiled_plugin=None)
+    done = threading.Event()
+
+    def busy():
+        # a frame of the plugin module
+        exec(compile('while not done.is_set(): pass', 'profiled.py',
+                     'exec'), {'__name__': 'profiled_plugin',
+                               'done': done})
+
+    thread = threading.Thread(target=busy)
+    thread.start()
+    try:
+        threading.Event().wait(0.1)
+    finally:
+        done.set()
+        thread.join()
+    path = bot.profiler.stop()
+    assert 'profiled_plugin' in bot.profiler.last.owners
+    assert os.path.exists(path)
+
+
+def test_profile_written_in_the_executor(tmp_path):
+    bot = make_bot(tmp_path)
+
+    async def main():
+        bot.loop = asyncio.get_running_loop()
+        bot._loop_thread = threading.get_ident()
+        bot.profiler.start(Profiler.CPU)
+        path = bot.profiler.stop()
+        assert bot.profiler.writing is not None
+        await bot.profiler.writing
+        return path
+
+    path = asyncio.run(main())
+    assert path.endswith('.prof')
+    assert os.path.exists(path)
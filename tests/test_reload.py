@@ -0,0 +1,39 @@
+from alebot import Alebot
+
+from helpers import make_bot, write_plugin
+
+
+def test_reload_with_broken_dependent(tmp_path):
+    base = ('from alebot import Alebot, Hook\n'
+            'VERSION = %d\n'
+            '\n\n'
+            '@Alebot.hook\n'
+            'class BaseHook(Hook):\n'
+            '    events = ("PRIVMSG",)\n')
+    bot = make_bot(tmp_path, {
+        'base': base % 1,
+        'child': 'from alebot import Alebot\n'
+                 'base = Alebot.get_plugin("base")\n'
+                 '\n\n'
+                 '@Alebot.hook\n'
+                 'class ChildHook(base.BaseHook):\n'
+                 '    pass\n',
+        'broken': 'from alebot import Alebot\n'
+                  'base = Alebot.get_plugin("base")\n'
+                  'raise RuntimeError("broken")\n',
+    }, lazyPlugins=False)
+    assert 'broken' not in bot.plugins
+
+    write_plugin(tmp_path, 'base', base % 2)
+    assert bot.reload_plugins() == ['base', 'child']
+    assert Alebot.get_plugin('base').VERSION == 2
+    assert 'broken' not in bot.plugins
+
+    # a plugin that breaks keeps its previous version and its hooks
+    write_plugin(tmp_path, 'base', 'VERSION = (\n')
+    hooks = [hook for hook in bot.hooks
+             if hook.__class__.__module__ == 'base']
+    bot.reload_plugins()
+    assert Alebot.get_plugin('base').VERSION == 2
+    assert [hook for hook in bot.hooks
+            if hook.__class__.__module__ == 'base'] == hooks
@@ -0,0 +1,29 @@
+import asyncio
+
+from alebot import Event
+
+from helpers import ECHO, make_bot, run, wait_for
+
+
+def test_route_command(tmp_path):
+    bot = make_bot(tmp_path)
+    event = Event.parse(':alice!a@example.com PRIVMSG #c :AleBot: echo a b')
+    assert bot.route_command(event) == 'echo'
+    assert event.args == 'a b'
+    event = Event.parse(':alice!a@example.com PRIVMSG #c :alebot echo')
+    assert not bot.route_command(event)
+    event = Event.parse(':alice!a@example.com PRIVMSG #c :other: echo')
+    assert not bot.route_command(event)
+
+
+def test_commands_reach_their_hook(tmp_path):
+    async def scenario(bot, server, sent):
+        server.say('alice', '#alebot', 'ALEBOT: echo hello')
+        server.say('alice', '#alebot', 'alebot: unknown hello')
+        server.say('alice', '#alebot', 'just chatting')
+        await wait_for(lambda: sent)
+        await asyncio.sleep(0.1)
+
+    bot, sent = run(tmp_path, scenario, {'echo': ECHO},
+                    flood={'linesPerSecond': None})
+    assert sent == [('#alebot', 'hello')]
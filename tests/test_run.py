@@ -0,0 +1,33 @@
+from alebot import Alebot
+
+from helpers import run
+
+
+def test_sock_closed_runs_async_hooks(tmp_path):
+    closer = '''
+import asyncio
+from alebot import Alebot, Hook
+
+done = []
+
+
+@Alebot.hook
+class CloseHook(Hook):
+
+    events = ('SOCK_CLOSED',)
+
+    def match(self, event):
+        return True
+
+    async def call(self, event):
+        await asyncio.sleep(0.05)
+        done.append(self.bot.loop is not None)
+'''
+
+    async def scenario(bot, server, sent):
+        pass
+
+    bot, sent = run(tmp_path, scenario, {'closer': closer})
+    assert Alebot.get_plugin('closer').done == [True]
+    assert bot.loop is None
+    assert not bot.pending
@@ -0,0 +1,42 @@
+import pytest
+
+from alebot import Settings
+
+from helpers import make_bot
+
+
+def test_defaults_fill_in_missing_keys():
+    settings = Settings({'tasks': {'workers': 2}})
+    assert settings.tasks['workers'] == 2
+    assert settings.tasks['queueSize'] == 100
+    assert settings.nick == 'alebot'
+    assert not settings.errors
+
+
+def test_invalid_options_get_their_default():
+    settings = Settings({'nick': '1nvalid', 'port': 'six',
+                         'tasks': {'workers': 0, 'overflow': 'explode'}})
+    assert settings.nick == 'alebot'
+    assert settings.port == 6667
+    assert settings.tasks['workers'] == 4
+    assert settings.tasks['overflow'] == 'reject'
+    assert len(settings.errors) == 4
+
+
+def test_admins_must_be_strings(tmp_path):
+    settings = Settings({'auth': {'admins': ['boss!*@*', 123]}})
+    assert not settings.admins.match('boss!b@example.com')
+    assert settings.errors == [
+        "Option 'auth.admins' is ['boss!*@*', 123], using [] instead."]
+
+    # the bot still starts and logs the error
+    bot = make_bot(tmp_path, auth={'admins': [123]})
+    assert not bot.settings.admins.match('123!a@example.com')
+
+
+def test_settings_are_read_only():
+    settings = Settings({})
+    with pytest.raises(AttributeError):
+        settings.nick = 'other'
+    with pytest.raises(TypeError):
+        settings.tasks['workers'] = 8
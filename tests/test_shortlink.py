@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from alebot import Alebot
+
+from helpers import make_bot
+
+
+@pytest.fixture
+def shortlink(tmp_path):
+    make_bot(tmp_path)
+    return Alebot.get_plugin('shortlink')
+
+
+def test_scan(shortlink):
+    scan = shortlink.ShortLink.scan
+    assert scan('see http://a.test/x, and HTTPS://b.test/y.') == \
+        ['http://a.test/x', 'HTTPS://b.test/y']
+    assert scan('(see http://a.test/wiki/Foo_(bar)).') == \
+        ['http://a.test/wiki/Foo_(bar)']
+    assert scan('<http://a.test/"quoted">') == ['http://a.test/']
+    assert scan('ftp://a.test http:// no') == []
+
+
+def test_cache_lru(shortlink):
+    cache = shortlink.LinkCache(size=2)
+    cache.put('a', 'short a')
+    cache.put('b', 'short b')
+    assert cache.get('a') == 'short a'
+    cache.put('c', 'short c')
+    # b was used least recently
+    assert cache.get('b') is None
+    assert cache.get('a') == 'short a'
+    assert cache.get('c') == 'short c'
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_cache_ttl(shortlink, monkeypatch):
+    cache = shortlink.LinkCache(ttl=10)
+    cache.put('a', 'short a')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    assert cache.get('a') is None
+    assert 'a' not in cache.links
+
+
+def test_cache_file(shortlink, tmp_path):
+    path = str(tmp_path / 'links.json')
+    cache = shortlink.LinkCache(path=path, save_delay=0.1)
+    cache.put('a', 'short a')
+    cache.put('b', 'short b')
+    # written once, a little later
+    assert not os.path.exists(path)
+    cache.timer.join(5)
+    with open(path) as f:
+        assert [link[:2] for link in json.load(f)] == \
+            [['a', 'short a'], ['b', 'short b']]
+
+    cache.save_delay = 60
+    cache.put('c', 'short c')
+    cache.close()
+    assert cache.timer is None
+    assert shortlink.LinkCache(path=path).get('c') == 'short c'
+
+
+def test_shortener_coalesces(shortlink):
+    backend = shortlink.LocalBackend(delay=0.2)
+    shortener = shortlink.Shortener(backend, shortlink.LinkCache())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        shortener.shorten('http://a.test/long'))) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(set(results)) == 1 and len(results) == 5
+    assert backend.calls == 1
+    assert not shortener.running
+
+    # cached from now on
+    assert shortener.shorten_many(['http://a.test/long',
+                                   'http://b.test/long']) == \
+        [results[0], backend.shorten('http://b.test/long')]
+    assert backend.calls == 3
+
+
+def test_shortener_passes_errors(shortlink):
+    class Broken(shortlink.ShortLinkBackend):
+        def shorten(self, url):
+            raise RuntimeError('down')
+
+    shortener = shortlink.Shortener(Broken(), shortlink.LinkCache())
+    with pytest.raises(RuntimeError):
+        shortener.shorten('http://a.test/long')
+    assert not shortener.running
@@ -0,0 +1,113 @@
+import pytest
+
+from alebot import Event
+
+from helpers import make_bot
+
+
+@pytest.fixture
+def bot(tmp_path):
+    bot = make_bot(tmp_path, nick='alebot')
+    feed(bot, ':alebot!bot@host.test JOIN #chan',
+         ':irc.test 353 alebot = #chan :alebot @Alice +bob[x]!b@b.test',
+         ':irc.test 366 alebot #chan :End of /NAMES list.')
+    return bot
+
+
+def feed(bot, *lines):
+    for line in lines:
+        bot.state.update(Event.parse(line))
+
+
+def members(bot, channel):
+    return bot.state.channels[bot.casemapping.key(channel)].members
+
+
+def test_names(bot):
+    channel = bot.state.channels['#chan']
+    assert channel.name == '#chan'
+    assert channel.synced
+    assert channel.members == {'alebot': '', 'alice': '@', 'bob{x}': '+'}
+    assert set(bot.state.users) == {'alebot', 'alice', 'bob{x}'}
+    bob = bot.state.users['bob{x}']
+    assert (bob.nick, bob.ident, bob.host) == ('bob[x]', 'b', 'b.test')
+    assert bob.channels == ('#chan',)
+
+
+def test_names_replace_what_is_known(bot):
+    feed(bot, ':irc.test 353 alebot = #chan :alebot @alice',
+         ':irc.test 366 alebot #chan :End of /NAMES list.')
+    assert members(bot, '#chan') == {'alebot': '', 'alice': '@'}
+    assert 'bob{x}' not in bot.state.users
+
+
+def test_join_and_part(bot):
+    feed(bot, ':carol!c@c.test JOIN #chan',
+         ':alebot!bot@host.test JOIN #other',
+         ':carol!c@c.test JOIN #other')
+    carol = bot.state.users['carol']
+    assert (carol.ident, carol.host) == ('c', 'c.test')
+    # a tuple of the channel keys, in the order they were joined
+    assert carol.channels == ('#chan', '#other')
+    assert bot.state.channels_of('CAROL') == ['#chan', '#other']
+
+    feed(bot, ':carol!c@c.test PART #chan :bye')
+    assert carol.channels == ('#other',)
+    assert 'carol' not in members(bot, '#chan')
+
+    # when the bot parts, the users it shares no channel with are gone
+    feed(bot, ':alebot!bot@host.test PART #other')
+    assert '#other' not in bot.state.channels
+    assert 'carol' not in bot.state.users
+    assert bot.state.users['alebot'].channels == ('#chan',)
+
+
+def test_kick(bot):
+    feed(bot, ':Alice!a@a.test KICK #chan bob[x] :out')
+    assert 'bob{x}' not in bot.state.users
+    feed(bot, ':Alice!a@a.test KICK #chan alebot :you too')
+    assert not bot.state.channels
+    assert not bot.state.users
+
+
+def test_quit(bot):
+    event = Event.parse(':Alice!a@a.test QUIT :gone')
+    bot.state.update(event)
+    assert 'alice' not in bot.state.users
+    assert 'alice' not in members(bot, '#chan')
+    assert event.cache['state.channels'] == ('#chan',)
+
+
+def test_nick(bot):
+    feed(bot, ':Alice!a@a.test NICK :Alicia')
+    assert 'alice' not in bot.state.users
+    assert bot.state.users['alicia'].nick == 'Alicia'
+    assert members(bot, '#chan')['alicia'] == '@'
+    assert bot.state.prefix('ALICIA', '#CHAN') == '@'
+
+
+def test_mode(bot):
+    feed(bot, ':Alice!a@a.test MODE #chan +vo-o+k alice alebot alice key')
+    assert members(bot, '#chan') == {'alebot': '@', 'alice': '+',
+                                     'bob{x}': '+'}
+    feed(bot, ':Alice!a@a.test MODE #chan +b-v *!*@spam bob[x]')
+    assert members(bot, '#chan')['bob{x}'] == ''
+    # the highest prefix comes first
+    feed(bot, ':irc.test MODE #chan +vo bob[x] bob[x]')
+    assert members(bot, '#chan')['bob{x}'] == '@+'
+
+
+def test_rekey_after_casemapping_change(bot):
+    assert bot.state.is_on('BOB{X}', '#chan')
+    feed(bot, ':irc.test 005 alebot CASEMAPPING=ascii PREFIX=(qov)~@+ '
+         ':are supported by this server')
+    assert bot.casemapping.name == 'ascii'
+    assert set(bot.state.users) == {'alebot', 'alice', 'bob[x]'}
+    assert members(bot, '#chan') == {'alebot': '', 'alice': '@',
+                                     'bob[x]': '+'}
+    assert bot.state.users['bob[x]'].channels == ('#chan',)
+    assert bot.state.is_on('BOB[X]', '#chan')
+    assert not bot.state.is_on('bob{x}', '#chan')
+
+    feed(bot, ':irc.test MODE #chan +q alice')
+    assert members(bot, '#chan')['alice'] == '~@'
@@ -0,0 +1,75 @@
+import asyncio
+
+from alebot import Alebot
+from alebot.testing import FakeServer
+
+from helpers import make_bot, run, wait_for
+
+
+def test_registration(tmp_path):
+    async def scenario(bot, server, sent):
+        client, = server.clients
+        assert client.registered
+        assert server.nicks == {bot.nick: client}
+        assert server.channels['#alebot'] == {client}
+
+    bot, sent = run(tmp_path, scenario, channels=('#alebot', '#other'))
+    assert not bot.state.channels
+
+
+def test_ping_pong(tmp_path):
+    pongs = []
+
+    async def scenario(bot, server, sent):
+        server.on_pong = lambda client, token: pongs.append(token)
+        client, = server.clients
+        server.ping(client, 'token1')
+        server.ping(client, 'token2')
+        await wait_for(lambda: len(pongs) == 2)
+
+    run(tmp_path, scenario)
+    assert pongs == ['token1', 'token2']
+
+
+def test_reconnect_after_sock_closed(tmp_path):
+    counter = '''
+from alebot import Alebot, Hook
+
+events = []
+
+
+@Alebot.hook
+class CountHook(Hook):
+
+    events = ('SOCK_CONNECTED', 'SOCK_CLOSED')
+
+    def match(self, event):
+        return True
+
+    def call(self, event):
+        events.append(event.name)
+'''
+
+    async def main():
+        server = FakeServer()
+        await server.start()
+        bot = make_bot(tmp_path, {'counter': counter}, server=server.host,
+                       port=server.port, channels=['#alebot'])
+        running = asyncio.get_running_loop().create_task(bot.run())
+        await wait_for(lambda: bot.state.is_on(bot.nick, '#alebot'))
+        await server.stop()
+        await asyncio.wait_for(running, 5)
+        assert not bot.state.channels
+
+        # a new server on the same address, as after a restart
+        server = FakeServer(port=server.port)
+        await server.start()
+        running = asyncio.get_running_loop().create_task(bot.run())
+        await wait_for(lambda: bot.state.is_on(bot.nick, '#alebot'))
+        assert bot.nick in server.nicks
+        await server.stop()
+        await asyncio.wait_for(running, 5)
+
+    asyncio.run(main())
+    assert Alebot.get_plugin('counter').events == [
+        'SOCK_CONNECTED', 'SOCK_CLOSED', 'SOCK_CONNECTED', 'SOCK_CLOSED']